@@ -0,0 +1,132 @@
+# --- Content-addressed blob store (dedup of identical model files) ---
+import errno
+import os
+import shutil
+import threading
+
+from loguru import logger
+
+from backend import database
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks
+    fcntl = None
+
+store_logger = logger.bind(name="civitai.download")
+
+LINK_MODES = ('hardlink', 'reflink')
+# ioctl FICLONE (linux/fs.h): copy-on-write clone on btrfs, XFS and other reflink filesystems
+FICLONE = 0x40049409
+LINK_TMP_SUFFIX = '.link.tmp'
+
+
+def _same_file(a, b):
+    try:
+        sa, sb = os.stat(a), os.stat(b)
+    except OSError:
+        return False
+    return (sa.st_dev, sa.st_ino) == (sb.st_dev, sb.st_ino)
+
+
+class BlobStore:
+    """Model files stored once under <root>/<sha[:2]>/<sha>, linked into data/models.
+
+    The user-visible paths are hardlinks to the blob (or reflinks, copy-on-write
+    clones, with link_mode='reflink'), so the same weights under several model
+    types or filenames take the disk space of one file. blob_refs in the database
+    tracks which paths reference which blob; release() removes a path and deletes
+    the blob only when no other path references it. When a link cannot be made
+    (another filesystem, no reflink support) the file is copied instead.
+    """
+    def __init__(self, root, link_mode='hardlink'):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"link_mode must be one of {', '.join(LINK_MODES)}")
+        self.root = root
+        self.link_mode = link_mode
+        self.lock = threading.Lock()
+
+    def blob_path(self, sha256):
+        sha256 = str(sha256).lower()
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def has(self, sha256):
+        return bool(sha256) and os.path.exists(self.blob_path(sha256))
+
+    def _clone(self, src, dst):
+        if fcntl is None:
+            raise OSError(errno.EOPNOTSUPP, "reflinks are not supported on this platform")
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+    def _link(self, src, dst):
+        """Make dst the same content as src without copying; atomic replace of dst."""
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = dst + LINK_TMP_SUFFIX
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        try:
+            if self.link_mode == 'reflink':
+                try:
+                    self._clone(src, tmp)
+                except OSError:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    os.link(src, tmp)
+            else:
+                os.link(src, tmp)
+        except OSError as e:
+            # EXDEV (andere schijf), EPERM, EMLINK: dan maar een volledige kopie
+            store_logger.warning(f"Cannot link {dst} to {src} ({e}), copying instead")
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+
+    def adopt(self, path, sha256):
+        """Move a verified file into the store and turn path into a link to the blob.
+
+        When the blob already exists, path is replaced by a link to it and the
+        duplicate copy is freed. Idempotent for a path that already links to it.
+        """
+        sha256 = str(sha256).lower()
+        path = os.path.abspath(path)
+        blob = self.blob_path(sha256)
+        with self.lock:
+            if not os.path.exists(blob):
+                self._link(path, blob)
+                store_logger.info(f"Stored blob {sha256[:12]} from {path}")
+            elif not _same_file(path, blob):
+                self._link(blob, path)
+                store_logger.info(f"Deduplicated {path} against blob {sha256[:12]}")
+            database.add_blob_ref(path, sha256)
+        return blob
+
+    def link(self, sha256, path):
+        """Materialize the blob sha256 at path. Returns False when the store lacks it."""
+        sha256 = str(sha256).lower()
+        path = os.path.abspath(path)
+        blob = self.blob_path(sha256)
+        with self.lock:
+            if not os.path.exists(blob):
+                return False
+            if not _same_file(path, blob):
+                self._link(blob, path)
+            database.add_blob_ref(path, sha256)
+        return True
+
+    def refs(self, sha256):
+        return database.blob_ref_paths(str(sha256).lower())
+
+    def release(self, path):
+        """Delete path; the blob goes too once nothing references it. Returns True if it did."""
+        path = os.path.abspath(path)
+        with self.lock:
+            sha256, remaining = database.remove_blob_ref(path)
+            if os.path.exists(path):
+                os.remove(path)
+            if sha256 is None or remaining:
+                return False
+            blob = self.blob_path(sha256)
+            if os.path.exists(blob):
+                os.remove(blob)
+                store_logger.info(f"Removed unreferenced blob {sha256[:12]}")
+            return True
@@ -0,0 +1,197 @@
+# --- Shared configuration (configs/config.json), cached and hot-reloaded ---
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+from loguru import logger
+
+config_logger = logger.bind(name="civitai.download")
+
+CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'configs', 'config.json'))
+
+
+def _bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def _optional(convert):
+    return lambda value: None if value is None else convert(value)
+
+
+# Known keys and their types; unknown keys are passed through unchanged
+SCHEMA = {
+    'throttle': float,
+    'throttle_per_job': float,
+    'throttle_schedule': list,
+    'retries': int,
+    'retry_backoff': float,
+    'retry_backoff_max': float,
+    'workers': int,
+    'max_workers': int,
+    'timeout': float,
+    'download_dir': str,
+    'segmented_download': dict,
+    'write_buffer_size': int,
+    'fsync_downloads': _bool,
+    'scratch_dir': _optional(str),
+    'mover_workers': int,
+    'mover_throttle': float,
+    'paranoid_verify': _bool,
+    'verify_workers': int,
+    'verify_backlog': int,
+    'verify_policy': str,
+    'duplicate_policy': str,
+    'library_scan_workers': int,
+    'library_scan_on_start': _bool,
+    'content_store': _bool,
+    'content_store_dir': _optional(str),
+    'content_store_link': str,
+    'persistent_queue': _bool,
+    'job_retention_days': float,
+    'preflight': _bool,
+    'preflight_workers': int,
+    'preflight_ahead': int,
+    'scheduling_policy': str,
+    'scheduling_unknown_size': int,
+    'scheduling_aging': float,
+    'scheduling_weights': dict,
+    'disk_free_floor': int,
+    'disk_reserve_unknown': int,
+    'disk_budgets': dict,
+    'disk_budget_total': _optional(int),
+    'evict_on_low_space': _bool,
+    'http2': _bool,
+    'host_concurrency': int,
+    'host_concurrency_min': int,
+    'host_concurrency_max': int,
+    'http_max_connections': _optional(int),
+    'http_max_keepalive': _optional(int),
+    'http_keepalive_expiry': _optional(float),
+    'webhook_url': _optional(str),
+    'civitai_api_key': _optional(str),
+    'civitai_url': str,
+    'jwt_secret': _optional(str),
+}
+
+
+def validate(raw):
+    """Coerce known keys to their type; invalid values are dropped with a warning."""
+    if not isinstance(raw, dict):
+        raise ValueError("config.json must contain a JSON object")
+    result = {}
+    for key, value in raw.items():
+        convert = SCHEMA.get(key)
+        if convert is None:
+            result[key] = value
+            continue
+        try:
+            if convert in (list, dict):
+                if not isinstance(value, convert):
+                    raise TypeError(f"expected {convert.__name__}")
+                result[key] = value
+            else:
+                result[key] = convert(value)
+        except (TypeError, ValueError) as e:
+            config_logger.warning(f"Ignoring invalid config value {key}={value!r}: {e}")
+    return result
+
+
+class Config:
+    """Parsed config.json, shared by the daemon, the API and the frontend.
+
+    get() is a dict lookup. At most every check_interval seconds the file is
+    stat()ed and only re-parsed when its mtime or size changed; the new values
+    are swapped in as a whole and subscribers are called with the changed keys.
+    A file that fails to parse keeps the previous values.
+    """
+    def __init__(self, path=CONFIG_PATH, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._values = MappingProxyType({})
+        self._stamp = None
+        self._next_check = 0.0
+        self._subscribers = []
+        self._watcher = None
+        self.reload()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def reload(self, force=False):
+        """Re-read the file if it changed; returns the set of changed keys."""
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            stamp = self._file_stamp()
+            if stamp == self._stamp and not force:
+                return set()
+            try:
+                if stamp is None:
+                    new = {}
+                else:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        new = validate(json.load(f))
+            except Exception as e:
+                config_logger.error(f"Failed to load {self.path}, keeping previous config: {e}")
+                self._stamp = stamp
+                return set()
+            old = self._values
+            self._values = MappingProxyType(new)
+            self._stamp = stamp
+            changed = {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+            subscribers = list(self._subscribers)
+        if changed and old:
+            config_logger.info(f"Config reloaded, changed: {', '.join(sorted(changed))}")
+        for callback, keys in subscribers:
+            relevant = changed if keys is None else changed & keys
+            if relevant:
+                try:
+                    callback(self._values, relevant)
+                except Exception as e:
+                    config_logger.error(f"Config subscriber {callback} failed: {e}")
+        return changed
+
+    def _maybe_reload(self):
+        if time.monotonic() >= self._next_check:
+            self.reload()
+
+    def get(self, key, default=None):
+        self._maybe_reload()
+        return self._values.get(key, default)
+
+    def snapshot(self):
+        """Read-only view of all values (replaced, never mutated, on reload)."""
+        self._maybe_reload()
+        return self._values
+
+    def subscribe(self, callback, keys=None):
+        """Call callback(values, changed_keys) after a reload that changed one of keys."""
+        with self._lock:
+            self._subscribers.append((callback, set(keys) if keys is not None else None))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [(cb, keys) for cb, keys in self._subscribers if cb != callback]
+
+    def watch(self):
+        """Start a background thread that checks the file every check_interval seconds."""
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._watcher = threading.Thread(target=self._watch_loop, name='config-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.check_interval)
+            self.reload()
+
+
+config = Config()
@@ -1,6 +1,10 @@
 import threading
 import queue
 import hashlib
+import random
+import uuid
+from collections import deque
+from email.utils import parsedate_to_datetime
 import httpx
 import os
 import json
@@ -8,21 +12,22 @@ import time
 from loguru import logger
 daemon_logger = logger.bind(name="civitai.download")
 from backend.database import log_download, log_error
+from backend import http_client
+from backend.config import config as app_config
+from backend.ratelimit import BandwidthLimiter
+from backend.jobqueue import JobQueue, JOB_RETENTION_DAYS
+from backend.verify import (VerifyPool, IntegrityError, VERIFY_POLICIES, normalize_hashes, new_hasher,
+                            choose_algorithm, hash_matches, check_safetensors_header)
 
 # --- Webhook sender (module-level, for test patching) ---
 def send_webhook(event, data):
 
     try:
-        config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'configs', 'config.json'))
-        if not os.path.exists(config_path):
-            return
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        url = config.get('webhook_url')
+        url = app_config.get('webhook_url')
         if not url:
             return
         payload = {'event': event, 'data': data}
-        httpx.post(url, json=payload, timeout=5)
+        http_client.get_client().post(url, json=payload, timeout=5)
     except Exception:
         pass
 
@@ -75,12 +80,118 @@ class WebSocketManager:
 
 ws_manager = WebSocketManager()
 
+# --- Partial downloads (.part + .part.json sidecar) ---
+PART_SUFFIX = '.part'
+PART_META_INTERVAL = 2.0  # seconds between sidecar updates while streaming
+DEFAULT_MIN_SEGMENT_SIZE = 64 * 1024 * 1024  # smaller files are never split
+PERMANENT_HTTP_STATUS = {401, 403, 404, 410}
+DUPLICATE_POLICIES = ('ignore', 'raise_priority', 'replace_url')
+RETRY_AFTER_MAX = 3600.0
+DISK_RECHECK = 30.0  # seconds before a job held for disk space is tried again
+# config.json keys die een draaiende daemon zonder herstart overneemt
+LIVE_CONFIG_KEYS = ('throttle', 'throttle_per_job', 'throttle_schedule', 'workers', 'retries', 'timeout',
+                    'retry_backoff', 'retry_backoff_max', 'download_dir', 'segmented_download',
+                    'paranoid_verify', 'verify_policy', 'duplicate_policy', 'write_buffer_size',
+                    'fsync_downloads', 'mover_throttle', 'host_concurrency', 'host_concurrency_min',
+                    'host_concurrency_max', 'scheduling_policy', 'scheduling_unknown_size', 'scheduling_aging',
+                    'scheduling_weights', 'disk_free_floor', 'disk_reserve_unknown', 'disk_budgets',
+                    'disk_budget_total', 'evict_on_low_space')
+
+def _parse_retry_after(value):
+    """Retry-After header (seconds or HTTP date) -> seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_WRITE_BUFFER = 4 * 1024 * 1024  # bytes collected before a write to the part file
+
+def _hash_prefix(path, length, sha256):
+    # Bring a digest up to date with the first `length` bytes already on disk (resumed downloads)
+    with open(path, 'rb') as f:
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise IOError(f"{path} shorter than expected ({length - remaining}/{length} bytes)")
+            sha256.update(chunk)
+            remaining -= len(chunk)
+    return sha256
+
+def _part_meta_path(part_path):
+    return part_path + '.json'
+
+def _read_part_meta(part_path):
+    try:
+        with open(_part_meta_path(part_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def _write_part_meta(part_path, meta):
+    tmp = _part_meta_path(part_path) + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, _part_meta_path(part_path))
+
+def _preallocate(fd, size):
+    """Reserve size bytes for a download so large files are written contiguously.
+
+    posix_fallocate allocates real blocks (and fails early on a full disk); where it is
+    unavailable or unsupported the file is only extended (sparse).
+    """
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass
+    if os.fstat(fd).st_size < size:
+        os.ftruncate(fd, size)
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _remove_partial(part_path):
+    for path in (part_path, _part_meta_path(part_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _content_range_start(value):
+    # 'bytes 100-999/1000' -> 100
+    try:
+        return int(value.split()[1].split('-')[0])
+    except Exception:
+        return None
+
 # Download queue item structure
-def make_queue_item(model_id, url, filename, sha256=None, priority=None, model_type=None, model_version_id=None, base_model=None):
+def make_queue_item(model_id, url, filename, sha256=None, priority=None, model_type=None, model_version_id=None, base_model=None,
+                    hashes=None):
     # Default priority is 2 if not set, so explicit 0 or 1 are always higher priority
     if priority is None:
         priority = 2
-    return {
+    # hashes: de 'hashes' dict van Civitai (SHA256, AutoV2, BLAKE3, CRC32)
+    hashes = normalize_hashes(hashes, sha256)
+    if sha256 is None:
+        sha256 = hashes.get('sha256')
+    item = {
         'model_id': model_id,
         'url': url,
         'filename': filename,
@@ -91,87 +202,355 @@ def make_queue_item(model_id, url, filename, sha256=None, priority=None, model_t
         'model_version_id': model_version_id,
         'base_model': base_model
     }
+    if hashes:
+        item['hashes'] = hashes
+    return item
+
+from backend.database import log_downloads, last_successful_downloads, record_queue_wait
+from backend.downloaded import DownloadedIndex
+from backend.library import Library
+from backend.blobstore import BlobStore
+from backend.mover import FileMover
+from backend.hostlimit import HostGovernor
+from backend.preflight import Prober, probe, is_fresh
+from backend.scheduling import make_policy, flow_of, job_size
+from backend.diskspace import DiskReserver
+from backend.eviction import Evictor
+from backend.database import load_evictions
+
+
+class JobControl:
+    """Cancellation token and pause switch of one job, checked by the transfer loops.
+
+    A control lives as long as its job, not per attempt, so a cancel that arrives
+    between two attempts is not lost. Changes notify the daemon's state condition.
+    """
+    def __init__(self, cond):
+        self.cond = cond
+        self.cancelled = False
+        self.paused = False
+
+    def cancel(self):
+        with self.cond:
+            self.cancelled = True
+            self.cond.notify_all()
+
+    def set_paused(self, value):
+        with self.cond:
+            self.paused = bool(value)
+            self.cond.notify_all()
 
-from backend.database import is_already_downloaded
 
 class DownloadDaemon(threading.Thread):
     def __init__(self, max_retries=None, download_dir=None, throttle=None, timeout=None, workers=None):
         super().__init__(daemon=True)
-        # Load config values if not provided
-        config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'configs', 'config.json'))
-        config = {}
-        if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
-                try:
-                    config = json.load(f)
-                except Exception:
-                    config = {}
-        # Use config values or fallback to defaults
+        # Config values (gecached, zie backend/config.py) tenzij expliciet meegegeven
+        config = app_config.snapshot()
+        # Expliciete argumenten winnen ook van latere config reloads
+        self._pinned = {key for key, value in (('retries', max_retries), ('download_dir', download_dir),
+                                               ('throttle', throttle), ('timeout', timeout),
+                                               ('workers', workers)) if value is not None}
         self.max_retries = max_retries if max_retries is not None else int(config.get('retries', 5))
-        self.throttle = throttle if throttle is not None else int(config.get('throttle', 0))
+        self.throttle = throttle if throttle is not None else float(config.get('throttle', 0))
         self.workers = workers if workers is not None else int(config.get('workers', 1))
         self.download_dir = download_dir if download_dir is not None else config.get('download_dir', '')
         self.timeout = timeout if timeout is not None else float(config.get('timeout', 60.0))
-        self.queue = queue.PriorityQueue()
-        self.running = True
-        self.paused = False
-        self.cancel_current = False
+        self.max_workers = int(config.get('max_workers', 16))
+        # Retry backoff: base * 2^(retries-1) seconden met jitter, begrensd door max
+        self.retry_backoff = float(config.get('retry_backoff', 2.0))
+        self.retry_backoff_max = float(config.get('retry_backoff_max', 300.0))
+        # Bandbreedte-limiet in MB/s (0 = onbeperkt), gedeeld door alle workers en segmenten
+        self.limiter = BandwidthLimiter(
+            limit=self.throttle,
+            per_job=config.get('throttle_per_job', 0),
+            schedule=config.get('throttle_schedule', []),
+        )
+        # Segmented download per model_type, bv. {"checkpoint": {"segments": 4, "min_segment_size": 67108864}}
+        self.segment_config = config.get('segmented_download', {})
+        # Grote schrijfbuffer (minder, grotere writes); fsync optioneel voor de rename naar de definitieve naam
+        self.write_buffer = int(config.get('write_buffer_size', DEFAULT_WRITE_BUFFER))
+        self.fsync_downloads = bool(config.get('fsync_downloads', False))
+        # Snelle lokale scratch disk voor downloaden en hashen; een mover zet geverifieerde
+        # bestanden daarna met eigen concurrency en bandbreedte in download_dir
+        self.scratch_dir = config.get('scratch_dir') or None
+        self.mover = None
+        if self.scratch_dir:
+            self.mover = FileMover(workers=config.get('mover_workers', 1), limit=config.get('mover_throttle', 0),
+                                   fsync=self.fsync_downloads)
+        # SHA256 wordt tijdens het downloaden berekend; paranoid mode leest het bestand daarna nogmaals
+        self.paranoid_verify = bool(config.get('paranoid_verify', False))
+        # Hashen van afgeronde bestanden in een eigen stage, los van de download workers
+        # Welke hash bij hercontrole: sha256 (altijd volledig), fast (BLAKE3 als beschikbaar), crc32
+        self.verify_policy = config.get('verify_policy', 'sha256')
+        if self.verify_policy not in VERIFY_POLICIES:
+            daemon_logger.warning(f"Unknown verify_policy '{self.verify_policy}', using 'sha256'")
+            self.verify_policy = 'sha256'
+        self.verifier = VerifyPool(workers=config.get('verify_workers', 2), backlog=config.get('verify_backlog', 4))
+        # Wat te doen met een job die al in de wachtrij staat of bezig is: ignore, raise_priority, replace_url
+        self.duplicate_policy = config.get('duplicate_policy', 'ignore')
+        if self.duplicate_policy not in DUPLICATE_POLICIES:
+            daemon_logger.warning(f"Unknown duplicate_policy '{self.duplicate_policy}', using 'ignore'")
+            self.duplicate_policy = 'ignore'
+        # Schijfruimte per lopende job reserveren; jobs die niet passen wachten (held)
+        self.disk = DiskReserver(floor=config.get('disk_free_floor', 1024 ** 3),
+                                 unknown=config.get('disk_reserve_unknown', 2 * 1024 ** 3))
+        # Gelijktijdige requests per host, automatisch bijgesteld bij 429/503 (AIMD)
+        self.hosts = HostGovernor(
+            initial=config.get('host_concurrency', 4),
+            minimum=config.get('host_concurrency_min', 1),
+            maximum=config.get('host_concurrency_max', 32),
+        )
+        # Eén gedeelde connection pool voor downloads, probes en webhooks
+        http_client.configure(
+            http2=config.get('http2'),
+            max_connections=config.get('http_max_connections'),
+            max_keepalive_connections=config.get('http_max_keepalive'),
+            keepalive_expiry=config.get('http_keepalive_expiry'),
+        )
+        # Wachtrij in memory, gespiegeld in de jobs-tabel zodat jobs een herstart overleven;
+        # de volgorde komt van een scheduling policy (fifo, sjf, fair, aging)
+        try:
+            policy = self._make_policy(config)
+        except ValueError as e:
+            daemon_logger.warning(f"{e}, using 'fifo'")
+            policy = make_policy('fifo')
+        self.queue = JobQueue(persist=bool(config.get('persistent_queue', True)), policy=policy,
+                              retention=config.get('job_retention_days', JOB_RETENTION_DAYS))
+        # Pre-flight: de volgende jobs in de wachtrij vooraf resolven (redirect, grootte, ranges)
+        self.prober = None
+        if config.get('preflight', True):
+            self.prober = Prober(self._preflight_candidates, self._preflight_done, client=http_client.get_client,
+                                 headers=self._auth_headers, workers=config.get('preflight_workers', 4),
+                                 ahead=config.get('preflight_ahead', 50), timeout=self.timeout)
+        # Pauze/stop/cancel via een Condition: wachtende workers en downloads worden direct gewekt
+        self._state_cond = threading.Condition()
+        self._run_flag = True
+        self._pause_flag = False
+        self._idle = False  # queue_empty alleen bij de overgang naar idle
         self.logger = daemon_logger
         self.err_logger = daemon_logger
         # self._logged_downloads = set()  # Suppress duplicate log_download calls per (model_id, filename, status) -- redundant, suppressie nu via database
-        # Note: self.workers is not yet used; for future multi-threaded support
         # TODO: log_level dynamisch uit config halen en logging aanpassen
-        self.active_downloads = []  # Lijst van actieve downloads
-        self.last_downloaded = self._load_last_downloaded()
-        self.all_downloaded = self._load_all_downloaded()
-        self.current_job = None  # Track the currently processing job
-
-    def _load_last_downloaded(self):
-        # Haal laatste 5 downloads uit database
-        import sqlite3
-        db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'completed.db'))
-        if not os.path.exists(db_path):
-            return []
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute('''SELECT model_id, model_version_id, filename, file_size, download_time, model_type, base_model FROM downloads WHERE status="success" ORDER BY timestamp DESC LIMIT 5''')
-        rows = c.fetchall()
-        conn.close()
-        result = []
-        for row in rows:
-            result.append({
-                'model_id': row[0],
-                'model_version_id': row[1],
-                'filename': row[2],
-                'file_size': row[3],
-                'download_time': row[4],
-                'model_type': row[5],
-                'base_model': row[6]
-            })
-        return result
-    def _load_all_downloaded(self):
-        # Haal alle succesvolle downloads uit database
-        import sqlite3
-        db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'completed.db'))
-        if not os.path.exists(db_path):
-            return []
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute('''SELECT model_id, model_version_id, filename, file_size, download_time, model_type, base_model FROM downloads WHERE status="success" ORDER BY timestamp DESC''')
-        rows = c.fetchall()
-        conn.close()
-        result = []
-        for row in rows:
-            result.append({
-                'model_id': row[0],
-                'model_version_id': row[1],
-                'filename': row[2],
-                'file_size': row[3],
-                'download_time': row[4],
-                'model_type': row[5],
-                'base_model': row[6]
-            })
-        return result
+        # Worker pool: elke worker haalt jobs uit dezelfde PriorityQueue
+        self.lock = threading.RLock()
+        self.active_jobs = {}  # worker name -> item dat die worker nu verwerkt
+        self.controls = {}  # job_id -> JobControl van jobs die gestart zijn
+        self.verifying = {}  # job_id -> item dat in de verify-stage zit
+        self.moving = {}  # job_id -> item dat van scratch naar download_dir gaat
+        self._worker_threads = {}  # worker index -> Thread
+        # Laatste 5 downloads als ring buffer; de volledige historie blijft in de database
+        self.last_downloaded = deque(last_successful_downloads(5), maxlen=5)
+        # Compacte index van gedownloade (model_id, model_version_id) paren, lazy geladen
+        self.downloaded = DownloadedIndex()
+        # SHA256 van alle bestanden in de download tree, ook die van andere hosts gekopieerd zijn
+        self.library = Library(self._library_root(), workers=config.get('library_scan_workers', 4))
+        self.library_scan_on_start = bool(config.get('library_scan_on_start', False))
+        # Optioneel: content-addressed opslag, identieke bestanden worden hardlinks naar één blob
+        self.store = None
+        if config.get('content_store', False):
+            store_dir = config.get('content_store_dir') or os.path.join(self._library_root(), '.blobs')
+            try:
+                self.store = BlobStore(store_dir, link_mode=config.get('content_store_link', 'hardlink'))
+            except ValueError as e:
+                daemon_logger.warning(f"{e}, using hardlinks")
+                self.store = BlobStore(store_dir)
+        # Budget per model_type (en totaal) in bytes; minst recent gebruikte modellen gaan eruit
+        self.evictor = Evictor(budgets=config.get('disk_budgets'), total=config.get('disk_budget_total'),
+                               store=self.store, library=self.library, downloaded=self.downloaded)
+        self.evict_on_low_space = bool(config.get('evict_on_low_space', False))
+
+    @property
+    def http(self):
+        """Shared pooled httpx.Client (keep-alive across jobs, redirects and probes)."""
+        return http_client.get_client()
+
+    @property
+    def running(self):
+        return self._run_flag
+
+    @running.setter
+    def running(self, value):
+        with self._state_cond:
+            self._run_flag = bool(value)
+            self._state_cond.notify_all()
+        if not value:
+            self.queue.wakeup()
+            self.hosts.wakeup()
+
+    @property
+    def paused(self):
+        return self._pause_flag
+
+    @paused.setter
+    def paused(self, value):
+        with self._state_cond:
+            self._pause_flag = bool(value)
+            self._state_cond.notify_all()
+        if value:
+            self.queue.hold()
+            # Segmenten die op een host slot wachten geven het op tot resume
+            self.hosts.wakeup()
+        else:
+            self.queue.release()
+
+    def _control(self, item):
+        """The JobControl of a job, created on first use."""
+        with self.lock:
+            if not item.get('job_id'):
+                item['job_id'] = uuid.uuid4().hex
+            control = self.controls.get(item['job_id'])
+            if control is None:
+                control = self.controls[item['job_id']] = JobControl(self._state_cond)
+            return control
+
+    def _cancel_requested(self, item, path=None, message='Cancelled by user'):
+        """Finish a job as cancelled when a cancel arrived between two stages. Returns True if it did.
+
+        path is the unverified download, removed unless it already has its final name.
+        """
+        with self.lock:
+            control = self.controls.get(item.get('job_id'))
+        if control is None or not control.cancelled:
+            return False
+        if path is not None and path != self._target_path(item):
+            _remove_partial(path)
+        self.logger.info(f"Download cancelled: {item['filename']}")
+        ws_manager.broadcast('download_cancelled', {'model_id': item['model_id'], 'filename': item['filename']})
+        send_webhook('download_cancelled', {'model_id': item['model_id'], 'filename': item['filename']})
+        log_download(item['model_id'], item.get('model_version_id'), item['filename'], 'cancelled',
+                     message=message, model_type=item.get('model_type'), base_model=item.get('base_model'))
+        self._finish(item, 'cancelled')
+        return True
+
+    def _finish(self, item, state):
+        """Record the final state of a job and drop its control."""
+        self.queue.complete(item, state)
+        with self.lock:
+            self.controls.pop(item.get('job_id'), None)
+        self._release_disk(item)
+
+    def _admit(self, item):
+        """Reserve disk space for a job a worker just took; hold it (retry later) when it does not fit."""
+        size = job_size(item) or self.disk.unknown
+        if self.evictor.enabled:
+            # Eerst binnen het budget van dit model_type passen, desnoods door LRU eviction
+            try:
+                missing = self.evictor.make_room(item['job_id'], item.get('model_type'), size)
+            except ValueError as e:
+                self._give_up(item, f'Too large for the disk budget: {e}.')
+                return False
+            if missing:
+                return self._hold(item, f"waiting for {missing / 1024 ** 3:.1f} GB of {item.get('model_type')} budget (rest is pinned)")
+        part_path = self._part_path(item)
+        needs = [(part_path, size)]
+        if self._on_scratch(part_path):
+            needs.append((self._target_path(item), size))
+        try:
+            missing = self.disk.reserve(item['job_id'], needs)
+            if missing and self.evict_on_low_space and self.evictor.free_space(missing):
+                missing = self.disk.reserve(item['job_id'], needs)
+        except OSError as e:
+            self.err_logger.error(f"Cannot check free space for {item['filename']}: {e}")
+            return True
+        if not missing:
+            item.pop('held', None)
+            return True
+        self.evictor.release(item['job_id'])
+        return self._hold(item, f"waiting for {missing / 1024 ** 3:.1f} GB of disk space")
+
+    def _hold(self, item, reason):
+        item['held'] = reason
+        self.logger.warning(f"Holding {item['filename']}: {item['held']}")
+        ws_manager.broadcast('download_held', {'model_id': item['model_id'], 'filename': item['filename'], 'reason': item['held']})
+        self.queue.put_delayed(item, time.time() + DISK_RECHECK)
+        return False
+
+    def _give_up(self, item, reason):
+        """Fail a job that has not started downloading (dead link, too large for its budget)."""
+        self.err_logger.error(f"Giving up on {item['filename']}: {reason} (url: {item['url']})")
+        log_error(item['model_id'], item['filename'], f"{reason}\nURL: {item['url']}")
+        ws_manager.broadcast('download_failed', {'model_id': item['model_id'], 'filename': item['filename'], 'error': reason})
+        send_webhook('download_failed', {'model_id': item['model_id'], 'filename': item['filename'], 'error': reason})
+        self._finish(item, 'failed')
+
+    def _release_disk(self, item):
+        self.evictor.release(item.get('job_id'))
+        # Vrijgekomen ruimte: jobs die op schijfruimte wachten direct opnieuw proberen
+        if self.disk.release(item.get('job_id')):
+            self.queue.release_delayed(lambda waiting: waiting.get('held'))
+
+    @property
+    def held(self):
+        """Jobs waiting for disk space."""
+        return [item for item in self.queue.delayed_snapshot() if item.get('held')]
+
+    def _paused(self, control):
+        return self._pause_flag or control.paused
+
+    def _wait_while_paused(self, control):
+        """Block a paused download (holding no host slot) until resume, cancel or stop."""
+        if not self._paused(control):
+            return
+        with self._state_cond:
+            self._state_cond.wait_for(lambda: (not self._pause_flag and not control.paused)
+                                      or not self._run_flag or control.cancelled)
+
+    def _check_idle(self):
+        """Broadcast queue_empty once when the last job is done, not on every wakeup."""
+        with self.lock:
+            idle = (not self.active_jobs and not self.verifying and not self.moving
+                    and self.queue.empty() and not self.delayed)
+            changed = idle and not self._idle
+            self._idle = idle
+        if changed:
+            self.logger.info("Queue is empty, waiting for new jobs...")
+            ws_manager.broadcast('queue_empty', {})
+
+    @property
+    def delayed(self):
+        """Heap of (not_before, seq, item) for jobs waiting for a retry."""
+        return self.queue.delayed
+
+    @property
+    def current_job(self):
+        """First active job (backwards compatible with the single-worker daemon)."""
+        with self.lock:
+            return next(iter(self.active_jobs.values()), None)
+
+    @property
+    def active_downloads(self):
+        """Snapshot of all jobs currently being processed by the workers."""
+        with self.lock:
+            return list(self.active_jobs.values())
+
+    def set_workers(self, count):
+        """Resize the worker pool at runtime. Surplus workers exit after their current job."""
+        count = int(count)
+        if count < 1 or count > self.max_workers:
+            raise ValueError(f"workers must be between 1 and {self.max_workers}")
+        with self.lock:
+            old = self.workers
+            self.workers = count
+            if self.is_alive():
+                self._spawn_workers()
+        if count < old:
+            # Overtollige workers die op de queue wachten moeten hun index opnieuw checken
+            self.queue.wakeup()
+        if old != count:
+            self.logger.info(f"Worker pool resized: {old} -> {count}")
+            ws_manager.broadcast('workers_changed', {'workers': count, 'active': len(self.active_jobs)})
+        return count
+
+    def _spawn_workers(self):
+        with self.lock:
+            for index in range(self.workers):
+                t = self._worker_threads.get(index)
+                if t is not None and t.is_alive():
+                    continue
+                t = threading.Thread(target=self._worker_loop, args=(index,), name=f"download-worker-{index}", daemon=True)
+                self._worker_threads[index] = t
+                t.start()
+
     def pause(self):
         self.paused = True
         self.logger.info("Daemon paused")
@@ -186,21 +565,76 @@ class DownloadDaemon(threading.Thread):
         send_webhook('daemon_resumed', {})
         log_download('system', None, '-', 'resumed', message='Daemon resumed')
 
-    def cancel(self):
-        self.cancel_current = True
-        self.logger.info("Download cancel requested")
-        ws_manager.broadcast('download_cancel_requested', {})
-        send_webhook('download_cancel_requested', {})
-        log_download('system', None, '-', 'cancel_requested', message='Download cancel requested')
-        self.logger = logger.bind(name="civitai.download")
-        self.err_logger = logger.bind(name="civitai.error")
+    def cancel(self, job_id=None):
+        """Cancel one job by id (queued, waiting for a retry or running), or all running jobs.
 
+        A job that is being admitted, downloaded, verified or moved stops at its next
+        check; once the move has started it completes. Returns False when the job id
+        is unknown.
+        """
+        if job_id is None:
+            with self.lock:
+                targets = [self.controls.get(item.get('job_id')) for item in self.active_jobs.values()]
+            for control in targets:
+                if control is not None:
+                    control.cancel()
+            self.hosts.wakeup()
+        else:
+            item = self.queue.remove(job_id)
+            if item is not None:
+                # Nog niet gestart: gewoon uit de wachtrij halen
+                self._finish(item, 'cancelled')
+                ws_manager.broadcast('download_cancelled', {'model_id': item['model_id'], 'filename': item['filename']})
+                send_webhook('download_cancelled', {'model_id': item['model_id'], 'filename': item['filename']})
+                log_download(item['model_id'], item.get('model_version_id'), item['filename'], 'cancelled',
+                             message='Cancelled before start', model_type=item.get('model_type'), base_model=item.get('base_model'))
+                self._check_idle()
+            else:
+                with self.lock:
+                    control = self.controls.get(job_id)
+                if control is None:
+                    return False
+                control.cancel()
+                self.hosts.wakeup()
+        self.logger.info(f"Download cancel requested ({job_id or 'all active jobs'})")
+        ws_manager.broadcast('download_cancel_requested', {'job_id': job_id})
+        send_webhook('download_cancel_requested', {'job_id': job_id})
+        log_download('system', None, '-', 'cancel_requested', message=f"Download cancel requested ({job_id or 'all'})")
+        return True
+
+    def pause_job(self, job_id):
+        """Pause one running download; the other workers keep going. False if not running."""
+        return self._set_job_paused(job_id, True)
+
+    def resume_job(self, job_id):
+        return self._set_job_paused(job_id, False)
+
+    def _set_job_paused(self, job_id, value):
+        with self.lock:
+            control = self.controls.get(job_id)
+            item = next((i for i in self.active_jobs.values() if i.get('job_id') == job_id), None)
+        if control is None or item is None:
+            return False
+        control.set_paused(value)
+        if value:
+            self.hosts.wakeup()
+        event = 'download_paused' if value else 'download_resumed'
+        self.logger.info(f"{event}: {item['filename']} ({job_id})")
+        ws_manager.broadcast(event, {'job_id': job_id, 'model_id': item['model_id'], 'filename': item['filename']})
+        return True
 
     def add_job(self, item, skipped=False, reason=None):
         # Universele skip-detectie: check altijd of al gedownload
-        if not skipped and is_already_downloaded(item.get('model_id'), item.get('model_version_id')):
+        if not skipped and self.downloaded.contains(item.get('model_id'), item.get('model_version_id')):
             skipped = True
             reason = "already downloaded"
+        if reason == "already downloaded":
+            # Opnieuw gevraagd = gebruikt: telt voor LRU eviction
+            self.evictor.touch(item.get('model_id'), item.get('model_version_id'))
+        # Met de content store wordt bekende inhoud gelinkt in plaats van overgeslagen
+        if not skipped and self.store is None and self.library.contains(item.get('sha256')):
+            skipped = True
+            reason = f"already in library: {self.library.path_for(item['sha256'])}"
         if skipped:
             msg = f"Download skipped: {item['filename']} (model_id={item['model_id']})"
             if reason:
@@ -219,46 +653,81 @@ class DownloadDaemon(threading.Thread):
                 download_time=0,
                 base_model=item.get('base_model')
             )
-            return
-        self.queue.put((item['priority'], time.time(), item))
+            return 'skipped'
+        for new, existing in self.queue.put((item['priority'], time.time(), item)):
+            self._handle_duplicate(new, existing)
+            return 'duplicate'
+        if self.prober is not None:
+            self.prober.wake()
         # Stuur direct een 'in_queue' event per model
         ws_manager.broadcast('in_queue', {'model_id': item['model_id'], 'filename': item['filename']})
-        ws_manager.broadcast('queue_update', {'queued': self.queue.qsize()})
+        ws_manager.broadcast('queue_update', {'queued': self.queue.qsize(), 'active': len(self.active_jobs)})
+        return 'queued'
+
+    def _handle_duplicate(self, new, existing):
+        """Apply duplicate_policy to a job that is already queued, running or waiting for a retry."""
+        policy = self.duplicate_policy
+        action = 'ignored'
+        if policy == 'raise_priority' and (new.get('priority') or 0) < (existing.get('priority') or 0):
+            self.queue.reprioritize(existing, new['priority'])
+            action = f"priority raised to {new['priority']}"
+        elif policy == 'replace_url' and new.get('url') and new['url'] != existing.get('url'):
+            # A running download picks up the new URL on its next attempt
+            existing['url'] = new['url']
+            if new.get('sha256'):
+                existing['sha256'] = new['sha256']
+            self.queue.update(existing)
+            action = 'url replaced'
+        self.logger.info(f"Duplicate job {new['filename']} (model_id={new['model_id']}): {action}")
+        ws_manager.broadcast('download_duplicate', {'model_id': new['model_id'], 'filename': new['filename'], 'action': action})
+
+    def add_jobs(self, items):
+        """Queue many jobs with one database round trip per step. Returns (queued, skipped, duplicates)."""
+        queued = []
+        skipped = []
+        for item in items:
+            if self.downloaded.contains(item.get('model_id'), item.get('model_version_id')):
+                skipped.append((item, 'already downloaded'))
+            elif self.store is None and self.library.contains(item.get('sha256')):
+                skipped.append((item, 'already in library'))
+            else:
+                queued.append(item)
+        if skipped:
+            self.evictor.touch_many([(item.get('model_id'), item.get('model_version_id'))
+                                     for item, reason in skipped if reason == 'already downloaded'])
+            log_downloads([(item['model_id'], item.get('model_version_id'), item['filename'], 'skipped',
+                            reason, item.get('model_type'), item.get('base_model')) for item, reason in skipped])
+            self.logger.info(f"Batch: skipped {len(skipped)} already downloaded jobs")
+        duplicates = self.queue.put_many(queued) if queued else []
+        for new, existing in duplicates:
+            self._handle_duplicate(new, existing)
+        count = len(queued) - len(duplicates)
+        if count and self.prober is not None:
+            self.prober.wake()
+        ws_manager.broadcast('batch_queued', {'queued': count, 'skipped': len(skipped), 'duplicates': len(duplicates)})
+        ws_manager.broadcast('queue_update', {'queued': self.queue.qsize(), 'active': len(self.active_jobs)})
+        return count, len(skipped), len(duplicates)
 
     def run(self):
-        self.logger.info("Daemon thread started")
-        send_webhook('daemon_started', {})
-        queue_was_empty = False
+        self.logger.info(f"Daemon thread started ({self.workers} workers)")
+        send_webhook('daemon_started', {'workers': self.workers})
+        # Wijzigingen in config.json live toepassen (throttle, workers, retries, ...)
+        app_config.subscribe(self.apply_config, LIVE_CONFIG_KEYS)
+        app_config.watch()
         try:
-            while self.running:
-                if self.paused:
-                    time.sleep(0.5)
-                    continue
-                try:
-                    # Remove and get the first item from the queue (active job is NOT in the queue)
-                    priority, ts, item = self.queue.get(timeout=1)
-                    if queue_was_empty:
-                        queue_was_empty = False
-                except queue.Empty:
-                    if not queue_was_empty:
-                        self.logger.info("Queue is empty, waiting for new jobs...")
-                        queue_was_empty = True
-                    ws_manager.broadcast('queue_empty', {})
-                    self.current_job = None
-                    time.sleep(1)
-                    continue
-                try:
-                    self.current_job = item
-                    self.process_item(item)
-                    self.current_job = None
-                except Exception as e:
-                    import traceback
-                    tb = traceback.format_exc()
-                    self.err_logger.error(f"Exception in process_item: {e}\n{tb}")
-                    log_error(item.get('model_id', 'unknown'), item.get('filename', '-'), f"Exception in process_item: {e}\n{tb}")
-                    ws_manager.broadcast('process_item_error', {'model_id': item.get('model_id'), 'filename': item.get('filename'), 'error': str(e)})
-                    send_webhook('process_item_error', {'model_id': item.get('model_id'), 'filename': item.get('filename'), 'error': str(e)})
-                    self.current_job = None
+            restored = self.queue.restore()
+            if restored:
+                self.logger.info(f"Restored {restored} pending jobs from the database")
+                ws_manager.broadcast('queue_update', {'queued': self.queue.qsize(), 'active': len(self.active_jobs)})
+            self._spawn_workers()
+            if self.prober is not None:
+                self.prober.start()
+                self.prober.wake()
+            self._check_idle()
+            if self.library_scan_on_start:
+                threading.Thread(target=self._scan_library_safe, name='library-scan', daemon=True).start()
+            with self._state_cond:
+                self._state_cond.wait_for(lambda: not self._run_flag)
         except Exception as e:
             import traceback
             tb = traceback.format_exc()
@@ -266,230 +735,908 @@ class DownloadDaemon(threading.Thread):
             log_error('system', '-', f"Daemon thread crashed: {e}\n{tb}")
             send_webhook('daemon_crashed', {'error': str(e)})
         finally:
-            self.current_job = None
+            self.running = False
+            app_config.unsubscribe(self.apply_config)
+            if self.prober is not None:
+                self.prober.stop()
+            with self.lock:
+                threads = list(self._worker_threads.values())
+            for t in threads:
+                t.join(timeout=5)
+            # Bestanden die nog geverifieerd worden afmaken, anders blijven ze zonder status
+            self.verifier.shutdown(wait=True)
+            if self.mover is not None:
+                self.mover.shutdown(wait=True)
             self.logger.warning("Daemon thread stopped")
             send_webhook('daemon_stopped', {})
             # log_download('system', None, '-', 'stopped', message='Daemon thread stopped')
 
-    def send_webhook(event, data):
+    def _worker_loop(self, index):
+        name = threading.current_thread().name
+        self.logger.info(f"Worker {name} started")
+        # Workers met index >= self.workers zijn overtollig na een resize en stoppen
+        retired = lambda: not self.running or index >= self.workers
         try:
-            config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'configs', 'config.json'))
-            if not os.path.exists(config_path):
-                return
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            url = config.get('webhook_url')
-            if not url:
-                return
-            payload = {'event': event, 'data': data}
-            httpx.post(url, json=payload, timeout=5)
-        except Exception:
-            pass
-
-    def process_item(self, item):
-        self.logger.info(f"Starting download: {item['filename']} (model_id={item['model_id']}, url={item.get('url')})")
-        ws_manager.broadcast('download_start', {'model_id': item['model_id'], 'filename': item['filename']})
-        send_webhook('download_start', {'model_id': item['model_id'], 'filename': item['filename']})
-        # Voeg toe aan actieve downloads
-        self.active_downloads.append(item)
-        try:
-            for attempt in range(self.max_retries):
+            while not retired():
                 try:
-                    self.logger.info(f"Attempt {attempt+1}/{self.max_retries} for {item['filename']}")
-                    self.cancel_current = False
-                    t0 = time.time()
-                    success, filepath = self._download_file(item)
-                    t1 = time.time()
-                    download_time = round(t1 - t0, 3)
-                    file_size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
-                    if success:
-                        self.logger.success(f"Download finished: {item['filename']} ({file_size} bytes, {download_time}s)")
-                        if item.get('sha256'):
-                            ws_manager.broadcast('hash_start', {
-                                'filename': item['filename'],
-                                'model_id': item['model_id'],
-                                'model_version_id': item.get('model_version_id')
-                            })
-                            self.logger.info(f"Verifying SHA256 for {item['filename']}")
-                            expected_hash = str(item['sha256']).lower()
-                            result = self.verify_hash(filepath, expected_hash, item.get('model_id'), item.get('model_version_id'))
-                            actual_hash = None
-                            with open(filepath, 'rb') as f:
-                                sha256 = hashlib.sha256()
-                                while True:
-                                    chunk = f.read(1024*1024)
-                                    if not chunk:
-                                        break
-                                    sha256.update(chunk)
-                                actual_hash = sha256.hexdigest().lower()
-                            if not result:
-                                msg = (f"SHA256 mismatch for {item['filename']}\n"
-                                       f"Expected: {expected_hash}\n"
-                                       f"Actual:   {actual_hash}")
-                                self.err_logger.error(msg)
-                                log_error(item['model_id'], item['filename'], msg)
-                                raise ValueError('SHA256 mismatch')
-                            else:
-                                self.logger.success(f"SHA256 verified for {item['filename']}")
-                                ws_manager.broadcast('hash_finished', {
-                                    'filename': item['filename'],
-                                    'model_id': item['model_id'],
-                                    'model_version_id': item.get('model_version_id'),
-                                    'sha256': actual_hash
-                                })
-                        log_download(
-                            item['model_id'],
-                            item.get('model_version_id'),
-                            item['filename'],
-                            f'success',
-                            message=f'success ({file_size} bytes, UA=CivitaiDaemon)',
-                            model_type=item.get('model_type'),
-                            file_size=file_size,
-                            download_time=download_time,
-                            base_model=item.get('base_model')
-                        )
-                        ws_manager.broadcast('download_finished', {
-                            'model_id': item['model_id'],
-                            'filename': item['filename'],
-                            'file_size': file_size,
-                            'download_time': download_time
-                        })
-                        send_webhook('download_finished', {
-                            'model_id': item['model_id'],
-                            'filename': item['filename'],
-                            'file_size': file_size,
-                            'download_time': download_time
-                        })
-                        # Voeg toe aan laatste downloads (max 5)
-                        self.last_downloaded.insert(0, {
-                            'model_id': item['model_id'],
-                            'filename': item['filename'],
-                            'file_size': file_size,
-                            'download_time': download_time,
-                            'model_type': item.get('model_type'),
-                            'model_version_id': item.get('model_version_id'),
-                            'base_model': item.get('base_model')
-                        })
-                        if len(self.last_downloaded) > 5:
-                            self.last_downloaded = self.last_downloaded[:5]
-                        # Voeg toe aan all_downloaded
-                        self.all_downloaded.insert(0, {
-                            'model_id': item['model_id'],
-                            'model_version_id': item.get('model_version_id'),
-                            'filename': item['filename'],
-                            'file_size': file_size,
-                            'download_time': download_time,
-                            'model_type': item.get('model_type'),
-                            'base_model': item.get('base_model')
-                        })
-                        return True
-                    else:
-                        self.err_logger.warning(f"Download failed for {item['filename']} (no exception, returned False)")
-                        log_download(
-                            item['model_id'],
-                            item.get('model_version_id'),
-                            item['filename'],
-                            'failed',
-                            message='Download failed',
-                            model_type=item.get('model_type'),
-                            file_size=file_size,
-                            download_time=download_time,
-                            base_model=item.get('base_model')
-                        )
-                        raise Exception('Download failed')
+                    # Blokkeert tot er een job is (of een retry due is); pauze houdt de queue vast
+                    priority, ts, item = self.queue.get(stop=retired)
+                except queue.Empty:
+                    continue
+                self._idle = False
+                # Control al bij het ophalen: een cancel tijdens _admit gaat niet verloren
+                self._control(item)
+                try:
+                    admitted = not self._cancel_requested(item, message='Cancelled before start') \
+                        and self._admit(item) and not self._cancel_requested(item, message='Cancelled before start')
+                except Exception as e:
+                    # Fout bij het reserveren (bv. sqlite): job telt als mislukte poging, de worker gaat door
+                    self._attempt_failed(item, e)
+                    admitted = False
+                if not admitted:
+                    self._check_idle()
+                    continue
+                try:
+                    self._record_wait(item)
+                except Exception as e:
+                    self.err_logger.error(f"Failed to record queue wait for {item['filename']}: {e}")
+                if self.prober is not None:
+                    # Het venster van komende jobs schuift op
+                    self.prober.wake()
+                try:
+                    self.process_item(item, wait=False)
                 except Exception as e:
                     import traceback
                     tb = traceback.format_exc()
-                    self.err_logger.error(f"Download failed: {item['filename']} (url: {item.get('url')}) ({e})\nTraceback:\n{tb}")
-                    log_error(item['model_id'], item['filename'], f"{e}\nURL: {item.get('url')}\nTraceback:\n{tb}")
-                    ws_manager.broadcast('download_error', {'model_id': item['model_id'], 'filename': item['filename'], 'error': str(e)})
-                    send_webhook('download_error', {'model_id': item['model_id'], 'filename': item['filename'], 'error': str(e)})
-                    # Cleanup incomplete file
-                    filepath = os.path.join(self.download_dir, item['filename'])
-                    if os.path.exists(filepath):
-                        try:
-                            os.remove(filepath)
-                            self.logger.info(f"Removed incomplete file: {filepath}")
-                        except Exception as cleanup_err:
-                            self.err_logger.warning(f"Failed to remove incomplete file {filepath}: {cleanup_err}")
-                    item['retries'] += 1
-                    if item['retries'] < self.max_retries:
-                        self.logger.warning(f"Retrying {item['filename']} (retry {item['retries']}/{self.max_retries}) after 2s...")
-                        time.sleep(2)
-                    else:
-                        self.err_logger.error(f"Max retries reached for: {item['filename']}")
-                        ws_manager.broadcast('download_failed', {
-                            'model_id': item['model_id'],
-                            'filename': item['filename'],
-                            'error': f'Max retries ({self.max_retries}) reached.'
-                        })
-                        send_webhook('download_failed', {
-                            'model_id': item['model_id'],
-                            'filename': item['filename'],
-                            'error': f'Max retries ({self.max_retries}) reached.'
-                        })
-                        return False
+                    self.err_logger.error(f"Exception in process_item: {e}\n{tb}")
+                    log_error(item.get('model_id', 'unknown'), item.get('filename', '-'), f"Exception in process_item: {e}\n{tb}")
+                    ws_manager.broadcast('process_item_error', {'model_id': item.get('model_id'), 'filename': item.get('filename'), 'error': str(e)})
+                    send_webhook('process_item_error', {'model_id': item.get('model_id'), 'filename': item.get('filename'), 'error': str(e)})
+                self._check_idle()
+        finally:
+            with self.lock:
+                if self._worker_threads.get(index) is threading.current_thread():
+                    del self._worker_threads[index]
+            self.logger.info(f"Worker {name} stopped")
+
+    def _record_downloaded(self, item, file_size, download_time):
+        # Caller holds self.lock
+        self.last_downloaded.appendleft({
+            'model_id': item['model_id'],
+            'filename': item['filename'],
+            'file_size': file_size,
+            'download_time': download_time,
+            'model_type': item.get('model_type'),
+            'model_version_id': item.get('model_version_id'),
+            'base_model': item.get('base_model')
+        })
+        self.downloaded.add(item['model_id'], item.get('model_version_id'))
+
+    def process_item(self, item, wait=True):
+        """Download stage of one attempt; verification runs on the verify pool.
+
+        With wait=True (default) the verification result is returned (True/False).
+        The workers pass wait=False and get a Future back, so the next download can
+        start while this file is being hashed.
+        """
+        self.logger.info(f"Starting download: {item['filename']} (model_id={item['model_id']}, url={item.get('url')})")
+        worker = threading.current_thread().name
+        ws_manager.broadcast('download_start', {'model_id': item['model_id'], 'filename': item['filename'], 'worker': worker})
+        send_webhook('download_start', {'model_id': item['model_id'], 'filename': item['filename'], 'worker': worker})
+        # Registreer als actieve download van deze worker
+        control = self._control(item)
+        with self.lock:
+            self.active_jobs[worker] = item
+        try:
+            self.logger.info(f"Attempt {item['retries']+1}/{self.max_retries} for {item['filename']}")
+            for key in ('computed_sha256', 'last_status', 'retry_after'):
+                item.pop(key, None)
+            linked = self._link_from_store(item)
+            if linked:
+                # Inhoud staat al in de store: geen download, alleen een link
+                return self._verify_and_finalize(item, linked, os.path.getsize(linked), 0.0)
+            t0 = time.time()
+            success, filepath = self._download_file(item)
+            t1 = time.time()
+            download_time = round(t1 - t0, 3)
+            file_size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+            if not success and control.cancelled:
+                # Geannuleerd door de gebruiker: geen retry
+                self.logger.info(f"Download cancelled: {item['filename']}")
+                log_download(item['model_id'], item.get('model_version_id'), item['filename'], 'cancelled',
+                             message='Cancelled by user', model_type=item.get('model_type'),
+                             file_size=file_size, download_time=download_time, base_model=item.get('base_model'))
+                self._finish(item, 'cancelled')
+                return False
+            if not success:
+                self.err_logger.warning(f"Download failed for {item['filename']} (no exception, returned False)")
+                log_download(
+                    item['model_id'],
+                    item.get('model_version_id'),
+                    item['filename'],
+                    'failed',
+                    message='Download failed',
+                    model_type=item.get('model_type'),
+                    file_size=file_size,
+                    download_time=download_time,
+                    base_model=item.get('base_model')
+                )
+                raise Exception('Download failed')
+            self.logger.success(f"Download finished: {item['filename']} ({file_size} bytes, {download_time}s)")
+            if self._needs_file_read(item, self._target_path(item)):
+                # File has to be read again: hand it to the verify stage, the worker moves on
+                with self.lock:
+                    self.verifying[item['job_id']] = item
+                future = self.verifier.submit(self._verify_and_finalize, item, filepath, file_size, download_time)
+                return future.result() if wait else future
+            return self._verify_and_finalize(item, filepath, file_size, download_time)
+        except Exception as e:
+            self._attempt_failed(item, e)
+            return False
         finally:
             # Verwijder uit actieve downloads
-            if item in self.active_downloads:
-                self.active_downloads.remove(item)
+            with self.lock:
+                if self.active_jobs.get(worker) is item:
+                    del self.active_jobs[worker]
 
-    def _download_file(self, item):
-        """Download logic, returns (True, filepath) on success, (False, filepath) on failure/cancel."""
-        self.logger.info(f"Start download: {item['filename']}")
-        model_type = item.get('model_type', 'other')
-        subdir = os.path.join('data', 'models', model_type)
-        os.makedirs(subdir, exist_ok=True)
-        filepath = os.path.join(subdir, item['filename'])
-        # Cleanup incomplete file if exists
+    def _link_from_store(self, item):
+        """Materialize a job whose sha256 is already stored (or in the library) as a link.
+
+        Returns the target path, or None when the content has to be downloaded.
+        """
+        sha256 = (item.get('sha256') or '').lower()
+        if self.store is None or not sha256:
+            return None
+        if not self.store.has(sha256):
+            # Bestand dat de library scanner vond eerst in de store opnemen
+            source = self.library.path_for(sha256)
+            if not source or not os.path.exists(source):
+                return None
+            self.store.adopt(source, sha256)
+        filepath = self._target_path(item)
+        if not self.store.link(sha256, filepath):
+            return None
+        self.logger.info(f"Linked {item['filename']} from content store (blob {sha256[:12]})")
+        item['computed_sha256'] = sha256
+        return filepath
+
+    def _verify_and_finalize(self, item, filepath, file_size, download_time):
+        """Verification stage: check the SHA256, rename into place, mark the job success. Returns True/False.
+
+        filepath is the downloaded (part) file; it gets its final name only when it passed.
+        """
+        try:
+            if self._cancel_requested(item, filepath):
+                return False
+            expected = normalize_hashes(item.get('hashes'), item.get('sha256'))
+            target = self._target_path(item)
+            if target.endswith('.safetensors') and self._needs_file_read(item, target):
+                # Milliseconden: een afgekapt bestand wordt afgekeurd voordat er iets gehasht wordt
+                check_safetensors_header(filepath)
+            if expected:
+                ws_manager.broadcast('hash_start', {
+                    'filename': item['filename'],
+                    'model_id': item['model_id'],
+                    'model_version_id': item.get('model_version_id')
+                })
+                actual_hash = item.get('computed_sha256')
+                if actual_hash and not self.paranoid_verify and choose_algorithm(expected, 'sha256') == 'sha256':
+                    # Digest is computed while streaming, no need to read the file again
+                    algo = 'sha256'
+                    self.logger.info(f"Verifying SHA256 for {item['filename']} (computed during download)")
+                    ws_manager.broadcast('hash_progress', self._hash_event(filepath, 100.0, item.get('model_id'), item.get('model_version_id')))
+                else:
+                    algo = choose_algorithm(expected, self.verify_policy)
+                    self.logger.info(f"Verifying {algo.upper()} for {item['filename']}")
+                    actual_hash = self.hash_file(filepath, item.get('model_id'), item.get('model_version_id'), algo=algo)
+                if not hash_matches(expected, algo, actual_hash):
+                    msg = (f"{algo.upper()} mismatch for {item['filename']}\n"
+                           f"Expected: {expected.get(algo) or expected.get('autov2')}\n"
+                           f"Actual:   {actual_hash}")
+                    self.err_logger.error(msg)
+                    log_error(item['model_id'], item['filename'], msg)
+                    raise IntegrityError(f'{algo.upper()} mismatch')
+                self.logger.success(f"{algo.upper()} verified for {item['filename']}")
+                ws_manager.broadcast('hash_finished', {
+                    'filename': item['filename'],
+                    'model_id': item['model_id'],
+                    'model_version_id': item.get('model_version_id'),
+                    'sha256': actual_hash if algo == 'sha256' else item.get('sha256'),
+                    'algorithm': algo,
+                    'hash': actual_hash
+                })
+            if self.mover is not None and self._on_scratch(filepath) and os.path.exists(filepath):
+                # Geverifieerd op de scratch disk; de mover zet het in download_dir en rondt de job af
+                with self.lock:
+                    self.moving[item['job_id']] = item
+                self.mover.submit(self._move_and_finalize, item, filepath, file_size, download_time, expected)
+                return True
+            return self._finalize(item, filepath, file_size, download_time, expected)
+        except Exception as e:
+            self._attempt_failed(item, e)
+            return False
+        finally:
+            with self.lock:
+                verifying = self.verifying.pop(item.get('job_id'), None)
+            if verifying is not None:
+                self._check_idle()
+
+    def _move_and_finalize(self, item, filepath, file_size, download_time, expected):
+        """Mover stage: copy a verified file from scratch to download_dir, then mark the job success."""
+        try:
+            if self._cancel_requested(item, filepath):
+                return False
+            target = self._target_path(item)
+            self.logger.info(f"Moving {item['filename']} to {target}")
+            self.mover.move(filepath, target)
+            _remove_partial(filepath)
+            return self._finalize(item, target, file_size, download_time, expected)
+        except Exception as e:
+            self._attempt_failed(item, e)
+            return False
+        finally:
+            with self.lock:
+                self.moving.pop(item.get('job_id'), None)
+            self._check_idle()
+
+    def _finalize(self, item, filepath, file_size, download_time, expected):
+        """Give a verified file its final name and record the job as success."""
+        # Pas na verificatie onder de definitieve naam en als success in de database
         if os.path.exists(filepath):
+            filepath = self._commit_download(item, filepath)
+        log_download(
+            item['model_id'],
+            item.get('model_version_id'),
+            item['filename'],
+            f'success',
+            message=f'success ({file_size} bytes, UA=CivitaiDaemon)',
+            model_type=item.get('model_type'),
+            file_size=file_size,
+            download_time=download_time,
+            base_model=item.get('base_model')
+        )
+        ws_manager.broadcast('download_finished', {
+            'model_id': item['model_id'],
+            'filename': item['filename'],
+            'file_size': file_size,
+            'download_time': download_time
+        })
+        send_webhook('download_finished', {
+            'model_id': item['model_id'],
+            'filename': item['filename'],
+            'file_size': file_size,
+            'download_time': download_time
+        })
+        # Voeg toe aan laatste downloads (max 5)
+        with self.lock:
+            self._record_downloaded(item, file_size, download_time)
+        sha256 = expected.get('sha256') or item.get('computed_sha256')
+        if sha256:
+            if self.store is not None:
+                self.store.adopt(filepath, sha256)
+            self.library.add_file(filepath, sha256)
+        self.evictor.record(item, filepath, file_size)
+        self._finish(item, 'done')
+        return True
+
+    def _needs_file_read(self, item, filepath):
+        """True when verification has to read the finished file (not just compare the inline SHA256)."""
+        expected = normalize_hashes(item.get('hashes'), item.get('sha256'))
+        if not expected:
+            # Zonder hashes alleen de goedkope header-check voor safetensors
+            return filepath.endswith('.safetensors')
+        if self.paranoid_verify or not item.get('computed_sha256'):
+            return True
+        return choose_algorithm(expected, 'sha256') != 'sha256'
+
+    def _attempt_failed(self, item, e):
+        """Log a failed attempt (download or verification) and retry or give up. Call from an except block."""
+        import traceback
+        tb = traceback.format_exc()
+        self.err_logger.error(f"Download failed: {item['filename']} (url: {item.get('url')}) ({e})\nTraceback:\n{tb}")
+        log_error(item['model_id'], item['filename'], f"{e}\nURL: {item.get('url')}\nTraceback:\n{tb}")
+        ws_manager.broadcast('download_error', {'model_id': item['model_id'], 'filename': item['filename'], 'error': str(e)})
+        send_webhook('download_error', {'model_id': item['model_id'], 'filename': item['filename'], 'error': str(e)})
+        # Partial data stays in the .part file for the next attempt; only a
+        # completed file that failed verification is removed
+        filepath = self._target_path(item)
+        if isinstance(e, IntegrityError):
+            item['hash_failures'] = item.get('hash_failures', 0) + 1
+            # Afgekeurde download nooit hervatten
+            _remove_partial(self._part_path(item))
+        if isinstance(e, IntegrityError) and os.path.exists(filepath):
             try:
                 os.remove(filepath)
-            except Exception:
-                pass
+                self.logger.info(f"Removed corrupt file: {filepath}")
+            except Exception as cleanup_err:
+                self.err_logger.warning(f"Failed to remove corrupt file {filepath}: {cleanup_err}")
+        item['retries'] += 1
+        permanent = self._is_permanent_failure(item)
+        if permanent or item['retries'] >= self.max_retries:
+            reason = permanent or f'Max retries ({self.max_retries}) reached.'
+            self.err_logger.error(f"Giving up on {item['filename']}: {reason}")
+            ws_manager.broadcast('download_failed', {
+                'model_id': item['model_id'],
+                'filename': item['filename'],
+                'error': reason
+            })
+            send_webhook('download_failed', {
+                'model_id': item['model_id'],
+                'filename': item['filename'],
+                'error': reason
+            })
+            self._finish(item, 'failed')
+        else:
+            # Niet blokkeren: job gaat terug in de wachtrij met een not-before tijdstip
+            self._schedule_retry(item)
+
+    def _is_permanent_failure(self, item):
+        """Reason string when retrying cannot help, else None."""
+        if self._control(item).cancelled:
+            return 'Cancelled by user.'
+        status_code = item.get('last_status')
+        if status_code in PERMANENT_HTTP_STATUS:
+            return f'HTTP {status_code} is permanent, not retrying.'
+        if item.get('hash_failures', 0) >= 2:
+            return 'Integrity check failed on two downloads, not retrying.'
+        return None
+
+    def _retry_delay(self, item):
+        # Exponential backoff with equal jitter; Retry-After from a 429/503 takes precedence
+        delay = min(self.retry_backoff_max, self.retry_backoff * (2 ** max(0, item['retries'] - 1)))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        retry_after = item.get('retry_after')
+        if retry_after is not None:
+            delay = max(delay, min(float(retry_after), RETRY_AFTER_MAX))
+        return delay
+
+    def _schedule_retry(self, item):
+        delay = self._retry_delay(item)
+        self.queue.put_delayed(item, time.time() + delay)
+        self._release_disk(item)
+        self.logger.warning(f"Retrying {item['filename']} (retry {item['retries']}/{self.max_retries}) in {delay:.1f}s")
+        ws_manager.broadcast('download_retry', {
+            'model_id': item['model_id'],
+            'filename': item['filename'],
+            'retries': item['retries'],
+            'retry_in': round(delay, 1)
+        })
+
+    def _promote_due_retries(self):
+        """Move retry jobs whose not-before time has passed back into the main queue."""
+        return self.queue.promote_due()
+
+    def apply_config(self, values, changed):
+        """Config subscriber: apply reloaded config.json values to the running daemon."""
+        changed = set(changed) - self._pinned
+        if changed & {'throttle', 'throttle_per_job', 'throttle_schedule'}:
+            try:
+                self.set_throttle(
+                    throttle=None if 'throttle' in self._pinned else values.get('throttle', 0),
+                    per_job=values.get('throttle_per_job', 0),
+                    schedule=values.get('throttle_schedule', []),
+                )
+            except ValueError as e:
+                self.err_logger.error(f"Ignoring throttle settings from config: {e}")
+        if 'workers' in changed:
+            try:
+                self.set_workers(values.get('workers', 1))
+            except ValueError as e:
+                self.err_logger.error(f"Ignoring workers from config: {e}")
+        if 'retries' in changed:
+            self.max_retries = values.get('retries', 5)
+        if changed & {'disk_free_floor', 'disk_reserve_unknown'}:
+            self.disk.floor = int(values.get('disk_free_floor', 1024 ** 3))
+            self.disk.unknown = int(values.get('disk_reserve_unknown', 2 * 1024 ** 3))
+        if changed & {'disk_budgets', 'disk_budget_total'}:
+            self.evictor.configure(values.get('disk_budgets'), values.get('disk_budget_total'))
+        if 'evict_on_low_space' in changed:
+            self.evict_on_low_space = bool(values.get('evict_on_low_space', False))
+        if 'timeout' in changed:
+            self.timeout = values.get('timeout', 60.0)
+            if self.prober is not None:
+                self.prober.timeout = self.timeout
+        if 'retry_backoff' in changed:
+            self.retry_backoff = values.get('retry_backoff', 2.0)
+        if 'retry_backoff_max' in changed:
+            self.retry_backoff_max = values.get('retry_backoff_max', 300.0)
+        if 'download_dir' in changed:
+            self.download_dir = values.get('download_dir', '')
+            self.library.root = self._library_root()
+        if 'segmented_download' in changed:
+            self.segment_config = values.get('segmented_download', {})
+        if 'write_buffer_size' in changed:
+            self.write_buffer = values.get('write_buffer_size', DEFAULT_WRITE_BUFFER)
+        if 'fsync_downloads' in changed:
+            self.fsync_downloads = values.get('fsync_downloads', False)
+            if self.mover is not None:
+                self.mover.fsync = self.fsync_downloads
+        if changed & {'host_concurrency', 'host_concurrency_min', 'host_concurrency_max'}:
+            self.hosts.configure(initial=values.get('host_concurrency'), minimum=values.get('host_concurrency_min'),
+                                 maximum=values.get('host_concurrency_max'))
+        if 'mover_throttle' in changed and self.mover is not None:
+            self.mover.set_limit(values.get('mover_throttle', 0))
+        if 'paranoid_verify' in changed:
+            self.paranoid_verify = values.get('paranoid_verify', False)
+        if 'verify_policy' in changed and values.get('verify_policy', 'sha256') in VERIFY_POLICIES:
+            self.verify_policy = values.get('verify_policy', 'sha256')
+        if 'duplicate_policy' in changed and values.get('duplicate_policy', 'ignore') in DUPLICATE_POLICIES:
+            self.duplicate_policy = values.get('duplicate_policy', 'ignore')
+        if changed & {'scheduling_policy', 'scheduling_unknown_size', 'scheduling_aging', 'scheduling_weights'}:
+            try:
+                self.set_scheduling(values.get('scheduling_policy', 'fifo'))
+            except ValueError as e:
+                self.err_logger.error(f"Ignoring scheduling settings from config: {e}")
+        self.logger.info(f"Applied config changes: {', '.join(sorted(changed)) or 'none'}")
+
+    def _make_policy(self, values, name=None):
+        return make_policy(
+            name or values.get('scheduling_policy', 'fifo'),
+            unknown_size=values.get('scheduling_unknown_size', 2 * 1024 ** 3),
+            aging=values.get('scheduling_aging', 3600.0),
+            weights=values.get('scheduling_weights'),
+        )
+
+    def set_scheduling(self, policy=None):
+        """Switch the queue to another scheduling policy at runtime; raises ValueError for an unknown one."""
+        new = self._make_policy(app_config.snapshot(), policy)
+        self.queue.set_policy(new)
+        self.logger.info(f"Scheduling policy set to '{new.name}'")
+        ws_manager.broadcast('queue_update', {'queued': self.queue.qsize(), 'active': len(self.active_jobs)})
+        return new.name
+
+    def _record_wait(self, item):
+        # Wachttijd sinds de job (opnieuw) in de queue kwam; per policy opgeslagen
+        wait = max(0.0, time.time() - item.get('queued_at', time.time()))
+        record_queue_wait(self.queue.policy.name, flow_of(item), item.get('model_type'), job_size(item),
+                          item.get('priority'), round(wait, 3))
+
+    def set_throttle(self, throttle=None, per_job=None, schedule=None):
+        """Change the bandwidth limits at runtime (MB/s, 0 = unlimited)."""
+        self.limiter.configure(limit=throttle, per_job=per_job, schedule=schedule)
+        self.throttle = self.limiter.limit
+        status = self.limiter.status()
+        self.logger.info(f"Bandwidth limit changed: {status}")
+        ws_manager.broadcast('throttle_changed', status)
+        return status
+
+    def refetch(self, model_id, model_version_id):
+        """Queue an evicted model again from its last eviction record. Returns the add_job result or None."""
+        evictions = load_evictions(1, model_id, model_version_id)
+        if not evictions:
+            return None
+        row = evictions[0]
+        item = make_queue_item(row['model_id'], row['url'], row['filename'], sha256=row['sha256'],
+                               model_type=row['model_type'], model_version_id=row['model_version_id'],
+                               base_model=row['base_model'])
+        return self.add_job(item)
+
+    def _scan_library_safe(self):
+        try:
+            self.scan_library()
+        except Exception as e:
+            self.err_logger.error(f"Library scan failed: {e}")
+
+    def _library_root(self):
+        return self.download_dir or os.path.join('data', 'models')
+
+    def _part_path(self, item):
+        """Where a job is downloaded: <filepath>.part, or the same layout under scratch_dir."""
+        if self.scratch_dir:
+            return os.path.join(self.scratch_dir, item.get('model_type') or 'other', item['filename']) + PART_SUFFIX
+        return self._target_path(item) + PART_SUFFIX
+
+    def _on_scratch(self, path):
+        if not self.scratch_dir:
+            return False
+        return os.path.abspath(path).startswith(os.path.abspath(self.scratch_dir) + os.sep)
+
+    def _target_path(self, item):
+        """Final location of a job: <download_dir>/<model_type>/<filename>."""
+        return os.path.join(self._library_root(), item.get('model_type') or 'other', item['filename'])
+
+    def scan_library(self):
+        """Hash new and changed files in the download tree (see Library.scan). Returns counters."""
+        ws_manager.broadcast('library_scan_started', {'root': self.library.root})
+        stats = self.library.scan()
+        ws_manager.broadcast('library_scan_finished', stats)
+        return stats
+
+    def _auth_headers(self):
         # Add Civitai API key if present
-        config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'configs', 'config.json'))
-        api_key = None
-        if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                api_key = config.get('civitai_api_key')
-        headers = {'User-Agent': f'CivitaiDaemon/1.0 (Python httpx)'}
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
+        api_key = app_config.get('civitai_api_key')
+        return {'Authorization': f'Bearer {api_key}'} if api_key else {}
+
+    def _preflight_candidates(self):
+        """Queued jobs in dispatch order (retry-waiting jobs are not probed)."""
+        _, items = self.queue.listing()
+        return items[:self.queue.qsize()]
+
+    def _preflight_done(self, item, result):
+        """Store a pre-flight result on the job; a dead link fails the job before it takes a worker."""
+        item['preflight'] = result
+        status_code = result.get('status')
+        if status_code not in PERMANENT_HTTP_STATUS:
+            self.queue.update(item)
+            # Met sjf schuift de job op nu de grootte bekend is
+            self.queue.resort(item)
+            return
+        if self.queue.remove(item['job_id']) is not item:
+            return  # al door een worker opgepakt; die krijgt dezelfde status
+        item['last_status'] = status_code
+        self.prober.dead += 1
+        self._give_up(item, f'Pre-flight: HTTP {status_code}, link is dead.')
+        ws_manager.broadcast('queue_update', {'queued': self.queue.qsize(), 'active': len(self.active_jobs)})
+
+    def _preflight_size(self, item):
+        """File size found by the pre-flight stage, or None."""
+        result = item.get('preflight')
+        return result.get('size') if result and not result.get('error') else None
+
+    def queued_bytes(self):
+        """(bytes of queued jobs with a known size, number of queued jobs with an unknown size)."""
+        known, unknown = 0, 0
+        _, items = self.queue.listing()
+        for item in items:
+            size = self._preflight_size(item)
+            if size:
+                known += size
+            else:
+                unknown += 1
+        return known, unknown
+
+    def _download_file(self, item):
+        """Download logic, returns (True, filepath) on success, (False, filepath) on failure/cancel.
+
+        Data is written to ``<filepath>.part``; a sidecar ``<filepath>.part.json`` keeps the url,
+        validators and bytes written so a retry (or a daemon restart) continues with a Range request.
+        On success the returned path is the finished part file: it is renamed to filepath only
+        after verification (_commit_download), so readers never see a half-written model.
+        """
+        self.logger.info(f"Start download: {item['filename']}")
+        filepath = self._target_path(item)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        part_path = self._part_path(item)
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        # Bestaande .part alleen hervatten als die bij dezelfde url hoort
+        meta = _read_part_meta(part_path)
+        if not (meta and meta.get('url') == item['url'] and os.path.exists(part_path)):
+            if meta or os.path.exists(part_path):
+                _remove_partial(part_path)
+            meta = None
+        if meta and meta.get('complete') and os.path.getsize(part_path) == meta.get('total'):
+            # Vorige poging was klaar maar niet geverifieerd (bv. herstart): opnieuw verifiëren
+            self.logger.info(f"Found complete unverified download for {item['filename']}")
+            return True, part_path
+        headers = self._auth_headers()
         try:
-            with httpx.stream('GET', item['url'], timeout=self.timeout, headers=headers, follow_redirects=True) as r:
-                try:
-                    r.raise_for_status()
-                except httpx.HTTPStatusError as http_err:
-                    # Log statuscode, response body en redirect chain
-                    body = r.read().decode(errors='replace') if hasattr(r, 'read') else ''
-                    redirects = []
-                    if hasattr(r, 'history') and r.history:
-                        for resp in r.history:
-                            redirects.append(f"{resp.status_code} -> {resp.headers.get('location', '')}")
-                    redirect_info = f" Redirect chain: {' | '.join(redirects)}" if redirects else ''
-                    self.err_logger.error(f"HTTP error {r.status_code} for {item['url']}: {body}{redirect_info}")
-                    return False, filepath
-                total = int(r.headers.get('content-length', 0))
-                downloaded = 0
-                last_progress_sent = 0
-                with open(filepath, 'wb') as f:
+            if meta is None or meta.get('segments'):
+                result = self._download_segmented(item, filepath, part_path, meta, headers)
+                if result is not None:
+                    return result
+                meta = None
+            while True:
+                result = self._download_single(item, filepath, part_path, meta, headers)
+                if result is not None:
+                    return result
+                # Gepauzeerd: na resume verder met een Range request vanaf de sidecar
+                self._wait_while_paused(self._control(item))
+                meta = _read_part_meta(part_path)
+        except Exception as e:
+            self.err_logger.error(f"Exception during download for {item.get('url')}: {e}")
+            return False, filepath
+
+    def _segment_settings(self, item):
+        settings = {'segments': 1, 'min_segment_size': DEFAULT_MIN_SEGMENT_SIZE}
+        settings.update(self.segment_config.get('default', {}))
+        settings.update(self.segment_config.get(item.get('model_type') or 'other', {}))
+        return settings
+
+    def _download_segmented(self, item, filepath, part_path, meta, headers):
+        """Download one file over several Range connections into a preallocated part file.
+
+        Returns None when segmenting does not apply (disabled for this model_type, file too
+        small or no range support) so the caller falls back to a single stream.
+        """
+        settings = self._segment_settings(item)
+        if not meta and int(settings['segments']) < 2:
+            return None
+        # Size, range support and the final (CDN) url: from the pre-flight stage when that
+        # result is still fresh, else probed now with a one-byte range request
+        control = self._control(item)
+        result = item.get('preflight')
+        if not is_fresh(result):
+            slot = self.hosts.acquire(item['url'], abort=lambda: control.cancelled or not self.running)
+            if slot is None:
+                return False, filepath
+            with slot:
+                result = probe(self.http, item['url'], headers, self.timeout)
+                slot.status = result.get('status')
+            if result.get('error'):
+                self.err_logger.error(f"Probe failed for {item['url']}: {result['error']}")
+                return False, filepath
+            item['preflight'] = result
+        total = result['size'] if result.get('status') == 206 else None
+        final_url = result['final_url']
+        etag = result.get('etag')
+        last_modified = result.get('last_modified')
+        if not total:
+            if meta:
+                _remove_partial(part_path)
+            return None
+        if meta and (meta.get('total') != total or (meta.get('etag') and etag and meta.get('etag') != etag)):
+            self.logger.warning(f"File changed upstream for {item['filename']}, restarting segmented download")
+            _remove_partial(part_path)
+            meta = None
+        if meta:
+            segments = meta['segments']
+            self.logger.info(f"Resuming segmented download of {item['filename']} ({len(segments)} segments)")
+        else:
+            count = min(int(settings['segments']), total // max(1, int(settings['min_segment_size'])))
+            if count < 2:
+                return None
+            size = total // count
+            segments = [[i * size, (i + 1) * size - 1 if i < count - 1 else total - 1, 0] for i in range(count)]
+            with open(part_path, 'wb') as f:
+                _preallocate(f.fileno(), total)
+        # Auth header hoort niet bij een signed CDN url op een andere host
+        seg_headers = dict(headers)
+        if httpx.URL(final_url).host != httpx.URL(item['url']).host:
+            seg_headers.pop('Authorization', None)
+        self.disk.update(item['job_id'], total)
+        meta = {'url': item['url'], 'etag': etag, 'last_modified': last_modified, 'total': total,
+                'bytes': sum(seg[2] for seg in segments), 'segments': segments}
+        _write_part_meta(part_path, meta)
+        job_bucket = self.limiter.job_bucket()
+        lock = threading.Condition()
+        stop = threading.Event()
+        cancelled = threading.Event()
+        finished = threading.Event()
+        errors = []
+        state = {'last_progress_sent': 0, 'last_meta_saved': time.time(), 'hashed': 0}
+        sha256 = hashlib.sha256()
+
+        def frontier():
+            # Caller holds lock; end of the contiguous prefix that is fully written
+            pos = 0
+            for start, end, done in segments:
+                pos = start + done
+                if pos <= end:
+                    break
+            return pos
+
+        def follow_hash():
+            # Hash the contiguous prefix as it grows; fresh data is still in the page cache
+            fd = os.open(part_path, os.O_RDONLY)
+            try:
+                while True:
+                    with lock:
+                        while frontier() <= state['hashed'] and not finished.is_set():
+                            lock.wait(0.5)
+                        upto = frontier()
+                        # Samen met upto lezen: finished na upto betekent niet dat upto het einde is
+                        done = finished.is_set()
+                    pos = state['hashed']
+                    while pos < upto:
+                        chunk = os.pread(fd, min(HASH_CHUNK_SIZE, upto - pos), pos)
+                        if not chunk:
+                            return
+                        sha256.update(chunk)
+                        pos += len(chunk)
+                    state['hashed'] = pos
+                    if pos >= total or (done and pos >= upto):
+                        return
+            except Exception as e:
+                # Digest stays incomplete; verification falls back to reading the file
+                self.err_logger.warning(f"Inline hashing failed for {item['filename']}: {e}")
+            finally:
+                os.close(fd)
+
+        def report(now):
+            # Caller holds lock; progress is the sum over all segments
+            lock.notify_all()
+            downloaded = sum(seg[2] for seg in segments)
+            meta['bytes'] = downloaded
+            if now - state['last_meta_saved'] > PART_META_INTERVAL:
+                _write_part_meta(part_path, meta)
+                state['last_meta_saved'] = now
+            if now - state['last_progress_sent'] > 0.2:
+                ws_manager.broadcast('download_progress', {
+                    'model_id': item['model_id'],
+                    'filename': item['filename'],
+                    'progress': round(100 * downloaded / total, 1),
+                    'downloaded': downloaded,
+                    'total': total,
+                    'segments': len(segments)
+                })
+                state['last_progress_sent'] = now
+
+        def fetch(seg):
+            start, end = seg[0], seg[1]
+            fd = os.open(part_path, os.O_WRONLY)
+            try:
+                while start + seg[2] <= end:
+                    # Gepauzeerd: zonder slot en verbinding wachten, daarna verder met een Range request
+                    self._wait_while_paused(control)
+                    if control.cancelled:
+                        cancelled.set()
+                        stop.set()
+                        return
+                    if stop.is_set() or self._paused(control):
+                        return
+                    slot = self.hosts.acquire(final_url, abort=lambda: stop.is_set() or control.cancelled or self._paused(control))
+                    if slot is None:
+                        continue
+                    paused = False
+                    pos = start + seg[2]
+                    h = dict(seg_headers, Range=f'bytes={pos}-{end}')
+                    with slot, self.http.stream('GET', final_url, timeout=self.timeout, headers=h) as r:
+                        slot.status = r.status_code
+                        if r.status_code != 206 or _content_range_start(r.headers.get('content-range')) != pos:
+                            if r.status_code >= 400:
+                                item['last_status'] = r.status_code
+                                item['retry_after'] = _parse_retry_after(r.headers.get('retry-after'))
+                            raise RuntimeError(f"Segment {start}-{end} rejected (HTTP {r.status_code})")
+                        for chunk in r.iter_bytes():
+                            if stop.is_set():
+                                return
+                            if control.cancelled:
+                                cancelled.set()
+                                stop.set()
+                                return
+                            if self._paused(control):
+                                paused = True
+                                break
+                            chunk = chunk[:end + 1 - pos]
+                            self.limiter.throttle(len(chunk), job_bucket)
+                            os.pwrite(fd, chunk, pos)
+                            pos += len(chunk)
+                            slot.bytes += len(chunk)
+                            with lock:
+                                seg[2] += len(chunk)
+                                report(time.time())
+                            if pos > end:
+                                break
+                    if not paused:
+                        return
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                os.close(fd)
+
+        threads = [threading.Thread(target=fetch, args=(seg,), name=f"{threading.current_thread().name}-seg{i}", daemon=True)
+                   for i, seg in enumerate(segments)]
+        hasher = threading.Thread(target=follow_hash, name=f"{threading.current_thread().name}-hash", daemon=True)
+        hasher.start()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with lock:
+            finished.set()
+            lock.notify_all()
+        hasher.join()
+        if cancelled.is_set():
+            ws_manager.broadcast('download_cancelled', {'model_id': item['model_id'], 'filename': item['filename']})
+            send_webhook('download_cancelled', {'model_id': item['model_id'], 'filename': item['filename']})
+            _remove_partial(part_path)
+            return False, filepath
+        with lock:
+            meta['bytes'] = sum(seg[2] for seg in segments)
+            _write_part_meta(part_path, meta)
+        if errors or meta['bytes'] != total:
+            self.err_logger.warning(f"Segmented download incomplete for {item['filename']}: {meta['bytes']}/{total} bytes ({errors[0] if errors else 'short read'}), keeping partial file")
+            return False, filepath
+        ws_manager.broadcast('download_progress', {
+            'model_id': item['model_id'],
+            'filename': item['filename'],
+            'progress': 100,
+            'downloaded': total,
+            'total': total,
+            'segments': len(segments)
+        })
+        meta['complete'] = True
+        _write_part_meta(part_path, meta)
+        if state['hashed'] == total:
+            item['computed_sha256'] = sha256.hexdigest().lower()
+        return True, part_path
+
+    def _download_single(self, item, filepath, part_path, meta, headers):
+        """Single-stream download into part_path, resuming from the sidecar when possible.
+
+        Returns None when the job or the daemon is paused mid-transfer: the partial file
+        and its sidecar are kept, and the connection and host slot are released.
+        """
+        offset = 0
+        if meta:
+            offset = min(os.path.getsize(part_path), int(meta.get('bytes', 0)))
+            if offset < os.path.getsize(part_path):
+                with open(part_path, 'r+b') as f:
+                    f.truncate(offset)
+            headers = dict(headers, Range=f'bytes={offset}-')
+            validator = meta.get('etag') or meta.get('last_modified')
+            if validator:
+                headers['If-Range'] = validator
+        control = self._control(item)
+        slot = self.hosts.acquire(item['url'], abort=lambda: control.cancelled or not self.running)
+        if slot is None:
+            return False, filepath
+        with slot, self.http.stream('GET', item['url'], timeout=self.timeout, headers=headers) as r:
+            slot.status = r.status_code
+            if offset and r.status_code == 416:
+                # Range niet (meer) geldig: volgende poging begint opnieuw vanaf 0
+                self.logger.warning(f"Server rejected resume of {item['filename']} at {offset} bytes, restarting from zero")
+                _remove_partial(part_path)
+                return False, filepath
+            try:
+                r.raise_for_status()
+            except httpx.HTTPStatusError as http_err:
+                item['last_status'] = r.status_code
+                item['retry_after'] = _parse_retry_after(r.headers.get('retry-after'))
+                # Log statuscode, response body en redirect chain
+                body = r.read().decode(errors='replace') if hasattr(r, 'read') else ''
+                redirects = []
+                if hasattr(r, 'history') and r.history:
+                    for resp in r.history:
+                        redirects.append(f"{resp.status_code} -> {resp.headers.get('location', '')}")
+                redirect_info = f" Redirect chain: {' | '.join(redirects)}" if redirects else ''
+                self.err_logger.error(f"HTTP error {r.status_code} for {item['url']}: {body}{redirect_info}")
+                return False, filepath
+            etag = r.headers.get('etag')
+            last_modified = r.headers.get('last-modified')
+            if offset:
+                resumed = (
+                    r.status_code == 206
+                    and _content_range_start(r.headers.get('content-range')) == offset
+                    and (not meta.get('etag') or not etag or etag == meta.get('etag'))
+                )
+                if resumed:
+                    self.logger.info(f"Resuming {item['filename']} at {offset} bytes")
+                else:
+                    self.logger.warning(f"Server ignored range or file changed for {item['filename']}, restarting from zero")
+                    offset = 0
+            length = int(r.headers.get('content-length', 0))
+            total = offset + length if length else 0
+            if total:
+                # Schatting van de reservering vervangen door de echte grootte
+                self.disk.update(item['job_id'], total)
+            downloaded = offset
+            meta = {'url': item['url'], 'etag': etag, 'last_modified': last_modified, 'total': total, 'bytes': downloaded}
+            _write_part_meta(part_path, meta)
+            # Hash inline; a resumed download first re-hashes the prefix that is already on disk
+            sha256 = _hash_prefix(part_path, offset, hashlib.sha256()) if offset else hashlib.sha256()
+            last_progress_sent = 0
+            last_meta_saved = time.time()
+            job_bucket = self.limiter.job_bucket()
+            start_offset = downloaded
+            paused = False
+            try:
+                with open(part_path, 'r+b' if offset else 'wb', buffering=self.write_buffer) as f:
+                    f.seek(offset)
+                    if total:
+                        _preallocate(f.fileno(), total)
                     for chunk in r.iter_bytes():
-                        if self.cancel_current:
+                        if control.cancelled:
                             ws_manager.broadcast('download_cancelled', {'model_id': item['model_id'], 'filename': item['filename']})
                             send_webhook('download_cancelled', {'model_id': item['model_id'], 'filename': item['filename']})
-                            if os.path.exists(filepath):
-                                try:
-                                    os.remove(filepath)
-                                except Exception:
-                                    pass
+                            f.close()
+                            _remove_partial(part_path)
+                            meta = None
                             return False, filepath
-                        while self.paused:
-                            time.sleep(0.2)
+                        if self._paused(control):
+                            paused = True
+                            break
+                        self.limiter.throttle(len(chunk), job_bucket)
                         f.write(chunk)
+                        sha256.update(chunk)
                         downloaded += len(chunk)
                         now = time.time()
+                        if now - last_meta_saved > PART_META_INTERVAL:
+                            f.flush()
+                            meta['bytes'] = downloaded
+                            _write_part_meta(part_path, meta)
+                            last_meta_saved = now
                         # Only send progress every 0.2s, but always send 100% at the end
                         if total > 0:
                             progress = round(100 * downloaded / total, 1)
@@ -504,67 +1651,97 @@ class DownloadDaemon(threading.Thread):
                                 last_progress_sent = now
                         else:
                             if (now - last_progress_sent > 0.2):
+                                # Geen Content-Length: de pre-flight grootte als schatting
+                                expected = self._preflight_size(item)
                                 ws_manager.broadcast('download_progress', {
                                     'model_id': item['model_id'],
                                     'filename': item['filename'],
-                                    'progress': None,
+                                    'progress': min(99.9, round(100 * downloaded / expected, 1)) if expected else None,
                                     'downloaded': downloaded,
-                                    'total': None
+                                    'total': expected
                                 })
                                 last_progress_sent = now
-                # Always send 100% at the end if not already sent
-                if total > 0 and downloaded == total:
-                    ws_manager.broadcast('download_progress', {
-                        'model_id': item['model_id'],
-                        'filename': item['filename'],
-                        'progress': 100,
-                        'downloaded': downloaded,
-                        'total': total
-                    })
-            return True, filepath
-        except Exception as e:
-            self.err_logger.error(f"Exception during download for {item.get('url')}: {e}")
-            return False, filepath
+            finally:
+                slot.bytes = downloaded - start_offset
+                # Sidecar bijwerken zodat een volgende poging hier verder gaat
+                if meta is not None:
+                    meta['bytes'] = downloaded
+                    _write_part_meta(part_path, meta)
+                    if downloaded < total:
+                        # Voorgealloceerde ruimte achter de geschreven data weer vrijgeven
+                        os.truncate(part_path, downloaded)
+            if paused:
+                # Slot en verbinding vrijgeven; _download_file hervat na resume
+                return None
+            if total > 0 and downloaded < total:
+                self.err_logger.warning(f"Connection closed early for {item['filename']}: {downloaded}/{total} bytes, keeping partial file")
+                return False, filepath
+            # Always send 100% at the end if not already sent
+            if total > 0 and downloaded == total:
+                ws_manager.broadcast('download_progress', {
+                    'model_id': item['model_id'],
+                    'filename': item['filename'],
+                    'progress': 100,
+                    'downloaded': downloaded,
+                    'total': total
+                })
+        meta['complete'] = True
+        _write_part_meta(part_path, meta)
+        item['computed_sha256'] = sha256.hexdigest().lower()
+        return True, part_path
 
-    def verify_hash(self, filepath, expected_sha256, model_id=None, model_version_id=None):
-        hash_event = {'filename': os.path.basename(filepath), 'progress': 0}
+    def _commit_download(self, item, path):
+        """Move a verified part file to its final name (optionally fsynced). Returns the final path."""
+        filepath = self._target_path(item)
+        if path == filepath:
+            return filepath
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        if self.fsync_downloads:
+            with open(path, 'rb+') as f:
+                os.fsync(f.fileno())
+        os.replace(path, filepath)
+        if self.fsync_downloads:
+            _fsync_dir(filepath)
+        _remove_partial(path)
+        return filepath
+
+    def _hash_event(self, filepath, progress, model_id=None, model_version_id=None):
+        name = os.path.basename(filepath)
+        if name.endswith(PART_SUFFIX):
+            name = name[:-len(PART_SUFFIX)]
+        hash_event = {'filename': name, 'progress': progress}
         if model_id is not None:
             hash_event['model_id'] = model_id
         if model_version_id is not None:
             hash_event['model_version_id'] = model_version_id
-        ws_manager.broadcast('hash_progress', hash_event)
-        sha256 = hashlib.sha256()
+        return hash_event
+
+    def hash_file(self, filepath, model_id=None, model_version_id=None, algo='sha256'):
+        """Read filepath once and return its lowercase digest (SHA256 by default), broadcasting hash_progress events."""
+        ws_manager.broadcast('hash_progress', self._hash_event(filepath, 0, model_id, model_version_id))
+        sha256 = new_hasher(algo)
         total = os.path.getsize(filepath)
         last_progress_sent = 0
+        read = 0
         with open(filepath, 'rb') as f:
-            read = 0
             while True:
-                chunk = f.read(1024*1024)
+                chunk = f.read(HASH_CHUNK_SIZE)
                 if not chunk:
                     break
                 sha256.update(chunk)
                 read += len(chunk)
                 now = time.time()
-                progress = round(100*read/total, 1)
-                hash_event = {'filename': os.path.basename(filepath), 'progress': progress}
-                if model_id is not None:
-                    hash_event['model_id'] = model_id
-                if model_version_id is not None:
-                    hash_event['model_version_id'] = model_version_id
                 if (now - last_progress_sent > 0.2) or (read == total):
-                    ws_manager.broadcast('hash_progress', hash_event)
+                    ws_manager.broadcast('hash_progress', self._hash_event(filepath, round(100*read/total, 1), model_id, model_version_id))
                     last_progress_sent = now
         # Always send 100% at the end if not already sent
         if read == total:
-            hash_event = {'filename': os.path.basename(filepath), 'progress': 100.0}
-            if model_id is not None:
-                hash_event['model_id'] = model_id
-            if model_version_id is not None:
-                hash_event['model_version_id'] = model_version_id
-            ws_manager.broadcast('hash_progress', hash_event)
+            ws_manager.broadcast('hash_progress', self._hash_event(filepath, 100.0, model_id, model_version_id))
+        return sha256.hexdigest().lower()
+
+    def verify_hash(self, filepath, expected_sha256, model_id=None, model_version_id=None):
         # Compare hashes in lowercase to avoid case sensitivity issues
-        result = sha256.hexdigest().lower() == str(expected_sha256).lower()
-        return result
+        return self.hash_file(filepath, model_id, model_version_id) == str(expected_sha256).lower()
 
     def stop(self):
         self.running = False
@@ -582,8 +1759,10 @@ def process_manifest(manifest_path, daemon):
             priority=entry.get('priority') if 'priority' in entry else None,
             model_type=entry.get('model_type'),
             model_version_id=entry.get('modelVersionId'),
-            base_model=entry.get('baseModel')
+            base_model=entry.get('baseModel'),
+            hashes=entry.get('hashes')
         )
+        # add_job slaat al gedownloade en dubbele jobs over (zie duplicate_policy)
         daemon.add_job(item)
     daemon.logger.info(f"Batch manifest queued: {len(manifest)} items from {manifest_path}")
     ws_manager.broadcast('batch_queued', {'count': len(manifest)})
@@ -3,8 +3,10 @@
 # --- Standaard imports altijd eerst ---
 import os
 import sys
+import json
 import sqlite3
-from datetime import datetime, timezone
+import time
+from datetime import datetime, timedelta, timezone
 from loguru import logger
 
 # --- Loguru file logging setup (ook als database direct wordt geladen) ---
@@ -41,8 +43,17 @@ def clear_test_db():
                 c.execute('DELETE FROM errors')
             except sqlite3.OperationalError:
                 pass
+            try:
+                c.execute('DELETE FROM jobs')
+            except sqlite3.OperationalError:
+                pass
+            for table in ('library_files', 'blob_refs', 'queue_waits', 'model_files', 'evictions'):
+                try:
+                    c.execute(f'DELETE FROM {table}')
+                except sqlite3.OperationalError:
+                    pass
             conn.commit()
-            db_logger.info("Cleared test database tables downloads and errors.")
+            db_logger.info("Cleared test database tables downloads, errors, jobs, library_files, blob_refs, queue_waits, model_files and evictions.")
         except Exception as e:
             db_logger.error(f"Failed to clear test db: {e}")
         finally:
@@ -87,6 +98,81 @@ def init_db():
             filename TEXT,
             error TEXT
         )''')
+        # Durable download queue: states queued, running, retry_wait, done, failed
+        c.execute('''CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            priority INTEGER,
+            enqueued_at REAL,
+            not_before REAL,
+            item TEXT,
+            updated_at TEXT
+        )''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state)')
+        # Library: elk modelbestand op disk met de stat-gegevens waarmee de hash berekend is
+        c.execute('''CREATE TABLE IF NOT EXISTS library_files (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            inode INTEGER,
+            sha256 TEXT,
+            model_type TEXT,
+            scanned_at TEXT
+        )''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_library_sha256 ON library_files(sha256)')
+        # Content store: welke zichtbare paden naar welke blob (sha256) verwijzen
+        c.execute('''CREATE TABLE IF NOT EXISTS blob_refs (
+            path TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            created_at TEXT
+        )''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_blob_refs_sha256 ON blob_refs(sha256)')
+        # Wachttijd in de queue per gestarte job, om scheduling policies te vergelijken
+        c.execute('''CREATE TABLE IF NOT EXISTS queue_waits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dispatched_at TEXT,
+            policy TEXT,
+            flow TEXT,
+            model_type TEXT,
+            size INTEGER,
+            priority INTEGER,
+            wait REAL
+        )''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_queue_waits_dispatched ON queue_waits(dispatched_at)')
+        # Door de daemon gedownloade modelbestanden met laatste gebruik, voor LRU eviction
+        c.execute('''CREATE TABLE IF NOT EXISTS model_files (
+            path TEXT PRIMARY KEY,
+            model_id TEXT,
+            model_version_id TEXT,
+            model_type TEXT,
+            filename TEXT,
+            size INTEGER,
+            url TEXT,
+            sha256 TEXT,
+            base_model TEXT,
+            downloaded_at REAL,
+            last_access REAL,
+            pinned INTEGER DEFAULT 0
+        )''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_model_files_version ON model_files(model_id, model_version_id)')
+        c.execute('''CREATE TABLE IF NOT EXISTS evictions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            evicted_at TEXT,
+            model_id TEXT,
+            model_version_id TEXT,
+            model_type TEXT,
+            filename TEXT,
+            path TEXT,
+            size INTEGER,
+            last_access REAL,
+            url TEXT,
+            sha256 TEXT,
+            base_model TEXT,
+            reason TEXT
+        )''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_evictions_version ON evictions(model_id, model_version_id)')
+        # WAL: enqueue/claim commits without blocking readers and with cheaper fsyncs
+        c.execute('PRAGMA journal_mode=WAL')
         conn.commit()
         # db_logger.info("Database initialized and migrations checked.")  # Dubbele logging verwijderd
     except Exception as e:
@@ -400,6 +486,482 @@ def is_already_downloaded(model_id, model_version_id):
     conn.close()
     return bool(result)
 
+def iter_downloaded_pairs(batch_size=10000):
+    """
+    Yields (model_id, model_version_id) of every 'success' row, streamed in batches.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        c = conn.cursor()
+        try:
+            c.execute('''SELECT DISTINCT model_id, model_version_id FROM downloads WHERE status='success' ''')
+        except sqlite3.OperationalError:
+            return
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def last_successful_downloads(limit=5):
+    """
+    Returns the newest 'success' rows as dicts (newest first).
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        c = conn.cursor()
+        c.execute('''SELECT model_id, model_version_id, filename, file_size, download_time, model_type, base_model FROM downloads WHERE status='success' ORDER BY timestamp DESC LIMIT ?''', (limit,))
+        rows = c.fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    finally:
+        conn.close()
+    keys = ('model_id', 'model_version_id', 'filename', 'file_size', 'download_time', 'model_type', 'base_model')
+    return [dict(zip(keys, row)) for row in rows]
+
+def log_downloads(rows):
+    """
+    Bulk variant of log_download for (model_id, model_version_id, filename, status, message, model_type, base_model) rows.
+    """
+    if not rows:
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        with conn:
+            conn.executemany('INSERT OR IGNORE INTO downloads (timestamp, model_id, model_version_id, filename, status, message, model_type, file_size, download_time, base_model) VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0, ?)',
+                             [(now,) + tuple(row) for row in rows])
+        db_logger.info(f"Logged {len(rows)} downloads in bulk")
+    except Exception as e:
+        db_logger.error(f"Failed to bulk log downloads: {e}")
+    finally:
+        conn.close()
+
+
+# --- Durable job queue ---
+JOB_PENDING_STATES = ('queued', 'running', 'retry_wait')
+JOB_FINAL_STATES = ('done', 'failed', 'cancelled', 'removed')
+
+def _job_json(item):
+    # Callables (hooks) and private keys are not persisted
+    return json.dumps({k: v for k, v in item.items() if not callable(v) and not k.startswith('_')}, default=str)
+
+def _jobs_connection():
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def persist_jobs(items, state='queued'):
+    """
+    Insert or replace jobs in one transaction. items need 'job_id', 'priority' and optionally 'enqueued_at'/'not_before'.
+    """
+    if not items:
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [(item['job_id'], state, item.get('priority'), item.get('enqueued_at'), item.get('not_before'), _job_json(item), now) for item in items]
+    for attempt in range(2):
+        conn = _jobs_connection()
+        try:
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO jobs (job_id, state, priority, enqueued_at, not_before, item, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            break
+        except sqlite3.OperationalError as e:
+            if 'no such table' in str(e) and attempt == 0:
+                init_db()
+                continue
+            db_logger.error(f"Failed to persist {len(rows)} jobs: {e}")
+        finally:
+            conn.close()
+
+def set_job_state(job_id, state, item=None):
+    """
+    Move a job to another state (done, failed, retry_wait, ...); optionally store the updated item.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    conn = _jobs_connection()
+    try:
+        with conn:
+            if item is not None:
+                conn.execute('UPDATE jobs SET state=?, priority=?, not_before=?, item=?, updated_at=? WHERE job_id=?',
+                             (state, item.get('priority'), item.get('not_before'), _job_json(item), now, job_id))
+            else:
+                conn.execute('UPDATE jobs SET state=?, updated_at=? WHERE job_id=?', (state, now, job_id))
+    except Exception as e:
+        db_logger.error(f"Failed to set job {job_id} to {state}: {e}")
+    finally:
+        conn.close()
+
+def update_job_item(job_id, item):
+    """
+    Store the updated item (url, priority) of a job without changing its state.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    conn = _jobs_connection()
+    try:
+        with conn:
+            conn.execute('UPDATE jobs SET priority=?, item=?, updated_at=? WHERE job_id=?',
+                         (item.get('priority'), _job_json(item), now, job_id))
+    except Exception as e:
+        db_logger.error(f"Failed to update job {job_id}: {e}")
+    finally:
+        conn.close()
+
+def claim_job(job_id):
+    """
+    Atomically move a queued job to running. Returns False when it was already claimed or removed.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    conn = _jobs_connection()
+    try:
+        with conn:
+            cur = conn.execute("UPDATE jobs SET state='running', updated_at=? WHERE job_id=? AND state IN ('queued', 'retry_wait')", (now, job_id))
+            return cur.rowcount == 1
+    except Exception as e:
+        db_logger.error(f"Failed to claim job {job_id}: {e}")
+        return True
+    finally:
+        conn.close()
+
+def load_pending_jobs():
+    """
+    Returns [(state, item)] for queued, retry_wait and interrupted (running) jobs; running jobs are reset to queued.
+    """
+    conn = _jobs_connection()
+    try:
+        with conn:
+            conn.execute("UPDATE jobs SET state='queued' WHERE state='running'")
+        rows = conn.execute("SELECT state, item FROM jobs WHERE state IN ('queued', 'retry_wait') ORDER BY enqueued_at").fetchall()
+    finally:
+        conn.close()
+    result = []
+    for state, raw in rows:
+        try:
+            result.append((state, json.loads(raw)))
+        except Exception:
+            db_logger.error(f"Skipping unreadable job row: {raw[:200] if raw else raw}")
+    return result
+
+def prune_jobs(keep_days):
+    """
+    Delete done, failed, cancelled and removed jobs that were last updated more than keep_days ago,
+    and queue wait metrics older than that. Returns the number of jobs deleted.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=keep_days)).isoformat()
+    conn = _jobs_connection()
+    try:
+        with conn:
+            cur = conn.execute(f"DELETE FROM jobs WHERE state IN ({', '.join('?' * len(JOB_FINAL_STATES))}) AND updated_at < ?",
+                               JOB_FINAL_STATES + (cutoff,))
+            conn.execute('DELETE FROM queue_waits WHERE dispatched_at < ?', (cutoff,))
+        return cur.rowcount
+    except sqlite3.OperationalError as e:
+        db_logger.error(f"Failed to prune finished jobs: {e}")
+        return 0
+    finally:
+        conn.close()
+
+# --- Library (model files on disk) ---
+def load_library_files():
+    """
+    Returns {path: (size, mtime_ns, inode, sha256)} of every file in the library.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute('SELECT path, size, mtime_ns, inode, sha256 FROM library_files').fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+    return {path: (size, mtime_ns, inode, sha256) for path, size, mtime_ns, inode, sha256 in rows}
+
+def save_library_files(rows):
+    """
+    Insert or replace library rows (path, size, mtime_ns, inode, sha256, model_type) in one transaction.
+    """
+    if not rows:
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    for attempt in range(2):
+        conn = _jobs_connection()
+        try:
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO library_files (path, size, mtime_ns, inode, sha256, model_type, scanned_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                 [tuple(row) + (now,) for row in rows])
+            break
+        except sqlite3.OperationalError as e:
+            if 'no such table' in str(e) and attempt == 0:
+                init_db()
+                continue
+            db_logger.error(f"Failed to save {len(rows)} library files: {e}")
+        finally:
+            conn.close()
+
+def delete_library_files(paths):
+    """
+    Remove library rows of files that no longer exist.
+    """
+    if not paths:
+        return
+    conn = _jobs_connection()
+    try:
+        with conn:
+            conn.executemany('DELETE FROM library_files WHERE path=?', [(path,) for path in paths])
+    except sqlite3.OperationalError as e:
+        db_logger.error(f"Failed to delete {len(paths)} library files: {e}")
+    finally:
+        conn.close()
+
+def library_hashes():
+    """
+    Returns {sha256: path} of every hashed file in the library.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute('SELECT sha256, path FROM library_files WHERE sha256 IS NOT NULL').fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+    return dict(rows)
+
+# --- Content store references ---
+def add_blob_ref(path, sha256):
+    """
+    Record that path is a link to the blob sha256 (replaces an older reference of that path).
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    for attempt in range(2):
+        conn = _jobs_connection()
+        try:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO blob_refs (path, sha256, created_at) VALUES (?, ?, ?)', (path, sha256, now))
+            break
+        except sqlite3.OperationalError as e:
+            if 'no such table' in str(e) and attempt == 0:
+                init_db()
+                continue
+            db_logger.error(f"Failed to add blob reference {path}: {e}")
+        finally:
+            conn.close()
+
+def remove_blob_ref(path):
+    """
+    Drop the reference of path. Returns (sha256, remaining references) or (None, 0) if path had none.
+    """
+    conn = _jobs_connection()
+    try:
+        with conn:
+            row = conn.execute('SELECT sha256 FROM blob_refs WHERE path=?', (path,)).fetchone()
+            if row is None:
+                return None, 0
+            conn.execute('DELETE FROM blob_refs WHERE path=?', (path,))
+            remaining = conn.execute('SELECT COUNT(*) FROM blob_refs WHERE sha256=?', (row[0],)).fetchone()[0]
+        return row[0], remaining
+    finally:
+        conn.close()
+
+def blob_ref_paths(sha256):
+    """
+    Returns the paths that reference the blob sha256.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return [row[0] for row in conn.execute('SELECT path FROM blob_refs WHERE sha256=? ORDER BY path', (sha256,))]
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+# --- Model files, last access and evictions ---
+MODEL_FILE_COLUMNS = ('path', 'model_id', 'model_version_id', 'model_type', 'filename', 'size', 'url', 'sha256',
+                      'base_model', 'downloaded_at', 'last_access', 'pinned')
+
+def save_model_file(row):
+    """
+    Insert or replace a downloaded model file (dict with MODEL_FILE_COLUMNS keys); keeps the pin of a re-download.
+    """
+    values = tuple(row.get(col) for col in MODEL_FILE_COLUMNS[:-1])
+    for attempt in range(2):
+        conn = _jobs_connection()
+        try:
+            with conn:
+                pinned = conn.execute('SELECT MAX(pinned) FROM model_files WHERE model_id=? AND model_version_id IS ?',
+                                      (row.get('model_id'), row.get('model_version_id'))).fetchone()[0]
+                conn.execute(f'INSERT OR REPLACE INTO model_files ({", ".join(MODEL_FILE_COLUMNS)}) VALUES ({", ".join("?" * len(MODEL_FILE_COLUMNS))})',
+                             values + (pinned or 0,))
+            break
+        except sqlite3.OperationalError as e:
+            if 'no such table' in str(e) and attempt == 0:
+                init_db()
+                continue
+            db_logger.error(f"Failed to save model file {row.get('path')}: {e}")
+        finally:
+            conn.close()
+
+def load_model_files(model_type=None):
+    """
+    Returns model files as dicts, least recently accessed first; optionally of one model_type.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        query = f'SELECT {", ".join(MODEL_FILE_COLUMNS)} FROM model_files'
+        if model_type is not None:
+            rows = conn.execute(query + ' WHERE model_type=? ORDER BY last_access', (model_type,)).fetchall()
+        else:
+            rows = conn.execute(query + ' ORDER BY last_access').fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+    return [dict(zip(MODEL_FILE_COLUMNS, row)) for row in rows]
+
+def model_file_usage():
+    """
+    Returns {model_type: (files, bytes, pinned bytes)} of the model files.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute('SELECT model_type, COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(CASE WHEN pinned THEN size ELSE 0 END), 0) FROM model_files GROUP BY model_type').fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+    return {model_type: (count, size, pinned) for model_type, count, size, pinned in rows}
+
+def _version(model_version_id):
+    # Compared with 'IS ?': a job without a version matches only rows without one
+    return None if model_version_id is None else str(model_version_id)
+
+def touch_model_files(model_id=None, model_version_id=None, path=None, when=None):
+    """
+    Set last_access of the files of a model version, or of one path. Returns the number of files.
+    """
+    when = when or time.time()
+    conn = _jobs_connection()
+    try:
+        with conn:
+            if path is not None:
+                cur = conn.execute('UPDATE model_files SET last_access=? WHERE path=?', (when, path))
+            else:
+                cur = conn.execute('UPDATE model_files SET last_access=? WHERE model_id=? AND model_version_id IS ?',
+                                   (when, str(model_id), _version(model_version_id)))
+            return cur.rowcount
+    except sqlite3.OperationalError as e:
+        db_logger.error(f"Failed to update last access: {e}")
+        return 0
+    finally:
+        conn.close()
+
+def touch_model_versions(pairs, when=None):
+    """
+    Bulk variant of touch_model_files for (model_id, model_version_id) pairs.
+    """
+    if not pairs:
+        return
+    when = when or time.time()
+    conn = _jobs_connection()
+    try:
+        with conn:
+            conn.executemany('UPDATE model_files SET last_access=? WHERE model_id=? AND model_version_id IS ?',
+                             [(when, str(model_id), _version(model_version_id)) for model_id, model_version_id in pairs])
+    except sqlite3.OperationalError as e:
+        db_logger.error(f"Failed to update last access of {len(pairs)} models: {e}")
+    finally:
+        conn.close()
+
+def set_model_pinned(model_id, model_version_id, pinned):
+    """
+    Pin or unpin the files of a model version (pinned files are never evicted). Returns the number of files.
+    """
+    conn = _jobs_connection()
+    try:
+        with conn:
+            cur = conn.execute('UPDATE model_files SET pinned=? WHERE model_id=? AND model_version_id IS ?',
+                               (1 if pinned else 0, str(model_id), _version(model_version_id)))
+            return cur.rowcount
+    except sqlite3.OperationalError as e:
+        db_logger.error(f"Failed to pin model {model_id}/{model_version_id}: {e}")
+        return 0
+    finally:
+        conn.close()
+
+def record_eviction(row, reason):
+    """
+    In one transaction: log the eviction of a model file, forget the file and turn its 'success'
+    downloads into 'evicted' so is_already_downloaded() is False and the model can be fetched again.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    conn = _jobs_connection()
+    try:
+        with conn:
+            conn.execute('INSERT INTO evictions (evicted_at, model_id, model_version_id, model_type, filename, path, size, last_access, url, sha256, base_model, reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (now, row['model_id'], row['model_version_id'], row['model_type'], row['filename'], row['path'],
+                          row['size'], row['last_access'], row['url'], row['sha256'], row['base_model'], reason))
+            conn.execute('DELETE FROM model_files WHERE path=?', (row['path'],))
+            # UNIQUE(model_id, model_version_id, filename, status): een eerdere 'evicted' rij wordt vervangen
+            conn.execute("UPDATE OR REPLACE downloads SET status='evicted', message=? WHERE model_id=? AND model_version_id=? AND filename=? AND status='success'",
+                         (f'evicted: {reason}', row['model_id'], row['model_version_id'], row['filename']))
+    finally:
+        conn.close()
+
+def load_evictions(limit=50, model_id=None, model_version_id=None):
+    """
+    Returns the newest evictions as dicts, optionally of one model version.
+    """
+    keys = ('evicted_at', 'model_id', 'model_version_id', 'model_type', 'filename', 'path', 'size', 'last_access',
+            'url', 'sha256', 'base_model', 'reason')
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        query = f'SELECT {", ".join(keys)} FROM evictions'
+        if model_id is not None:
+            rows = conn.execute(query + ' WHERE model_id=? AND model_version_id IS ? ORDER BY id DESC LIMIT ?',
+                                (str(model_id), _version(model_version_id), limit)).fetchall()
+        else:
+            rows = conn.execute(query + ' ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+    return [dict(zip(keys, row)) for row in rows]
+
+# --- Queue wait metrics ---
+def record_queue_wait(policy, flow, model_type, size, priority, wait):
+    """
+    Store how long a job waited in the queue before a worker started it.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    for attempt in range(2):
+        conn = _jobs_connection()
+        try:
+            with conn:
+                conn.execute('INSERT INTO queue_waits (dispatched_at, policy, flow, model_type, size, priority, wait) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (now, policy, flow, model_type, size, priority, wait))
+            break
+        except sqlite3.OperationalError as e:
+            if 'no such table' in str(e) and attempt == 0:
+                init_db()
+                continue
+            db_logger.error(f"Failed to record queue wait: {e}")
+        finally:
+            conn.close()
+
+def queue_waits(since=None):
+    """
+    Returns [(policy, flow, model_type, size, priority, wait)] dispatched after since (ISO timestamp), oldest first.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        query = 'SELECT policy, flow, model_type, size, priority, wait FROM queue_waits'
+        if since:
+            return conn.execute(query + ' WHERE dispatched_at >= ? ORDER BY id', (since,)).fetchall()
+        return conn.execute(query + ' ORDER BY id').fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
 def downloads_per_day():
     """
     Returns: list of (day, count)
@@ -0,0 +1,103 @@
+# --- Disk space admission control (reservations per running job) ---
+import os
+import shutil
+import threading
+
+from backend.mover import MOVING_SUFFIX
+
+GB = 1024 * 1024 * 1024
+
+
+def _existing_dir(path):
+    # Nearest directory that exists (the model_type folder may not be there yet)
+    path = os.path.abspath(os.path.dirname(path))
+    while not os.path.isdir(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def _allocated(path):
+    """Bytes already allocated on disk for path and its in-progress copy."""
+    total = 0
+    for candidate in (path, path + MOVING_SUFFIX):
+        try:
+            total += os.stat(candidate).st_blocks * 512
+        except (OSError, AttributeError):
+            pass
+    return total
+
+
+class DiskReserver:
+    """Reserves disk space for running jobs so concurrent downloads cannot fill a volume.
+
+    A job needs (path, size) pairs: the file it downloads into and, with a scratch
+    disk, the final location it is moved to. reserve() admits the job only when
+    free space minus the outstanding reservations on that device stays above
+    `floor` bytes; otherwise it returns how many bytes are missing. Outstanding
+    means size minus what is already allocated for the file, so preallocated and
+    resumed part files are not counted twice.
+    """
+    def __init__(self, floor=GB, unknown=2 * GB):
+        self.floor = int(floor)
+        self.unknown = int(unknown)     # reservation for a job whose size is not known yet
+        self.lock = threading.Lock()
+        self.reservations = {}          # job_id -> [[path, size, st_dev, directory]]
+
+    def _outstanding(self, dev):
+        # Caller holds self.lock
+        return sum(max(0, size - _allocated(path))
+                   for needs in self.reservations.values()
+                   for path, size, st_dev, _ in needs if st_dev == dev)
+
+    def reserve(self, job_id, needs):
+        """Reserve space for needs [(path, size)]. Returns 0 when admitted, else the bytes missing."""
+        entries = []
+        for path, size in needs:
+            directory = _existing_dir(path)
+            entries.append([path, int(size), os.stat(directory).st_dev, directory])
+        with self.lock:
+            self.reservations.pop(job_id, None)
+            missing = 0
+            # Twee needs op hetzelfde device (geen scratch) tellen samen
+            wanted = {}
+            for path, size, dev, directory in entries:
+                wanted.setdefault(dev, [directory, 0])[1] += max(0, size - _allocated(path))
+            for dev, (directory, size) in wanted.items():
+                available = shutil.disk_usage(directory).free - self._outstanding(dev) - self.floor
+                missing = max(missing, size - available)
+            if missing > 0:
+                return missing
+            self.reservations[job_id] = entries
+            return 0
+
+    def update(self, job_id, size):
+        """Replace an estimated reservation by the real size (Content-Length) once known."""
+        with self.lock:
+            for entry in self.reservations.get(job_id, []):
+                entry[1] = int(size)
+
+    def release(self, job_id):
+        """Drop the reservation of a finished, failed or waiting job. Returns True if it had one."""
+        with self.lock:
+            return self.reservations.pop(job_id, None) is not None
+
+    def status(self, paths):
+        """Free, reserved and available bytes for the devices of the given directories."""
+        result = {}
+        with self.lock:
+            for name, path in paths.items():
+                if not path:
+                    continue
+                directory = _existing_dir(os.path.join(path, 'x'))
+                dev = os.stat(directory).st_dev
+                free = shutil.disk_usage(directory).free
+                reserved = self._outstanding(dev)
+                result[name] = {
+                    'free': free,
+                    'reserved': reserved,
+                    'available': max(0, free - reserved - self.floor),
+                }
+        return result
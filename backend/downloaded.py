@@ -0,0 +1,114 @@
+# --- Compact index of downloaded (model_id, model_version_id) pairs ---
+import threading
+from array import array
+from bisect import bisect_left
+
+from backend import database
+
+# Civitai ids fit in 32 bits; a pair packs into one unsigned 64-bit integer
+_ID_LIMIT = 1 << 32
+_MERGE_AT = 4096
+
+
+def _pack(model_id, model_version_id):
+    """Packed int for numeric ids, None when an id is not a small non-negative integer."""
+    try:
+        mid, vid = int(str(model_id)), int(str(model_version_id))
+    except (TypeError, ValueError):
+        return None
+    if 0 <= mid < _ID_LIMIT and 0 <= vid < _ID_LIMIT:
+        return (mid << 32) | vid
+    return None
+
+
+class DownloadedIndex:
+    """Which (model_id, model_version_id) pairs have a 'success' row, without the rows.
+
+    A pair without a version id is never downloaded, as in is_already_downloaded().
+    Numeric pairs live in a sorted array('Q') (8 bytes per download, binary search)
+    plus a small set of recent additions that is merged in batches; the rare
+    non-numeric ids go in a plain set. The history is loaded lazily on first use,
+    streamed from SQLite with fetchmany, so startup does not wait for it.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.packed = array('Q')
+        self.recent = set()
+        self.other = set()
+        self.loaded = False
+
+    def _ensure_loaded(self):
+        # Caller holds self.lock
+        if self.loaded:
+            return
+        packed = array('Q')
+        for model_id, model_version_id in database.iter_downloaded_pairs():
+            if model_version_id is None:
+                continue
+            key = _pack(model_id, model_version_id)
+            if key is None:
+                self.other.add((str(model_id), str(model_version_id)))
+            else:
+                packed.append(key)
+        self.packed = array('Q', sorted(set(packed) | self.recent))
+        self.recent.clear()
+        self.loaded = True
+
+    def _merge(self):
+        # Caller holds self.lock; one sort instead of an insort (O(n)) per key
+        self.packed.extend(self.recent.difference(self.packed))
+        self.packed = array('Q', sorted(self.packed))
+        self.recent.clear()
+
+    def contains(self, model_id, model_version_id):
+        if model_version_id is None:
+            # Zoals is_already_downloaded: NULL matcht nooit
+            return False
+        key = _pack(model_id, model_version_id)
+        with self.lock:
+            self._ensure_loaded()
+            if key is None:
+                return (str(model_id), str(model_version_id)) in self.other
+            if key in self.recent:
+                return True
+            i = bisect_left(self.packed, key)
+            return i < len(self.packed) and self.packed[i] == key
+
+    def add(self, model_id, model_version_id):
+        if model_version_id is None:
+            return
+        key = _pack(model_id, model_version_id)
+        with self.lock:
+            if key is None:
+                self.other.add((str(model_id), str(model_version_id)))
+                return
+            self.recent.add(key)
+            if self.loaded and len(self.recent) >= _MERGE_AT:
+                self._merge()
+
+    def discard(self, model_id, model_version_id):
+        if model_version_id is None:
+            return
+        key = _pack(model_id, model_version_id)
+        with self.lock:
+            self._ensure_loaded()
+            if key is None:
+                self.other.discard((str(model_id), str(model_version_id)))
+                return
+            self.recent.discard(key)
+            i = bisect_left(self.packed, key)
+            if i < len(self.packed) and self.packed[i] == key:
+                del self.packed[i]
+
+    def pairs(self):
+        """All downloaded pairs as (model_id, model_version_id) strings."""
+        with self.lock:
+            self._ensure_loaded()
+            keys = sorted(set(self.packed) | self.recent)
+            other = list(self.other)
+        return [(str(key >> 32), str(key & 0xFFFFFFFF)) for key in keys] + other
+
+    def __len__(self):
+        with self.lock:
+            self._ensure_loaded()
+            return len(self.packed) + len(self.recent) + len(self.other)
@@ -0,0 +1,188 @@
+# --- Disk budgets per model_type with LRU eviction of downloaded models ---
+import os
+import sqlite3
+import threading
+import time
+
+from loguru import logger
+
+from backend import database
+
+evict_logger = logger.bind(name="civitai.download")
+
+
+def _last_access(row):
+    # Recorded access (download, API touch, repeated request) or the file's atime, whichever is newer
+    try:
+        atime = os.stat(row['path']).st_atime
+    except OSError:
+        atime = 0
+    return max(row.get('last_access') or 0, atime)
+
+
+class Evictor:
+    """Keeps the model files the daemon downloaded within byte budgets.
+
+    budgets maps model_type to bytes, total limits all types together (None or 0
+    = no limit). make_room() is called before a download starts: when the new
+    file would push its type or the total over budget, the least recently used,
+    non-pinned files of that type (or of any type, for the total) are evicted.
+    Last use is the newest of the recorded access (download, touch(), a request
+    for a model that is already there) and the file's atime. An eviction removes
+    the file (through the content store when there is one), drops it from the
+    library and the downloaded index, and turns its 'success' rows into
+    'evicted', so the model can be queued and downloaded again.
+    """
+    def __init__(self, budgets=None, total=None, store=None, library=None, downloaded=None):
+        self.budgets = {key: int(value) for key, value in (budgets or {}).items() if value}
+        self.total = int(total) if total else None
+        self.store = store
+        self.library = library
+        self.downloaded = downloaded
+        self.lock = threading.Lock()
+        self.pending = {}   # job_id -> (model_type, size) of admitted downloads that are not recorded yet
+        self.evicted = 0
+
+    @property
+    def enabled(self):
+        return bool(self.budgets or self.total)
+
+    def configure(self, budgets=None, total=None):
+        with self.lock:
+            self.budgets = {key: int(value) for key, value in (budgets or {}).items() if value}
+            self.total = int(total) if total else None
+
+    def record(self, item, path, size):
+        """Track a finished download (its download counts as the first access)."""
+        now = time.time()
+        database.save_model_file({
+            'path': os.path.abspath(path),
+            'model_id': item['model_id'],
+            'model_version_id': item.get('model_version_id'),
+            'model_type': item.get('model_type') or 'other',
+            'filename': item['filename'],
+            'size': size,
+            'url': item.get('url'),
+            'sha256': item.get('sha256') or item.get('computed_sha256'),
+            'base_model': item.get('base_model'),
+            'downloaded_at': now,
+            'last_access': now,
+        })
+        with self.lock:
+            self.pending.pop(item.get('job_id'), None)
+
+    def touch(self, model_id=None, model_version_id=None, path=None):
+        """Mark a model version (or one file) as used now. Returns the number of files."""
+        if path is not None:
+            path = os.path.abspath(path)
+        return database.touch_model_files(model_id, model_version_id, path=path)
+
+    def touch_many(self, pairs):
+        database.touch_model_versions(pairs)
+
+    def pin(self, model_id, model_version_id, pinned=True):
+        return database.set_model_pinned(model_id, model_version_id, pinned)
+
+    def release(self, job_id):
+        with self.lock:
+            self.pending.pop(job_id, None)
+
+    def _usage(self):
+        # Caller holds self.lock; bytes per type including admitted downloads
+        usage = {model_type: size for model_type, (_, size, _) in database.model_file_usage().items()}
+        for model_type, size in self.pending.values():
+            usage[model_type] = usage.get(model_type, 0) + size
+        return usage
+
+    def make_room(self, job_id, model_type, size):
+        """Evict so a download of size bytes fits the budget of its type and the total budget.
+
+        Returns 0 when the download may start (its size is then counted as pending
+        until record() or release()), else the bytes that could not be freed
+        because the remaining files are pinned. Raises ValueError when the file
+        alone is larger than a budget.
+        """
+        model_type = model_type or 'other'
+        with self.lock:
+            budget = self.budgets.get(model_type)
+            if budget and size > budget:
+                raise ValueError(f"{size} bytes exceeds the {model_type} budget of {budget} bytes")
+            if self.total and size > self.total:
+                raise ValueError(f"{size} bytes exceeds the total budget of {self.total} bytes")
+            usage = self._usage()
+            if budget:
+                needed = usage.get(model_type, 0) + size - budget
+                if needed > 0:
+                    freed = self._evict(database.load_model_files(model_type), needed, f'{model_type} budget')
+                    if freed < needed:
+                        return needed - freed
+                    usage = self._usage()
+            if self.total:
+                needed = sum(usage.values()) + size - self.total
+                if needed > 0:
+                    freed = self._evict(database.load_model_files(), needed, 'total budget')
+                    if freed < needed:
+                        return needed - freed
+            self.pending[job_id] = (model_type, size)
+            return 0
+
+    def free_space(self, needed):
+        """Evict LRU files of any type until needed bytes are freed. Returns the bytes freed."""
+        with self.lock:
+            return self._evict(database.load_model_files(), needed, 'disk space')
+
+    def _evict(self, rows, needed, reason):
+        # Caller holds self.lock; LRU order over non-pinned files
+        candidates = sorted((row for row in rows if not row['pinned']), key=_last_access)
+        freed = 0
+        for row in candidates:
+            if freed >= needed:
+                break
+            freed += self.evict(row, reason)
+        return freed
+
+    def evict(self, row, reason):
+        """Remove one model file and record it. Returns its size (the bytes it counted against the budget)."""
+        path = row['path']
+        try:
+            if self.store is not None:
+                # De blob blijft bestaan zolang een ander pad ernaar verwijst
+                self.store.release(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        except (OSError, sqlite3.Error) as e:
+            evict_logger.error(f"Cannot evict {path}: {e}")
+            return 0
+        try:
+            database.record_eviction(row, reason)
+        except sqlite3.Error as e:
+            # Het bestand is al weg; de model_files rij blijft staan en de volgende eviction ruimt hem opnieuw op
+            evict_logger.error(f"Evicted {path} but could not record it: {e}")
+        if self.library is not None:
+            self.library.remove_file(path)
+        if self.downloaded is not None:
+            self.downloaded.discard(row['model_id'], row['model_version_id'])
+        self.evicted += 1
+        evict_logger.info(f"Evicted {path} ({row['size']} bytes, {reason})")
+        return row['size'] or 0
+
+    def status(self):
+        usage = database.model_file_usage()
+        with self.lock:
+            pending = dict(self.pending)
+            budgets = dict(self.budgets)
+            total = self.total
+        types = {
+            model_type: {'files': files, 'bytes': size, 'pinned_bytes': pinned, 'budget': budgets.get(model_type)}
+            for model_type, (files, size, pinned) in usage.items()
+        }
+        for model_type, budget in budgets.items():
+            types.setdefault(model_type, {'files': 0, 'bytes': 0, 'pinned_bytes': 0, 'budget': budget})
+        return {
+            'enabled': bool(budgets or total),
+            'total_budget': total,
+            'total_bytes': sum(size for _, size, _ in usage.values()),
+            'pending_bytes': sum(size for _, size in pending.values()),
+            'types': types,
+            'evicted': self.evicted,
+        }
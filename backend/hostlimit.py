@@ -0,0 +1,167 @@
+# --- Per-host adaptive concurrency (AIMD) for downloads ---
+import threading
+import time
+
+import httpx
+
+from backend.ratelimit import MB
+
+# Responses that mean "too many requests from you", not "this file is broken"
+CONGESTION_STATUS = {429, 503}
+BACKOFF_COOLDOWN = 5.0  # seconds; one decrease per burst of concurrent 429s
+
+
+def host_of(url):
+    """'https://civitai.com/api/download/1' -> 'civitai.com' (with the port when it is not the default)."""
+    try:
+        return httpx.URL(url).netloc.decode('ascii') or 'unknown'
+    except Exception:
+        return 'unknown'
+
+
+class _HostState:
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.throughput = 0.0        # bytes/s over the last completed window
+        self.window_start = time.monotonic()
+        self.window_bytes = 0
+        self.window_ok = 0
+        self.window_peak = 0         # most requests in flight at once during the window
+        self.last_window = None      # (limit, throughput) of the previous window
+        self.last_backoff = 0.0
+
+
+class Slot:
+    """One request to a host; the caller fills in status and bytes before it is released."""
+    def __init__(self, governor, host):
+        self.governor = governor
+        self.host = host
+        self.status = None
+        self.bytes = 0
+        self.error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None and self.error is None:
+            self.error = exc
+        self.governor.release(self)
+        return False
+
+
+class HostGovernor:
+    """Limits concurrent requests per host and adapts the limit with AIMD.
+
+    A 429/503 or a timeout halves the limit (at most once per BACKOFF_COOLDOWN,
+    so one burst of rejections does not collapse it to the minimum). After
+    `limit` successful requests the window's throughput is compared with the
+    previous window: if it held up the limit grows by one, if adding a stream
+    made the host slower the limit goes back down by one. Callers block in
+    acquire() while the host is at its limit.
+    """
+    def __init__(self, initial=4, minimum=1, maximum=32):
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        self.initial = min(self.maximum, max(self.minimum, int(initial)))
+        self.cond = threading.Condition()
+        self.hosts = {}
+
+    def configure(self, initial=None, minimum=None, maximum=None):
+        with self.cond:
+            if minimum is not None:
+                self.minimum = max(1, int(minimum))
+            if maximum is not None:
+                self.maximum = max(self.minimum, int(maximum))
+            if initial is not None:
+                self.initial = min(self.maximum, max(self.minimum, int(initial)))
+            for state in self.hosts.values():
+                state.limit = min(self.maximum, max(self.minimum, state.limit))
+            self.cond.notify_all()
+
+    def _state(self, host):
+        # Caller holds self.cond
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = _HostState(self.initial)
+        return state
+
+    def acquire(self, url, abort=None):
+        """Wait for a free slot on the host of url. Returns a Slot (context manager) or None when aborted."""
+        host = host_of(url)
+        with self.cond:
+            state = self._state(host)
+            while state.in_flight >= state.limit:
+                if abort is not None and abort():
+                    return None
+                self.cond.wait()
+            if abort is not None and abort():
+                return None
+            state.in_flight += 1
+            state.window_peak = max(state.window_peak, state.in_flight)
+            state.requests += 1
+        return Slot(self, host)
+
+    def wakeup(self):
+        """Wake waiting callers so they re-check their abort condition."""
+        with self.cond:
+            self.cond.notify_all()
+
+    def release(self, slot):
+        congested = slot.status in CONGESTION_STATUS or isinstance(slot.error, httpx.TimeoutException)
+        now = time.monotonic()
+        with self.cond:
+            state = self._state(slot.host)
+            state.in_flight -= 1
+            state.bytes += slot.bytes
+            state.window_bytes += slot.bytes
+            if congested:
+                state.errors += 1
+                if now - state.last_backoff >= BACKOFF_COOLDOWN:
+                    state.limit = max(self.minimum, state.limit // 2)
+                    state.last_backoff = now
+                    self._new_window(state, now)
+            elif slot.error is None and slot.status is not None and slot.status < 400:
+                state.window_ok += 1
+                if state.window_ok >= state.limit:
+                    self._adapt(state, now)
+            self.cond.notify_all()
+
+    def _new_window(self, state, now, measured=None):
+        state.last_window = measured
+        state.window_start = now
+        state.window_bytes = 0
+        state.window_ok = 0
+        state.window_peak = state.in_flight
+
+    def _adapt(self, state, now):
+        # Caller holds self.cond; a full window of successes at the current limit
+        elapsed = max(now - state.window_start, 1e-6)
+        state.throughput = state.window_bytes / elapsed
+        previous = state.last_window
+        measured = (state.limit, state.throughput)
+        if previous and previous[0] < state.limit and state.throughput < previous[1] * 0.9:
+            # Eén stream meer maakte het niet sneller: terug en daar blijven
+            state.limit = max(self.minimum, state.limit - 1)
+        elif state.window_peak >= state.limit:
+            # Limiet was de bottleneck: voorzichtig verhogen
+            state.limit = min(self.maximum, state.limit + 1)
+        self._new_window(state, now, measured)
+
+    def status(self):
+        with self.cond:
+            return {
+                host: {
+                    'limit': state.limit,
+                    'in_flight': state.in_flight,
+                    'requests': state.requests,
+                    'errors': state.errors,
+                    'throughput': round(state.throughput / MB, 2),  # MB/s
+                    'bytes': state.bytes,
+                }
+                for host, state in self.hosts.items()
+            }
@@ -0,0 +1,96 @@
+# --- Shared HTTP clients (connection pooling / keep-alive / optional HTTP/2) ---
+import importlib.util
+import threading
+import httpx
+from loguru import logger
+
+http_logger = logger.bind(name="civitai.download")
+
+USER_AGENT = 'CivitaiDaemon/1.0 (Python httpx)'
+
+# Defaults, overridable via configure() (config.json: http2, http_max_connections, ...)
+_settings = {
+    'http2': False,
+    'max_connections': 100,
+    'max_keepalive_connections': 20,
+    'keepalive_expiry': 30.0,
+    'connect_timeout': 15.0,
+}
+_lock = threading.Lock()
+_client = None
+_async_client = None
+_retired = []  # replaced clients, kept open for in-flight streams until close_clients()
+
+
+def _http2_available():
+    # Optional dependency: pip install 'httpx[http2]'
+    return importlib.util.find_spec('h2') is not None
+
+
+def _client_kwargs():
+    http2 = bool(_settings['http2'])
+    if http2 and not _http2_available():
+        http_logger.warning("http2 enabled in config but the 'h2' package is not installed, using HTTP/1.1")
+        http2 = False
+    return {
+        'http2': http2,
+        'limits': httpx.Limits(
+            max_connections=_settings['max_connections'],
+            max_keepalive_connections=_settings['max_keepalive_connections'],
+            keepalive_expiry=_settings['keepalive_expiry'],
+        ),
+        'timeout': httpx.Timeout(60.0, connect=_settings['connect_timeout']),
+        'headers': {'User-Agent': USER_AGENT},
+        'follow_redirects': True,
+    }
+
+
+def configure(**settings):
+    """Update pool settings. The client is replaced on next use when something changed."""
+    global _client
+    settings = {k: v for k, v in settings.items() if k in _settings and v is not None}
+    with _lock:
+        if all(_settings[k] == v for k, v in settings.items()):
+            return
+        _settings.update(settings)
+        if _client is not None:
+            _retired.append(_client)
+        _client = None
+
+
+def get_client():
+    """Process-wide thread-safe httpx.Client shared by downloads, probes and webhooks."""
+    global _client
+    with _lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(**_client_kwargs())
+        return _client
+
+
+def get_async_client():
+    """Shared httpx.AsyncClient for the FastAPI endpoints (bound to the server event loop)."""
+    global _async_client
+    with _lock:
+        if _async_client is None or _async_client.is_closed:
+            _async_client = httpx.AsyncClient(**_client_kwargs())
+        return _async_client
+
+
+def close_clients():
+    global _client
+    with _lock:
+        old = _retired[:] + ([_client] if _client is not None else [])
+        _retired.clear()
+        _client = None
+    for client in old:
+        client.close()
+
+
+async def aclose_clients():
+    """Close both clients; called from the FastAPI lifespan on shutdown."""
+    global _async_client
+    close_clients()
+    with _lock:
+        old, _async_client = _async_client, None
+    if old is not None:
+        await old.aclose()
@@ -0,0 +1,388 @@
+# --- Download job queue (in-memory heap, mirrored in the jobs table) ---
+import heapq
+import itertools
+import queue
+import threading
+import time
+import uuid
+
+from backend import database
+from backend.scheduling import FifoPolicy
+
+JOB_RETENTION_DAYS = 7.0  # done, failed, cancelled and removed rows are kept this long in the jobs table
+PRUNE_EVERY = 500         # completions between two prune passes
+
+
+def job_key(item):
+    """Identity of a download for duplicate detection."""
+    return (str(item.get('model_id')), str(item.get('model_version_id')), item.get('filename'))
+
+
+class JobQueue:
+    """Priority queue of download jobs with a durable mirror in SQLite.
+
+    Drop-in for the queue.PriorityQueue the daemon used before: put/get/get_nowait
+    take and return (priority, ts, item) tuples. Every state change (queued, running,
+    retry_wait, done, failed) is written to the jobs table so pending work survives a
+    restart; restore() loads it back on startup.
+
+    index maps job_key() to the item for every queued, running and retry-waiting job,
+    so duplicates are found in O(1); put/put_many return the duplicates they skipped.
+    Removing or reprioritizing a job invalidates its heap entry and pushes a new one
+    (O(log n)). version counts mutations and keys the cached sorted listing().
+
+    The heap key comes from a scheduling policy (backend/scheduling.py), prefixed
+    by the job's queue_pin (set by move(), so a moved job stays at the top or
+    bottom whatever the policy); set_policy() re-keys the queue at runtime.
+
+    Finished rows (done, failed, cancelled, removed) are pruned after `retention` days, on
+    restore() and every PRUNE_EVERY completions; 0 keeps them forever.
+    """
+    def __init__(self, persist=True, policy=None, retention=JOB_RETENTION_DAYS):
+        self.persist = persist
+        self.policy = policy or FifoPolicy()
+        self.retention = retention
+        self._completed = 0
+        self.cond = threading.Condition()
+        self.heap = []      # [key, ts, seq, item]; item None = removed entry
+        self.entries = {}   # job_id -> heap entry of queued jobs
+        self.delayed = []   # (not_before, seq, item) jobs in retry_wait
+        self.index = {}     # job_key -> item of queued, running and retry_wait jobs
+        self._seq = itertools.count()
+        self.version = 0
+        self.held = False   # paused: get() hands out nothing until release
+        self._listing = (-1, [])  # (version, sorted items) cache for listing()
+
+    # --- enqueue ---
+    def _prepare(self, item, ts):
+        if not item.get('job_id'):
+            item['job_id'] = uuid.uuid4().hex
+        item.setdefault('enqueued_at', ts)
+        # Begin van de huidige wachttijd (ook na een retry), voor de queue wait metrics
+        item['queued_at'] = ts
+        return item
+
+    def _push(self, ts, item):
+        # Caller holds self.cond
+        key = (item.get('queue_pin', 0),) + self.policy.key(item, ts)
+        entry = [key, ts, next(self._seq), item]
+        self.entries[item['job_id']] = entry
+        self.index[job_key(item)] = item
+        heapq.heappush(self.heap, entry)
+        self.version += 1
+
+    def put(self, entry):
+        priority, ts, item = entry
+        return self.put_many([item], ts=ts)
+
+    def put_many(self, items, ts=None):
+        """Enqueue items in one database transaction.
+
+        Returns [(new_item, existing_item)] for items that duplicate a job that is
+        already queued, running or waiting for a retry; those are not enqueued.
+        """
+        ts = ts if ts is not None else time.time()
+        accepted = []
+        duplicates = []
+        with self.cond:
+            for item in items:
+                key = job_key(item)
+                existing = self.index.get(key)
+                if existing is not None and existing is not item:
+                    duplicates.append((item, existing))
+                    continue
+                # Reserve the key now so a concurrent put sees the duplicate
+                self.index[key] = item
+                accepted.append(self._prepare(item, ts))
+        if self.persist:
+            database.persist_jobs(accepted, 'queued')
+        with self.cond:
+            for item in accepted:
+                self._push(ts, item)
+            self.cond.notify(len(accepted))
+        return duplicates
+
+    def find(self, item):
+        """The queued, running or retry-waiting job with the same key, or None."""
+        with self.cond:
+            return self.index.get(job_key(item))
+
+    def reprioritize(self, item, priority):
+        """Change the priority of a job; a queued job moves to its new place in the heap."""
+        with self.cond:
+            item['priority'] = priority
+            # Een expliciete prioriteit vervangt een eerdere move naar top/bottom
+            item.pop('queue_pin', None)
+            self._rekey(item)
+            self.version += 1
+        self.update(item)
+
+    def _rekey(self, item):
+        # Caller holds self.cond; push a queued job again with a fresh key, same arrival time
+        entry = self.entries.get(item.get('job_id'))
+        if entry is not None and entry[3] is item:
+            entry[3] = None
+            self._push(entry[1], item)
+            if len(self.heap) > 2 * len(self.entries) + 64:
+                # Verwijderde entries opruimen
+                self.heap = [e for e in self.heap if e[3] is not None]
+                heapq.heapify(self.heap)
+
+    def resort(self, item):
+        """Re-key queued jobs after a field the policy uses changed (size from pre-flight)."""
+        if not self.policy.size_aware:
+            return
+        with self.cond:
+            if item.get('job_id') not in self.entries:
+                return
+            queued = (e[3] for e in self.heap if e[3] is not None)
+            for changed in self.policy.resized(item, queued):
+                self._rekey(changed)
+
+    def set_policy(self, policy):
+        """Switch scheduling policy; queued jobs are re-keyed in arrival order (O(n log n))."""
+        with self.cond:
+            live = sorted((e for e in self.heap if e[3] is not None), key=lambda e: (e[1], e[2]))
+            self.policy = policy
+            policy.reset()
+            self.heap = []
+            for entry in live:
+                for tag in ('_vstart', '_vfloor', '_vcost'):
+                    entry[3].pop(tag, None)
+                self._push(entry[1], entry[3])
+            self.version += 1
+
+    def get_job(self, job_id):
+        """Queued or retry-waiting item by job id, or None."""
+        with self.cond:
+            entry = self.entries.get(job_id)
+            if entry is not None:
+                return entry[3]
+            for _, _, item in self.delayed:
+                if item.get('job_id') == job_id:
+                    return item
+        return None
+
+    def remove(self, job_id):
+        """Drop a queued or retry-waiting job. Returns the removed item or None."""
+        with self.cond:
+            entry = self.entries.pop(job_id, None)
+            if entry is not None:
+                item, entry[3] = entry[3], None
+            else:
+                # retry_wait jobs are few; rebuilding that heap is cheap
+                kept = [d for d in self.delayed if d[2].get('job_id') != job_id]
+                if len(kept) == len(self.delayed):
+                    return None
+                item = next(d[2] for d in self.delayed if d[2].get('job_id') == job_id)
+                self.delayed[:] = kept
+                heapq.heapify(self.delayed)
+            key = job_key(item)
+            if self.index.get(key) is item:
+                del self.index[key]
+            self.version += 1
+        if self.persist:
+            database.set_job_state(job_id, 'removed')
+        return item
+
+    def move(self, job_id, position):
+        """Move a queued job to the 'top' or 'bottom' of the queue. Returns the item or None."""
+        with self.cond:
+            entry = self.entries.get(job_id)
+            if entry is None or entry[3] is None:
+                return None
+            item = entry[3]
+            if position == 'top':
+                # heap[0] may be an invalidated entry; its pin is still a lower bound
+                pin = min(0, self.heap[0][0][0]) - 1
+            elif position == 'bottom':
+                # O(n), but only on an explicit user action
+                pin = max(0, max(e[0][0] for e in self.heap if e[3] is not None)) + 1
+            else:
+                raise ValueError("position must be 'top' or 'bottom'")
+            item['queue_pin'] = pin
+            self._rekey(item)
+        self.update(item)
+        return item
+
+    def update(self, item):
+        """Write changed fields of a pending job (url, priority, ...) to the database."""
+        if self.persist and item.get('job_id'):
+            database.update_job_item(item['job_id'], item)
+
+    def put_delayed(self, item, not_before):
+        """Park a job until not_before (retry_wait)."""
+        self._prepare(item, time.time())
+        item['not_before'] = not_before
+        if self.persist:
+            database.persist_jobs([item], 'retry_wait')
+        with self.cond:
+            heapq.heappush(self.delayed, (not_before, next(self._seq), item))
+            self.index[job_key(item)] = item
+            self.version += 1
+            # Waiting consumers recompute their timeout for the new earliest retry
+            self.cond.notify_all()
+
+    def promote_due(self, now=None):
+        """Move delayed jobs whose not-before time has passed back into the queue."""
+        now = now or time.time()
+        due = []
+        with self.cond:
+            while self.delayed and self.delayed[0][0] <= now:
+                due.append(heapq.heappop(self.delayed)[2])
+            if due:
+                self.version += 1
+        for item in due:
+            item.pop('not_before', None)
+        if due:
+            self.put_many(due)
+        return len(due)
+
+    def release_delayed(self, match):
+        """Move waiting jobs for which match(item) is true back into the queue now. Returns the count."""
+        with self.cond:
+            released = [d[2] for d in self.delayed if match(d[2])]
+            if not released:
+                return 0
+            self.delayed[:] = [d for d in self.delayed if not match(d[2])]
+            heapq.heapify(self.delayed)
+            self.version += 1
+        for item in released:
+            item.pop('not_before', None)
+        self.put_many(released)
+        return len(released)
+
+    # --- dequeue ---
+    def _pop(self):
+        # Caller holds self.cond
+        while self.heap:
+            _, ts, _, item = heapq.heappop(self.heap)
+            if item is not None:
+                del self.entries[item['job_id']]
+                self.policy.dispatched(item)
+                self.version += 1
+                return item['priority'], ts, item
+        return None
+
+    def get(self, block=True, timeout=None, stop=None):
+        """Pop the next job, sleeping on the condition until one is available.
+
+        Wakes up for new jobs, release(), wakeup() and the earliest retry not-before
+        time; there is no polling. stop is an optional callable checked on every
+        wakeup: when it returns True queue.Empty is raised.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._has_due():
+                self.promote_due()
+            with self.cond:
+                if stop is not None and stop():
+                    raise queue.Empty
+                entry = None if self.held else self._pop()
+                if entry is None:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if not block or (remaining is not None and remaining <= 0):
+                        raise queue.Empty
+                    if self.delayed and not self.held:
+                        due_in = max(0.0, self.delayed[0][0] - time.time())
+                        remaining = due_in if remaining is None else min(remaining, due_in)
+                    self.cond.wait(remaining)
+                    continue
+            # Transactional claim: a job that is no longer queued in the database is skipped
+            if not self.persist or database.claim_job(entry[2]['job_id']):
+                return entry
+            with self.cond:
+                key = job_key(entry[2])
+                if self.index.get(key) is entry[2]:
+                    del self.index[key]
+
+    def _has_due(self):
+        with self.cond:
+            return bool(self.delayed) and self.delayed[0][0] <= time.time()
+
+    def hold(self):
+        """Stop handing out jobs (pause); put() keeps working."""
+        with self.cond:
+            self.held = True
+            self.cond.notify_all()
+
+    def release(self):
+        with self.cond:
+            self.held = False
+            self.cond.notify_all()
+
+    def wakeup(self):
+        """Wake all waiting consumers so they re-check their stop condition."""
+        with self.cond:
+            self.cond.notify_all()
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    # --- completion / restore ---
+    def complete(self, item, state):
+        """Record the final state (done or failed) of a job."""
+        with self.cond:
+            key = job_key(item)
+            if self.index.get(key) is item:
+                del self.index[key]
+            self.version += 1
+            self._completed += 1
+            prune = self.retention and self._completed % PRUNE_EVERY == 0
+        if self.persist and item.get('job_id'):
+            database.set_job_state(item['job_id'], state, item)
+            if prune:
+                database.prune_jobs(self.retention)
+
+    def restore(self):
+        """Load queued, retry_wait and interrupted jobs from the database. Returns the count."""
+        if not self.persist:
+            return 0
+        if self.retention:
+            database.prune_jobs(self.retention)
+        pending = database.load_pending_jobs()
+        with self.cond:
+            for state, item in pending:
+                if item['job_id'] in self.entries:
+                    continue
+                if state == 'retry_wait' and item.get('not_before'):
+                    heapq.heappush(self.delayed, (item['not_before'], next(self._seq), item))
+                    self.index[job_key(item)] = item
+                else:
+                    self._push(item.get('queued_at') or item.get('enqueued_at') or time.time(), item)
+            self.version += 1
+            self.cond.notify_all()
+        return len(pending)
+
+    # --- inspection ---
+    def qsize(self):
+        with self.cond:
+            return len(self.entries)
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def snapshot(self):
+        """Queued jobs as (priority, ts, item) in dispatch order."""
+        with self.cond:
+            entries = [e for e in self.heap if e[3] is not None]
+        return [(e[3]['priority'], e[1], e[3]) for e in sorted(entries)]
+
+    def delayed_snapshot(self):
+        with self.cond:
+            return [entry[2] for entry in sorted(self.delayed, key=lambda e: (e[0], e[1]))]
+
+    def listing(self):
+        """(version, queued items in dispatch order followed by retry-waiting items).
+
+        The sorted list is cached per version, so polling an unchanged 50k queue does
+        not sort it again. Callers must not modify the returned list.
+        """
+        with self.cond:
+            version, items = self._listing
+            if version != self.version:
+                queued = sorted(e for e in self.heap if e[3] is not None)
+                delayed = sorted(self.delayed, key=lambda e: (e[0], e[1]))
+                items = [e[3] for e in queued] + [d[2] for d in delayed]
+                self._listing = (self.version, items)
+            return self.version, items
@@ -0,0 +1,177 @@
+# --- Library of model files on disk (also files the daemon did not download itself) ---
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from loguru import logger
+
+from backend import database
+
+library_logger = logger.bind(name="civitai.download")
+
+# Half-finished downloads and their sidecars are not part of the library
+SKIP_SUFFIXES = ('.part', '.part.json', '.tmp', '.moving')
+HASH_CHUNK = 8 * 1024 * 1024
+SAVE_BATCH = 200
+
+
+def sha256_file(path, chunk_size=HASH_CHUNK):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Library:
+    """SHA256 index of every model file under the download tree.
+
+    scan() walks root and hashes files on a thread pool (hashlib releases the GIL,
+    so threads hash in parallel). The library_files table doubles as a stat cache:
+    a file whose size, mtime and inode are unchanged keeps its stored hash, so a
+    re-scan of terabytes only reads new or modified files. contains() answers from
+    an in-memory {sha256: path} map that is loaded lazily from the table.
+    """
+    def __init__(self, root, workers=4):
+        self.root = root
+        self.workers = max(1, int(workers))
+        self.lock = threading.Lock()
+        self.hashes = {}   # sha256 -> path
+        self.loaded = False
+        self._scan_lock = threading.Lock()
+        self.last_scan = None
+
+    @property
+    def scanning(self):
+        return self._scan_lock.locked()
+
+    def _ensure_loaded(self):
+        # Caller holds self.lock
+        if not self.loaded:
+            self.hashes = database.library_hashes()
+            self.loaded = True
+
+    def contains(self, sha256):
+        """True when a file with this hash is in the library and still on disk."""
+        if not sha256:
+            return False
+        with self.lock:
+            self._ensure_loaded()
+            path = self.hashes.get(str(sha256).lower())
+        if path is None:
+            return False
+        if os.path.exists(path):
+            return True
+        # Na de laatste scan verwijderd: vergeten, zodat het model weer gedownload kan worden
+        self.remove_file(path)
+        return False
+
+    def path_for(self, sha256):
+        with self.lock:
+            self._ensure_loaded()
+            return self.hashes.get(str(sha256).lower())
+
+    def __len__(self):
+        with self.lock:
+            self._ensure_loaded()
+            return len(self.hashes)
+
+    def _model_type(self, path):
+        rel = os.path.relpath(path, self.root)
+        parts = rel.split(os.sep)
+        return parts[0] if len(parts) > 1 else None
+
+    def add_file(self, path, sha256):
+        """Record a file the daemon just downloaded and verified."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        sha256 = str(sha256).lower()
+        path = os.path.abspath(path)
+        database.save_library_files([(path, st.st_size, st.st_mtime_ns, st.st_ino, sha256, self._model_type(path))])
+        with self.lock:
+            if self.loaded:
+                self.hashes[sha256] = path
+
+    def remove_file(self, path):
+        """Forget a file that was deleted (evicted) by the daemon."""
+        path = os.path.abspath(path)
+        database.delete_library_files([path])
+        with self.lock:
+            if self.loaded:
+                self.hashes = {sha256: known for sha256, known in self.hashes.items() if known != path}
+
+    def _walk(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            # Verborgen mappen (zoals de content store .blobs) niet scannen
+            dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+            for name in filenames:
+                if name.startswith('.') or name.endswith(SKIP_SUFFIXES):
+                    continue
+                yield os.path.join(dirpath, name)
+
+    def scan(self):
+        """Walk the tree, hash new and changed files, drop vanished ones. Returns counters.
+
+        Raises RuntimeError when a scan is already running.
+        """
+        if not self._scan_lock.acquire(blocking=False):
+            raise RuntimeError("library scan already running")
+        try:
+            return self._scan()
+        finally:
+            self._scan_lock.release()
+
+    def _scan(self):
+        start = time.monotonic()
+        root = os.path.abspath(self.root)
+        cache = database.load_library_files()
+        stats = {'files': 0, 'cached': 0, 'hashed': 0, 'removed': 0, 'errors': 0, 'bytes_hashed': 0}
+        seen = set()
+        to_hash = []
+        for path in self._walk():
+            path = os.path.abspath(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            seen.add(path)
+            stats['files'] += 1
+            cached = cache.get(path)
+            if cached and cached[3] and tuple(cached[:3]) == (st.st_size, st.st_mtime_ns, st.st_ino):
+                stats['cached'] += 1
+            else:
+                to_hash.append((path, st))
+        rows = []
+        if to_hash:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='library') as pool:
+                futures = {pool.submit(sha256_file, path): (path, st) for path, st in to_hash}
+                for future in as_completed(futures):
+                    path, st = futures[future]
+                    try:
+                        sha256 = future.result()
+                    except OSError as e:
+                        library_logger.error(f"Library scan: cannot hash {path}: {e}")
+                        stats['errors'] += 1
+                        continue
+                    stats['hashed'] += 1
+                    stats['bytes_hashed'] += st.st_size
+                    rows.append((path, st.st_size, st.st_mtime_ns, st.st_ino, sha256, self._model_type(path)))
+                    # Tussentijds opslaan: een afgebroken scan hoeft niet alles opnieuw te hashen
+                    if len(rows) >= SAVE_BATCH:
+                        database.save_library_files(rows)
+                        rows = []
+        database.save_library_files(rows)
+        vanished = [path for path in cache if path not in seen and path.startswith(root + os.sep)]
+        database.delete_library_files(vanished)
+        stats['removed'] = len(vanished)
+        with self.lock:
+            self.hashes = database.library_hashes()
+            self.loaded = True
+        stats['duration'] = round(time.monotonic() - start, 2)
+        self.last_scan = stats
+        library_logger.info(f"Library scan of {root}: {stats}")
+        return stats
@@ -1,7 +1,7 @@
 # --- Standard imports always first ---
 import os
-import json
 import threading
+import uuid
 import asyncio
 import httpx
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, status, Request
@@ -11,10 +11,14 @@ from fastapi import Query
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from backend.daemon import make_queue_item, DownloadDaemon, ws_manager
-from backend.database import get_all_metrics, log_download, log_error
+from backend import http_client
+from backend.config import config as app_config
+from backend.database import get_all_metrics, log_download, log_error, queue_waits, load_evictions
+from backend.scheduling import POLICIES, wait_summary
 from loguru import logger
 
 # App instance and universal logging middleware (after app creation)
@@ -22,14 +26,7 @@ from contextlib import asynccontextmanager
 
 
 def load_secret_key():
-    config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'configs', 'config.json'))
-    if os.path.exists(config_path):
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-            key = config.get('jwt_secret')
-            if key:
-                return key
-    return "CHANGE_THIS_SECRET"
+    return app_config.get('jwt_secret') or "CHANGE_THIS_SECRET"
 
 
 # --- Loguru file logging setup (also if main.py is loaded directly) ---
@@ -59,6 +56,7 @@ if not hasattr(daemon_instance, 'is_alive') or not daemon_instance.is_alive():
 async def lifespan(app: FastAPI):
     ws_manager.set_loop(asyncio.get_event_loop())
     yield
+    await http_client.aclose_clients()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -103,6 +101,7 @@ app.add_middleware(LogRequestsMiddleware)
 async def lifespan(app: FastAPI):
     ws_manager.set_loop(asyncio.get_event_loop())
     yield
+    await http_client.aclose_clients()
 
 
 # --- Auth dependency must be defined before any endpoint uses it ---
@@ -136,12 +135,12 @@ async def proxy_models(request: Request):
     headers = {"User-Agent": "CivitaiDaemonProxy/1.0"}
     timeout = httpx.Timeout(30.0)  # 20 seconds timeout
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            resp = await client.get(base_url, params=params, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()
-            logger.info(f"[PROXY] {request.url.path}?{request.url.query} -> {base_url} [{resp.status_code}]")
-            return JSONResponse(content=data, status_code=resp.status_code)
+        client = http_client.get_async_client()
+        resp = await client.get(base_url, params=params, headers=headers, timeout=timeout)
+        resp.raise_for_status()
+        data = resp.json()
+        logger.info(f"[PROXY] {request.url.path}?{request.url.query} -> {base_url} [{resp.status_code}]")
+        return JSONResponse(content=data, status_code=resp.status_code)
     except httpx.ReadTimeout:
         logger.error(f"[PROXY] Timeout at proxy {base_url} [{params}]")
         return JSONResponse(content={"error": "Upstream timeout"}, status_code=504)
@@ -154,27 +153,11 @@ async def proxy_models(request: Request):
 
 
 
-# Only the first item in the queue is considered the active download
+# Active downloads come from the per-worker registry of the daemon
 @app.get("/api/active_downloads")
 def api_active_downloads(user: str = Depends(get_current_user)):
     try:
-        queue_items = list(daemon_instance.queue.queue)
-        if queue_items:
-            # Return only the first item as the active download
-            item = queue_items[0]
-            # If item is a tuple (priority, ts, dict), extract dict
-            if isinstance(item, tuple) and len(item) == 3 and isinstance(item[2], dict):
-                item = item[2]
-            if hasattr(item, 'asdict'):
-                return {"active_downloads": [item.asdict()]}
-            elif hasattr(item, '__dict__'):
-                return {"active_downloads": [dict(item.__dict__)]}
-            elif isinstance(item, dict):
-                return {"active_downloads": [item]}
-            else:
-                return {"active_downloads": []}
-        else:
-            return {"active_downloads": []}
+        return {"active_downloads": daemon_instance.active_downloads}
     except Exception as e:
         log.error(f"Error in active_downloads endpoint: {e}")
         log_error('system', '-', f"Error in active_downloads endpoint: {e}")
@@ -184,18 +167,9 @@ def api_active_downloads(user: str = Depends(get_current_user)):
 # New endpoint: only model_id and model_version_id for all downloaded models
 @app.get("/api/downloaded_ids")
 def api_downloaded_ids(user: str = Depends(get_current_user)):
-    # all_downloaded is a list of dicts or objects; extract only model_id and model_version_id
-    result = []
-    for item in daemon_instance.all_downloaded:
-        # Support both dict and object
-        if isinstance(item, dict):
-            mid = item.get("model_id")
-            mvid = item.get("model_version_id")
-        else:
-            mid = getattr(item, "model_id", None)
-            mvid = getattr(item, "model_version_id", None)
-        if mid and mvid:
-            result.append({"model_id": mid, "model_version_id": mvid})
+    # Served from the compact in-memory index, not from a list of history rows
+    result = [{"model_id": mid, "model_version_id": mvid}
+              for mid, mvid in daemon_instance.downloaded.pairs() if mid and mvid and mvid != 'None']
     return {"downloaded": result}
 
 
@@ -203,8 +177,11 @@ def api_downloaded_ids(user: str = Depends(get_current_user)):
 @app.get("/api/last_downloaded")
 def api_last_downloaded(user: str = Depends(get_current_user)):
     # Return all fields for each downloaded model
+    # Workers appendleft under daemon_instance.lock; iterate a copy
+    with daemon_instance.lock:
+        items = list(daemon_instance.last_downloaded)
     result = []
-    for item in daemon_instance.last_downloaded:
+    for item in items:
         if hasattr(item, 'asdict'):
             result.append(item.asdict())
         elif isinstance(item, dict):
@@ -335,8 +312,7 @@ async def api_download(request: Request, user: str = Depends(get_current_user)):
         if not all(f in data and data[f] for f in required_fields):
             log_error('api', '-', f"Missing required fields in /api/download by {user['user']}")
             raise HTTPException(status_code=422, detail="Missing required fields: model_id, url, filename, model_type, model_version_id")
-        from backend.database import is_already_downloaded
-        if is_already_downloaded(data.get('model_id'), data.get('model_version_id')):
+        if daemon_instance.downloaded.contains(data.get('model_id'), data.get('model_version_id')):
             item = make_queue_item(
                 model_id=data.get('model_id'),
                 url=data.get('url'),
@@ -345,7 +321,8 @@ async def api_download(request: Request, user: str = Depends(get_current_user)):
                 priority=data.get('priority', 0),
                 model_type=data.get('model_type'),
                 model_version_id=data.get('model_version_id'),
-                base_model=data.get('baseModel')
+                base_model=data.get('baseModel'),
+                hashes=data.get('hashes')
             )
             daemon_instance.add_job(item, skipped=True, reason="already downloaded")
             return {"status": "already downloaded"}
@@ -357,7 +334,8 @@ async def api_download(request: Request, user: str = Depends(get_current_user)):
             priority=data.get('priority', 0),
             model_type=data.get('model_type'),
             model_version_id=data.get('model_version_id'),
-            base_model=data.get('baseModel')
+            base_model=data.get('baseModel'),
+            hashes=data.get('hashes')
         )
         # After download: if hash check fails, remove the file
         def after_download_hook(item, file_path, hash_ok):
@@ -368,7 +346,10 @@ async def api_download(request: Request, user: str = Depends(get_current_user)):
                 except Exception as e:
                     log_error('download', item['model_id'], item['filename'], f"Hash check failed, could not remove file: {file_path}, error: {e}")
         item['after_download_hook'] = after_download_hook
-        daemon_instance.add_job(item)
+        # Fair-share scheduling verdeelt de queue per submitter
+        item['submitter'] = user['user']
+        if daemon_instance.add_job(item) == 'duplicate':
+            return {"status": "duplicate", "policy": daemon_instance.duplicate_policy}
         return {"status": "queued", "item": item}
     except Exception as e:
         log_error('api', '-', f"Exception in /api/download: {e}")
@@ -383,9 +364,9 @@ async def api_batch(request: Request, user: str = Depends(get_current_user)):
         if not isinstance(manifest, list):
             log_error('api', '-', f"Manifest not a list in /api/batch by {user['user']}")
             raise HTTPException(status_code=422, detail="Manifest must be a list of jobs")
-        from backend.database import is_already_downloaded
-        count = 0
-        skipped = 0
+        items = []
+        # Elke batch is een eigen flow voor fair-share scheduling
+        batch = f"{user['user']}:{uuid.uuid4().hex[:8]}"
         for entry in manifest:
             if not isinstance(entry, dict):
                 continue
@@ -398,7 +379,8 @@ async def api_batch(request: Request, user: str = Depends(get_current_user)):
                 sha256=entry.get('sha256'),
                 priority=entry.get('priority', 0),
                 model_type=entry.get('model_type'),
-                model_version_id=entry.get('model_version_id')
+                model_version_id=entry.get('model_version_id'),
+                hashes=entry.get('hashes')
             )
             # After download: if hash check fails, remove the file
             def after_download_hook(item, file_path, hash_ok):
@@ -409,13 +391,12 @@ async def api_batch(request: Request, user: str = Depends(get_current_user)):
                     except Exception as e:
                         log_error('download', item.model_id, item.filename, f"Hash check failed, could not remove file: {file_path}, error: {e}")
             item['after_download_hook'] = after_download_hook
-            if is_already_downloaded(entry.get('model_id'), entry.get('model_version_id')):
-                skipped += 1
-                daemon_instance.add_job(item, skipped=True, reason="already downloaded")
-                continue
-            daemon_instance.add_job(item)
-            count += 1
-        return {"status": "batch_queued", "queued": count, "skipped": skipped}
+            item['submitter'] = user['user']
+            item['batch'] = batch
+            items.append(item)
+        # One transaction for the whole manifest instead of one per job
+        count, skipped, duplicates = daemon_instance.add_jobs(items)
+        return {"status": "batch_queued", "queued": count, "skipped": skipped, "duplicates": duplicates, "batch": batch}
     except Exception as e:
         log_error('api', '-', f"Exception in /api/batch: {e}")
         raise
@@ -423,7 +404,23 @@ async def api_batch(request: Request, user: str = Depends(get_current_user)):
 
 @app.get("/api/status")
 def api_status(user: str = Depends(get_current_user)):
-    return {"queue_size": daemon_instance.queue.qsize(), "running": daemon_instance.running, "paused": daemon_instance.paused}
+    # Totale grootte van de wachtrij volgens de pre-flight probes
+    queued_bytes, unknown_size = daemon_instance.queued_bytes()
+    return {
+        "queue_size": daemon_instance.queue.qsize(),
+        "running": daemon_instance.running,
+        "paused": daemon_instance.paused,
+        "retry_wait": len(daemon_instance.delayed),
+        "workers": daemon_instance.workers,
+        "active": len(daemon_instance.active_downloads),
+        "verifying": daemon_instance.verifier.pending(),
+        "moving": daemon_instance.mover.pending() if daemon_instance.mover is not None else 0,
+        "queued_bytes": queued_bytes,
+        "queued_unknown_size": unknown_size,
+        "held": len(daemon_instance.held),
+        "disk": daemon_instance.disk.status({"download_dir": daemon_instance._library_root(),
+                                             "scratch_dir": daemon_instance.scratch_dir}),
+    }
 
 
 @app.get("/api/metrics")
@@ -452,54 +449,239 @@ def api_metrics(user: str = Depends(get_current_user)):
 
 
 @app.get("/api/queue")
-def api_queue(user: str = Depends(get_current_user)):
+def api_queue(request: Request, response: Response, offset: int = Query(0, ge=0), limit: int = Query(None, ge=1),
+              user: str = Depends(get_current_user)):
     try:
-        # Try to get the current active job from the daemon, fallback to first in queue
-        active_job = getattr(daemon_instance, 'current_job', None)
-        queue_items = list(daemon_instance.queue.queue)
-        queue_json = []
-        # If no explicit current_job, but queue is not empty, use first item as active
-        if not active_job and queue_items:
-            item = queue_items[0]
-            if hasattr(item, 'asdict'):
-                active_job = item.asdict()
-            elif hasattr(item, '__dict__'):
-                active_job = dict(item.__dict__)
-            else:
-                active_job = str(item)
-            # Remove from queue_items so it's not duplicated
-            queue_items = queue_items[1:]
-        elif active_job:
-            # If current_job is an object, convert to dict
-            if hasattr(active_job, 'asdict'):
-                active_job = active_job.asdict()
-            elif hasattr(active_job, '__dict__'):
-                active_job = dict(active_job.__dict__)
-        # Add active job first if present
-        if active_job:
-            queue_json.append(active_job)
-        # Add the rest of the queue
-        for item in queue_items:
-            # If item is a tuple (priority, ts, dict), extract dict
-            if isinstance(item, tuple) and len(item) == 3 and isinstance(item[2], dict):
-                item = item[2]
-            if hasattr(item, 'asdict'):
-                queue_json.append(item.asdict())
-            elif hasattr(item, '__dict__'):
-                queue_json.append(dict(item.__dict__))
-            elif isinstance(item, dict):
-                queue_json.append(item)
-            else:
-                queue_json.append(str(item))
-        if not queue_json:
-            queue_json = ["The queue is empty."]
-        return {"queue": queue_json}
+        # Active jobs (one per busy worker) first, then the waiting jobs in priority order,
+        # then jobs waiting for a retry. Unchanged polls get a 304 via the ETag.
+        active = daemon_instance.active_downloads
+        version, waiting = daemon_instance.queue.listing()
+        etag = f'W/"{version}-{len(active)}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        total = len(active) + len(waiting)
+        end = total if limit is None else offset + limit
+        page = active[offset:end]
+        page += waiting[max(0, offset - len(active)):max(0, end - len(active))]
+        queue_json = page if total else ["The queue is empty."]
+        response.headers["ETag"] = etag
+        return {"queue": queue_json, "total": total, "offset": offset, "limit": limit, "version": version}
     except Exception as e:
         log.error(f"Error in queue endpoint: {e}")
         log_error('system', '-', f"Error in queue endpoint: {e}")
         return {"queue": [f"Error: {str(e)}"], "error": str(e)}
 
 
+@app.patch("/api/queue/{job_id}")
+async def api_queue_reprioritize(job_id: str, request: Request, user=Depends(get_current_user)):
+    if user["role"] != "admin":
+        log_error('system', '-', f"Unauthorized queue change attempt by {user['user']}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    data = await request.json()
+    priority = data.get("priority")
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        raise HTTPException(status_code=422, detail="priority must be an integer")
+    item = daemon_instance.queue.get_job(job_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Job not found in queue")
+    daemon_instance.queue.reprioritize(item, priority)
+    log.info(f"Job {job_id} ({item['filename']}) set to priority {priority} by {user['user']}")
+    return {"status": "reprioritized", "job_id": job_id, "priority": priority}
+
+
+@app.post("/api/queue/{job_id}/move")
+async def api_queue_move(job_id: str, request: Request, user=Depends(get_current_user)):
+    if user["role"] != "admin":
+        log_error('system', '-', f"Unauthorized queue change attempt by {user['user']}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    data = await request.json()
+    position = data.get("position")
+    if position not in ("top", "bottom"):
+        raise HTTPException(status_code=422, detail="position must be 'top' or 'bottom'")
+    item = daemon_instance.queue.move(job_id, position)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Job not found in queue")
+    log.info(f"Job {job_id} ({item['filename']}) moved to {position} by {user['user']}")
+    return {"status": "moved", "job_id": job_id, "position": position, "priority": item['priority']}
+
+
+@app.delete("/api/queue/{job_id}")
+def api_queue_remove(job_id: str, user=Depends(get_current_user)):
+    if user["role"] != "admin":
+        log_error('system', '-', f"Unauthorized queue change attempt by {user['user']}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    item = daemon_instance.queue.remove(job_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Job not found in queue")
+    log.info(f"Job {job_id} ({item['filename']}) removed from queue by {user['user']}")
+    ws_manager.broadcast('queue_update', {'queued': daemon_instance.queue.qsize(), 'active': len(daemon_instance.active_jobs)})
+    return {"status": "removed", "job_id": job_id}
+
+
+@app.post("/api/jobs/{job_id}/{action}")
+def api_job_control(job_id: str, action: str, user=Depends(get_current_user)):
+    if user["role"] != "admin":
+        log_error('system', '-', f"Unauthorized job {action} attempt by {user['user']}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    handlers = {
+        "cancel": daemon_instance.cancel,
+        "pause": daemon_instance.pause_job,
+        "resume": daemon_instance.resume_job,
+    }
+    if action not in handlers:
+        raise HTTPException(status_code=404, detail=f"Unknown action: {action}")
+    if not handlers[action](job_id):
+        raise HTTPException(status_code=404, detail="Job not found" if action == "cancel" else "Job is not downloading")
+    log.info(f"Job {job_id}: {action} by {user['user']}")
+    return {"status": {"cancel": "cancel_requested", "pause": "paused", "resume": "resumed"}[action], "job_id": job_id}
+
+
+@app.get("/api/throttle")
+def api_throttle(user: str = Depends(get_current_user)):
+    return daemon_instance.limiter.status()
+
+
+@app.post("/api/throttle")
+async def api_set_throttle(request: Request, user=Depends(get_current_user)):
+    if user["role"] != "admin":
+        log_error('system', '-', f"Unauthorized throttle change attempt by {user['user']}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    data = await request.json()
+    try:
+        result = daemon_instance.set_throttle(
+            throttle=data.get("throttle"),
+            per_job=data.get("per_job"),
+            schedule=data.get("schedule"),
+        )
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    log.info(f"Bandwidth limit changed by {user['user']}: {result}")
+    return result
+
+
+@app.get("/api/workers")
+def api_workers(user: str = Depends(get_current_user)):
+    return {"workers": daemon_instance.workers, "active": len(daemon_instance.active_downloads)}
+
+
+@app.post("/api/workers")
+async def api_set_workers(request: Request, user=Depends(get_current_user)):
+    if user["role"] != "admin":
+        log_error('system', '-', f"Unauthorized worker resize attempt by {user['user']}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    data = await request.json()
+    try:
+        workers = daemon_instance.set_workers(data.get("workers"))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    log.info(f"Worker pool resized to {workers} by {user['user']}")
+    return {"status": "resized", "workers": workers}
+
+
+@app.get("/api/hosts")
+def api_hosts(user: str = Depends(get_current_user)):
+    """Adaptive concurrency limit, in-flight requests and throughput (MB/s) per download host."""
+    return {"hosts": daemon_instance.hosts.status()}
+
+
+@app.get("/api/scheduling")
+def api_scheduling(since: str = Query(None), user: str = Depends(get_current_user)):
+    """Current scheduling policy and queue wait times (seconds) per policy since an ISO timestamp."""
+    return {
+        "policy": daemon_instance.queue.policy.name,
+        "policies": list(POLICIES),
+        "waits": wait_summary(queue_waits(since)),
+    }
+
+
+@app.post("/api/scheduling")
+async def api_set_scheduling(request: Request, user=Depends(get_current_user)):
+    if user["role"] != "admin":
+        log_error('system', '-', f"Unauthorized scheduling change attempt by {user['user']}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    data = await request.json()
+    if not isinstance(data.get("policy"), str):
+        raise HTTPException(status_code=422, detail="policy must be a string")
+    try:
+        policy = daemon_instance.set_scheduling(data["policy"])
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    log.info(f"Scheduling policy set to {policy} by {user['user']}")
+    return {"status": "changed", "policy": policy}
+
+
+@app.get("/api/storage")
+def api_storage(user: str = Depends(get_current_user)):
+    """Disk budgets and usage per model_type, plus the most recent evictions."""
+    return dict(daemon_instance.evictor.status(), recent_evictions=load_evictions(20))
+
+
+def _model_version(data):
+    if not data.get("model_id") or not data.get("model_version_id"):
+        raise HTTPException(status_code=422, detail="model_id and model_version_id are required")
+    return data["model_id"], data["model_version_id"]
+
+
+@app.post("/api/storage/pin")
+async def api_storage_pin(request: Request, user=Depends(get_current_user)):
+    if user["role"] != "admin":
+        log_error('system', '-', f"Unauthorized pin attempt by {user['user']}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    data = await request.json()
+    model_id, model_version_id = _model_version(data)
+    pinned = bool(data.get("pinned", True))
+    if not daemon_instance.evictor.pin(model_id, model_version_id, pinned):
+        raise HTTPException(status_code=404, detail="Model version has no downloaded files")
+    log.info(f"Model {model_id}/{model_version_id} {'pinned' if pinned else 'unpinned'} by {user['user']}")
+    return {"status": "pinned" if pinned else "unpinned", "model_id": model_id, "model_version_id": model_version_id}
+
+
+@app.post("/api/storage/touch")
+async def api_storage_touch(request: Request, user=Depends(get_current_user)):
+    """Mark a model as used now (consumers call this when they load a model)."""
+    data = await request.json()
+    model_id, model_version_id = _model_version(data)
+    if not daemon_instance.evictor.touch(model_id, model_version_id):
+        raise HTTPException(status_code=404, detail="Model version has no downloaded files")
+    return {"status": "touched", "model_id": model_id, "model_version_id": model_version_id}
+
+
+@app.post("/api/storage/refetch")
+async def api_storage_refetch(request: Request, user=Depends(get_current_user)):
+    """Queue an evicted model again with the url and filename it had."""
+    data = await request.json()
+    model_id, model_version_id = _model_version(data)
+    result = daemon_instance.refetch(model_id, model_version_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Model version was never evicted")
+    log.info(f"Refetch of {model_id}/{model_version_id} requested by {user['user']}: {result}")
+    return {"status": result, "model_id": model_id, "model_version_id": model_version_id}
+
+
+@app.get("/api/library")
+def api_library(user: str = Depends(get_current_user)):
+    library = daemon_instance.library
+    return {
+        "root": library.root,
+        "files": len(library),
+        "scanning": library.scanning,
+        "last_scan": library.last_scan,
+    }
+
+
+@app.post("/api/library/scan", status_code=202)
+def api_library_scan(user=Depends(get_current_user)):
+    if user["role"] != "admin":
+        log_error('system', '-', f"Unauthorized library scan attempt by {user['user']}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    if daemon_instance.library.scanning:
+        raise HTTPException(status_code=409, detail="Library scan already running")
+    # Scannen kan bij terabytes lang duren: op de achtergrond, voortgang via /api/library
+    threading.Thread(target=daemon_instance._scan_library_safe, name='library-scan', daemon=True).start()
+    log.info(f"Library scan started by {user['user']}")
+    return {"status": "started", "root": daemon_instance.library.root}
+
+
 # --- Test-only endpoint to allow testtoken for local/test runs ---
 import sys
 if os.environ.get("CIVITAI_TEST_AUTH") == "1" or ("pytest" in sys.modules):
@@ -0,0 +1,97 @@
+# --- Background mover: verified files from the scratch disk to download_dir ---
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.ratelimit import TokenBucket, MB
+
+MOVE_CHUNK = 8 * 1024 * 1024
+MOVING_SUFFIX = '.moving'
+
+
+def _copy_range(src_fd, dst_fd, count):
+    """Copy count bytes in the kernel where possible. Returns the bytes copied (0 at EOF)."""
+    if hasattr(os, 'copy_file_range'):
+        try:
+            return os.copy_file_range(src_fd, dst_fd, count)
+        except OSError:
+            pass  # EXDEV on older kernels, or unsupported by NFS: try sendfile
+    try:
+        return os.sendfile(dst_fd, src_fd, None, count)
+    except (OSError, AttributeError):
+        data = os.read(src_fd, count)
+        return os.write(dst_fd, data) if data else 0
+
+
+def _same_device(src, dst_dir):
+    return os.stat(src).st_dev == os.stat(dst_dir).st_dev
+
+
+class FileMover:
+    """Moves finished downloads off the scratch disk on its own small thread pool.
+
+    On the same filesystem a move is a rename. Otherwise the file is copied with
+    copy_file_range (sendfile, then read/write as fallbacks) into <dst>.moving,
+    paced by a token bucket of `limit` MB/s (0 = unlimited), and renamed into
+    place; the source is removed afterwards. Slow storage then only delays the
+    mover, not the download workers or the verify stage.
+    """
+    def __init__(self, workers=1, limit=0, fsync=False):
+        self.workers = max(1, int(workers))
+        self.bucket = TokenBucket(float(limit or 0) * MB)
+        self.limit = float(limit or 0)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='mover')
+
+    def set_limit(self, limit):
+        self.limit = float(limit or 0)
+        self.bucket.set_rate(self.limit * MB)
+
+    def submit(self, fn, *args):
+        with self._lock:
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def pending(self):
+        """Number of files waiting for or in a move."""
+        with self._lock:
+            return self._pending
+
+    def move(self, src, dst):
+        """Move src to dst; rename when possible, else a paced kernel copy."""
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if _same_device(src, os.path.dirname(dst)):
+            os.replace(src, dst)
+            return dst
+        tmp = dst + MOVING_SUFFIX
+        try:
+            with open(src, 'rb') as fsrc, open(tmp, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    self.bucket.consume(min(MOVE_CHUNK, remaining))
+                    copied = _copy_range(fsrc.fileno(), fdst.fileno(), min(MOVE_CHUNK, remaining))
+                    if not copied:
+                        raise OSError(f"Unexpected end of {src} while moving")
+                    remaining -= copied
+                if self.fsync:
+                    os.fsync(fdst.fileno())
+            shutil.copystat(src, tmp)
+            os.replace(tmp, dst)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        os.remove(src)
+        return dst
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,191 @@
+# --- Pre-flight probe of queued jobs (redirect, size, range support, expiry) ---
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+import httpx
+from loguru import logger
+
+preflight_logger = logger.bind(name="civitai.download")
+
+PREFLIGHT_TTL = 900.0      # seconds a result without a signed expiry is trusted
+EXPIRY_MARGIN = 60.0       # a signed url this close to expiring is resolved again
+ERROR_RECHECK = 300.0      # seconds before a probe that failed (timeout, DNS) is tried again
+CONGESTION_STATUS = {429, 503}
+
+
+def _content_range_total(value):
+    # 'bytes 0-0/12345' -> 12345
+    try:
+        return int(value.rsplit('/', 1)[1])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def signed_url_expiry(url):
+    """Epoch seconds at which a signed CDN url stops working, or None when it is not signed.
+
+    Understands S3/R2 style (X-Amz-Date + X-Amz-Expires), GCS (X-Goog-Date + X-Goog-Expires)
+    and CloudFront/B2 style (Expires=<epoch>).
+    """
+    try:
+        params = {key.lower(): value for key, value in httpx.URL(url).params.multi_items()}
+    except Exception:
+        return None
+    for prefix in ('x-amz-', 'x-goog-'):
+        if prefix + 'expires' in params and prefix + 'date' in params:
+            try:
+                signed = datetime.strptime(params[prefix + 'date'], '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+                return signed.timestamp() + int(params[prefix + 'expires'])
+            except ValueError:
+                return None
+    if 'expires' in params:
+        try:
+            return float(params['expires'])
+        except ValueError:
+            return None
+    return None
+
+
+def probe(client, url, headers=None, timeout=30.0):
+    """Resolve url with a one-byte range request, following redirects. Returns a result dict.
+
+    Keys: status, size (None when unknown), ranges, etag, last_modified, final_url,
+    expires (epoch or None), redirects, checked_at; or error and checked_at when the
+    request itself failed.
+    """
+    checked_at = time.time()
+    try:
+        with client.stream('GET', url, timeout=timeout, headers=dict(headers or {}, Range='bytes=0-0')) as r:
+            size = None
+            if r.status_code == 206:
+                size = _content_range_total(r.headers.get('content-range'))
+            elif r.status_code == 200 and r.headers.get('content-length'):
+                size = int(r.headers['content-length'])
+            final_url = str(r.url)
+            return {
+                'status': r.status_code,
+                'size': size,
+                'ranges': r.status_code == 206 or r.headers.get('accept-ranges', '').lower() == 'bytes',
+                'etag': r.headers.get('etag'),
+                'last_modified': r.headers.get('last-modified'),
+                'retry_after': r.headers.get('retry-after'),
+                'final_url': final_url,
+                'expires': signed_url_expiry(final_url),
+                'redirects': len(r.history),
+                'checked_at': checked_at,
+            }
+    except (httpx.HTTPError, ValueError) as e:
+        return {'error': str(e) or type(e).__name__, 'checked_at': checked_at}
+
+
+def is_fresh(result, now=None):
+    """True when result is a successful probe whose final url can still be used."""
+    if not result or result.get('error') or (result.get('status') or 0) >= 400:
+        return False
+    now = now or time.time()
+    if result.get('expires'):
+        return result['expires'] - EXPIRY_MARGIN > now
+    return now - result.get('checked_at', 0) < PREFLIGHT_TTL
+
+
+def _due(result, now):
+    if not result:
+        return True
+    if result.get('error') or result.get('status') in CONGESTION_STATUS:
+        return now - result.get('checked_at', 0) >= ERROR_RECHECK
+    return not is_fresh(result, now)
+
+
+class Prober:
+    """Probes the next queued jobs before a worker picks them up.
+
+    A background thread takes the queued jobs from candidates() (dispatch order)
+    and probes, on a pool of `workers` threads, the first `ahead` ones without a
+    fresh result; when that window is done it sizes jobs further back that were
+    never probed, `ahead` per pass, so size-aware scheduling sees the whole queue.
+    on_result(item, result) is called for each. The thread sleeps until wake()
+    (new jobs, a worker took one) or `interval` seconds, so signed urls that are
+    about to expire get resolved again. A 429/503 from a host ends the pass;
+    probes never hold a download slot.
+    """
+    def __init__(self, candidates, on_result, client=None, headers=None, workers=4, ahead=50,
+                 timeout=30.0, interval=30.0):
+        self.candidates = candidates
+        self.on_result = on_result
+        self.client = client          # callable returning the httpx client
+        self.headers = headers        # callable returning request headers (API key)
+        self.workers = max(1, int(workers))
+        self.ahead = max(1, int(ahead))
+        self.timeout = timeout
+        self.interval = interval
+        self.probed = 0
+        self.dead = 0
+        self.congested = False
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='preflight')
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._loop, name='preflight', daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _loop(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped:
+                break
+            try:
+                if self.run_once() and not self.congested:
+                    self._wake.set()  # meer te doen: direct de volgende ronde
+            except Exception as e:
+                preflight_logger.error(f"Pre-flight pass failed: {e}")
+
+    def run_once(self):
+        """One pass: the due jobs in the window, then unprobed jobs behind it. Returns the number probed."""
+        now = time.time()
+        items = [item for item in self.candidates() if str(item.get('url')).startswith(('http://', 'https://'))]
+        batch = [item for item in items[:self.ahead] if _due(item.get('preflight'), now)]
+        for item in items[self.ahead:]:
+            if len(batch) >= self.ahead:
+                break
+            if 'preflight' not in item:
+                batch.append(item)
+        if not batch:
+            return 0
+        congested = threading.Event()
+        futures = [self._executor.submit(self._probe_item, item, congested) for item in batch]
+        wait(futures)
+        self.congested = congested.is_set()
+        return sum(1 for future in futures if not future.cancelled() and future.result())
+
+    def _probe_item(self, item, congested):
+        if self._stopped or congested.is_set():
+            return False
+        result = probe(self.client(), item['url'], self.headers() if self.headers else None, self.timeout)
+        if result.get('status') in CONGESTION_STATUS:
+            # Host heeft het druk: de rest van deze ronde overslaan
+            congested.set()
+        self.probed += 1
+        try:
+            self.on_result(item, result)
+        except Exception as e:
+            preflight_logger.error(f"Pre-flight result handler failed for {item.get('filename')}: {e}")
+        return True
+
+    def status(self):
+        return {'workers': self.workers, 'ahead': self.ahead, 'probed': self.probed, 'dead': self.dead}
@@ -0,0 +1,139 @@
+# --- Bandwidth limiting (token bucket, shared by all workers and segments) ---
+import threading
+import time
+from datetime import datetime
+
+MB = 1024 * 1024
+# Bucket depth in seconds of traffic: small enough to keep throughput graphs flat
+BURST_SECONDS = 0.05
+
+
+class TokenBucket:
+    """Thread-safe token bucket in bytes/s. rate 0 means unlimited.
+
+    Consumers may take the bucket into debt and then sleep off their own share, so
+    concurrent workers are paced fairly with one lock acquisition per chunk.
+    """
+    def __init__(self, rate=0):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.capacity = 0
+        self.tokens = 0.0
+        self.stamp = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self.lock:
+            self.rate = max(0, int(rate or 0))
+            self.capacity = max(64 * 1024, self.rate * BURST_SECONDS)
+            self.tokens = min(self.tokens, self.capacity)
+            self.stamp = time.monotonic()
+
+    def _reserve(self, amount):
+        """Take amount bytes, return how long the caller has to wait."""
+        with self.lock:
+            if not self.rate:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def consume(self, amount):
+        wait = self._reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _parse_hhmm(value):
+    hours, minutes = str(value).split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def validate_schedule(schedule):
+    """Normalize [{"start": "01:00", "end": "07:00", "limit": 0}, ...]; raises ValueError."""
+    result = []
+    for entry in schedule or []:
+        if not isinstance(entry, dict) or 'start' not in entry or 'end' not in entry:
+            raise ValueError("schedule entries need 'start', 'end' and 'limit'")
+        start, end = _parse_hhmm(entry['start']), _parse_hhmm(entry['end'])
+        limit = float(entry.get('limit', 0))
+        if not (0 <= start < 1440 and 0 <= end <= 1440) or limit < 0:
+            raise ValueError(f"invalid schedule entry: {entry}")
+        result.append({'start': entry['start'], 'end': entry['end'], 'limit': limit})
+    return result
+
+
+class BandwidthLimiter:
+    """Global download cap plus optional per-job cap, in MB/s (0 = unlimited).
+
+    The global limit can follow a daily schedule; windows may wrap past midnight,
+    outside all windows the default limit applies.
+    """
+    SCHEDULE_RECHECK = 10.0  # seconds
+
+    def __init__(self, limit=0, per_job=0, schedule=None):
+        self.lock = threading.Lock()
+        self.bucket = TokenBucket()
+        self.limit = 0.0
+        self.per_job = 0.0
+        self.schedule = []
+        self._next_check = 0.0
+        self.configure(limit=limit, per_job=per_job, schedule=schedule)
+
+    def configure(self, limit=None, per_job=None, schedule=None):
+        with self.lock:
+            if limit is not None:
+                if float(limit) < 0:
+                    raise ValueError("throttle must be >= 0")
+                self.limit = float(limit)
+            if per_job is not None:
+                if float(per_job) < 0:
+                    raise ValueError("per-job throttle must be >= 0")
+                self.per_job = float(per_job)
+            if schedule is not None:
+                self.schedule = validate_schedule(schedule)
+            self._next_check = 0.0
+        self._apply_schedule(time.monotonic())
+
+    def current_limit(self, now=None):
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for entry in self.schedule:
+            start, end = _parse_hhmm(entry['start']), _parse_hhmm(entry['end'])
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return entry['limit']
+        return self.limit
+
+    def _apply_schedule(self, mono):
+        with self.lock:
+            if mono < self._next_check:
+                return
+            self._next_check = mono + self.SCHEDULE_RECHECK
+            rate = int(self.current_limit() * MB)
+        if rate != self.bucket.rate:
+            self.bucket.set_rate(rate)
+
+    def job_bucket(self):
+        """Bucket for one job (shared by its segments), or None without a per-job cap."""
+        return TokenBucket(int(self.per_job * MB)) if self.per_job else None
+
+    def throttle(self, amount, job_bucket=None):
+        """Account amount bytes; sleeps as needed. Cheap no-op when unlimited."""
+        mono = time.monotonic()
+        if mono >= self._next_check:
+            self._apply_schedule(mono)
+        if job_bucket is not None:
+            job_bucket.consume(amount)
+        if self.bucket.rate:
+            self.bucket.consume(amount)
+
+    def status(self):
+        return {
+            'throttle': self.limit,
+            'per_job': self.per_job,
+            'schedule': self.schedule,
+            'current': self.current_limit(),
+        }
@@ -0,0 +1,199 @@
+# --- Scheduling policies for the job queue (fifo, sjf, fair, aging) ---
+GB = 1024 * 1024 * 1024
+DEFAULT_UNKNOWN_SIZE = 2 * GB   # sjf/fair estimate for a job the pre-flight stage has not sized yet
+DEFAULT_AGING = 3600.0          # seconds of waiting worth one priority level
+FAIR_PRUNE = 256                # flows kept before finished ones are forgotten
+
+
+def job_size(item):
+    """Size in bytes found by the pre-flight stage, or None."""
+    result = item.get('preflight')
+    if result and not result.get('error'):
+        return result.get('size') or None
+    return None
+
+
+def flow_of(item):
+    """Fair-share flow of a job: its batch, else its submitter."""
+    return item.get('batch') or item.get('submitter') or 'default'
+
+
+class FifoPolicy:
+    """Priority first, then arrival time (the original queue order).
+
+    A policy turns a job into a heap key; JobQueue calls key() under its lock
+    when a job is pushed and dispatched() when it is popped. size_aware policies
+    are asked for resized() when the pre-flight stage learns the size of a
+    queued job, and the jobs it returns are re-keyed.
+    """
+    name = 'fifo'
+    size_aware = False
+
+    def key(self, item, ts):
+        return (item['priority'], ts)
+
+    def resized(self, item, queued):
+        """Jobs whose key changed now that item has a size; queued iterates the queued jobs."""
+        return [item]
+
+    def dispatched(self, item):
+        pass
+
+    def reset(self):
+        pass
+
+
+class SjfPolicy(FifoPolicy):
+    """Shortest job first within a priority level; an unknown size counts as unknown_size."""
+    name = 'sjf'
+    size_aware = True
+
+    def __init__(self, unknown_size=DEFAULT_UNKNOWN_SIZE):
+        self.unknown_size = int(unknown_size)
+
+    def key(self, item, ts):
+        return (item['priority'], job_size(item) or self.unknown_size, ts)
+
+
+class AgingPolicy(FifoPolicy):
+    """Priority minus waiting time: every `aging` seconds in the queue is worth one level.
+
+    At any moment, priority - waited / aging orders jobs the same as
+    priority * aging + enqueue time, so the heap key does not change while a job
+    waits and low priority jobs still reach the front eventually.
+    """
+    name = 'aging'
+
+    def __init__(self, aging=DEFAULT_AGING):
+        self.aging = max(1.0, float(aging))
+
+    def key(self, item, ts):
+        return (item['priority'] * self.aging + ts, ts)
+
+
+class FairPolicy(FifoPolicy):
+    """Weighted start-time fair queuing across flows (batches, else submitters).
+
+    Each flow gets a virtual start tag per job: max(virtual time, finish tag of
+    the flow's previous job); the finish tag adds size / weight (in GB, unknown
+    sizes as unknown_size). Jobs are served by priority, then start tag, so a
+    single GUI download does not wait behind a 500-job batch, and a flow with
+    weight 2 gets twice the bytes of a flow with weight 1. Jobs are tagged on
+    enqueue, mostly before pre-flight knows their size; resized() recharges the
+    job with its real size and moves the tags of the flow's later jobs along.
+    Weights are looked up by flow, then submitter; the default weight is 1.
+    """
+    name = 'fair'
+    size_aware = True
+
+    def __init__(self, weights=None, unknown_size=DEFAULT_UNKNOWN_SIZE):
+        self.weights = dict(weights or {})
+        self.unknown_size = int(unknown_size)
+        self.reset()
+
+    def reset(self):
+        self.vtime = 0.0
+        self.finish = {}  # flow -> finish tag of its last queued job
+
+    def _weight(self, item):
+        weight = self.weights.get(flow_of(item)) or self.weights.get(item.get('submitter')) or 1.0
+        return max(float(weight), 1e-3)
+
+    def _cost(self, item):
+        return (job_size(item) or self.unknown_size) / GB / self._weight(item)
+
+    def key(self, item, ts):
+        start = item.get('_vstart')
+        if start is None:
+            # Nieuwe job: tag uitdelen en de flow belasten; een re-key (prioriteit) houdt zijn tag
+            flow = flow_of(item)
+            start = max(self.vtime, self.finish.get(flow, 0.0))
+            item['_vfloor'] = self.vtime
+            item['_vcost'] = self._cost(item)
+            self.finish[flow] = start + item['_vcost']
+            item['_vstart'] = start
+        return (item['priority'], start, ts)
+
+    def resized(self, item, queued):
+        start = item.get('_vstart')
+        if start is None:
+            return []
+        cost = self._cost(item)
+        if cost == item.get('_vcost'):
+            return []
+        # Later jobs of the flow: tags opnieuw ketenen met de echte grootte
+        flow = flow_of(item)
+        later = sorted((other for other in queued if other is not item and flow_of(other) == flow
+                        and other.get('_vstart', -1.0) > start), key=lambda other: other['_vstart'])
+        last = later[-1] if later else item
+        was_last = self.finish.get(flow) == last['_vstart'] + last['_vcost']
+        item['_vcost'] = cost
+        finish = start + cost
+        for other in later:
+            other['_vstart'] = max(other['_vfloor'], finish)
+            finish = other['_vstart'] + other['_vcost']
+        if was_last:
+            self.finish[flow] = finish
+        return later
+
+    def dispatched(self, item):
+        # Een retry krijgt later een nieuwe tag
+        item.pop('_vfloor', None)
+        item.pop('_vcost', None)
+        self.vtime = max(self.vtime, item.pop('_vstart', 0.0))
+        if len(self.finish) > FAIR_PRUNE:
+            self.finish = {flow: tag for flow, tag in self.finish.items() if tag > self.vtime}
+
+
+POLICIES = {policy.name: policy for policy in (FifoPolicy, SjfPolicy, FairPolicy, AgingPolicy)}
+
+
+def make_policy(name, unknown_size=DEFAULT_UNKNOWN_SIZE, aging=DEFAULT_AGING, weights=None):
+    """Policy instance by name; raises ValueError for an unknown name."""
+    if name == 'sjf':
+        return SjfPolicy(unknown_size)
+    if name == 'fair':
+        return FairPolicy(weights, unknown_size)
+    if name == 'aging':
+        return AgingPolicy(aging)
+    if name == 'fifo':
+        return FifoPolicy()
+    raise ValueError(f"scheduling policy must be one of {', '.join(POLICIES)}")
+
+
+def percentile(values, fraction):
+    """values sorted ascending; nearest-rank percentile, None when empty."""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def _summary(waits):
+    waits = sorted(waits)
+    return {
+        'count': len(waits),
+        'mean': round(sum(waits) / len(waits), 2) if waits else None,
+        'p50': percentile(waits, 0.5),
+        'p95': percentile(waits, 0.95),
+        'max': waits[-1] if waits else None,
+    }
+
+
+def wait_summary(rows):
+    """Queue wait statistics (seconds) per policy, and per policy and flow or size class.
+
+    rows are (policy, flow, model_type, size, priority, wait) tuples as stored by
+    database.record_queue_wait.
+    """
+    groups = {}
+    for policy, flow, model_type, size, priority, wait in rows:
+        size_class = 'unknown' if not size else ('small' if size < GB else 'large')
+        for dimension, value in (('total', None), ('flow', flow), ('size', size_class), ('model_type', model_type)):
+            groups.setdefault(policy, {}).setdefault(dimension, {}).setdefault(value, []).append(wait)
+    result = {}
+    for policy, dimensions in groups.items():
+        result[policy] = _summary(dimensions['total'][None])
+        for dimension in ('flow', 'size', 'model_type'):
+            result[policy][f'by_{dimension}'] = {value: _summary(waits) for value, waits in dimensions[dimension].items()}
+    return result
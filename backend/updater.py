@@ -2,10 +2,10 @@
 # --- Standaard imports altijd eerst ---
 import os
 import time
-import httpx
 import json
 import threading
 from loguru import logger
+from backend import http_client
 
 # --- Loguru file logging setup (ook als updater direct wordt geladen) ---
 log_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'logs'))
@@ -37,7 +37,7 @@ class ModelUpdater(threading.Thread):
             model_id = entry.get('modelId')
             url = f'https://civitai.com/api/v1/models/{model_id}'
             try:
-                resp = httpx.get(url, timeout=10)
+                resp = http_client.get_client().get(url, timeout=10)
                 resp.raise_for_status()
                 data = resp.json()
                 # Compare SHA or updatedAt
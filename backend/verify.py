@@ -0,0 +1,153 @@
+# --- Verification stage (hashing finished downloads off the download workers) ---
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import blake3  # optional: pip install blake3 (multithreaded, much faster than SHA256)
+except ImportError:
+    blake3 = None
+
+# Civitai file metadata names -> our lowercase algorithm keys
+HASH_NAMES = {'sha256': 'SHA256', 'autov2': 'AutoV2', 'blake3': 'BLAKE3', 'crc32': 'CRC32'}
+VERIFY_POLICIES = ('sha256', 'fast', 'crc32')
+# Upper bound for a safetensors JSON header; real headers are a few hundred KB at most
+SAFETENSORS_MAX_HEADER = 100 * 1024 * 1024
+
+
+class IntegrityError(ValueError):
+    """A finished file failed verification (hash mismatch or broken header)."""
+
+
+class _Crc32:
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return format(self.value & 0xFFFFFFFF, '08x')
+
+
+def normalize_hashes(hashes=None, sha256=None):
+    """{'SHA256': 'AB..', 'CRC32': ..} from the Civitai API -> {'sha256': 'ab..', 'crc32': ..}."""
+    result = {}
+    for name, value in (hashes or {}).items():
+        key = str(name).lower()
+        if key in HASH_NAMES and value:
+            result[key] = str(value).lower()
+    if sha256:
+        result['sha256'] = str(sha256).lower()
+    return result
+
+
+def new_hasher(algo):
+    if algo == 'sha256':
+        return hashlib.sha256()
+    if algo == 'blake3':
+        return blake3.blake3(max_threads=blake3.blake3.AUTO)
+    if algo == 'crc32':
+        return _Crc32()
+    raise ValueError(f"unsupported hash algorithm: {algo}")
+
+
+def choose_algorithm(expected, policy='sha256'):
+    """Algorithm to hash a file with, given the expected hashes and the verify policy.
+
+    sha256: full SHA256 whenever a SHA256 (or its AutoV2 prefix) is known.
+    fast:   cheapest strong hash: BLAKE3 (if the package is installed), else SHA256.
+    crc32:  CRC32 is enough (detects corruption, not tampering).
+    Falls back to whatever is known when the preferred hash is missing.
+    """
+    has_sha = 'sha256' in expected or 'autov2' in expected
+    has_blake3 = 'blake3' in expected and blake3 is not None
+    if policy == 'crc32' and 'crc32' in expected:
+        return 'crc32'
+    if policy in ('fast', 'crc32') and has_blake3:
+        return 'blake3'
+    if has_sha:
+        return 'sha256'
+    if has_blake3:
+        return 'blake3'
+    if 'crc32' in expected:
+        return 'crc32'
+    return None
+
+
+def hash_matches(expected, algo, digest):
+    digest = str(digest).lower()
+    if algo == 'sha256' and 'sha256' not in expected:
+        # AutoV2 is the first 10 hex digits of the SHA256
+        return digest[:10] == expected.get('autov2')
+    return digest == expected.get(algo)
+
+
+def check_safetensors_header(path):
+    """Reject a truncated or corrupt .safetensors file by reading only its header.
+
+    Layout: 8-byte little-endian header length, JSON header with the data_offsets of
+    every tensor, tensor data. The file size must match the end of the last tensor.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        raw = f.read(8)
+        if len(raw) < 8:
+            raise IntegrityError(f"Truncated safetensors file: {size} bytes")
+        (length,) = struct.unpack('<Q', raw)
+        if length == 0 or length > SAFETENSORS_MAX_HEADER or 8 + length > size:
+            raise IntegrityError(f"Invalid safetensors header length {length} for a {size} byte file")
+        try:
+            header = json.loads(f.read(length))
+            end = max((entry['data_offsets'][1] for name, entry in header.items() if name != '__metadata__'), default=0)
+        except (ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+            raise IntegrityError(f"Corrupt safetensors header: {e}")
+    if 8 + length + end != size:
+        raise IntegrityError(f"Truncated safetensors file: expected {8 + length + end} bytes, got {size}")
+
+
+class VerifyPool:
+    """Bounded thread pool that verifies finished downloads.
+
+    hashlib releases the GIL while hashing large buffers, so verification threads
+    hash in parallel with the downloads. submit() blocks once `backlog` files are
+    waiting or being hashed; that backpressure stops the download workers from
+    piling up unverified files faster than the disk can be read.
+    """
+    def __init__(self, workers=2, backlog=4):
+        self.workers = max(1, int(workers))
+        self.backlog = max(self.workers, int(backlog))
+        self._slots = threading.BoundedSemaphore(self.backlog)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='verify')
+
+    def submit(self, fn, *args):
+        """Run fn(*args) on the pool; blocks while the backlog is full. Returns a Future."""
+        self._slots.acquire()
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def pending(self):
+        """Number of files queued for or in verification."""
+        with self._lock:
+            return self._pending
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
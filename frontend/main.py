@@ -1,5 +1,4 @@
 import os
-import json
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from fastapi.responses import RedirectResponse
@@ -13,15 +12,8 @@ import random
 import time
 from fastapi.responses import JSONResponse
 
-# Config laden (zelfde manier als backend)
-def load_config():
-    config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'configs', 'config.json'))
-    if os.path.exists(config_path):
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
-
-CONFIG = load_config()
+# Config gedeeld met de backend: gecached en herladen als config.json wijzigt
+from backend.config import config as CONFIG
 
 app = FastAPI()
 app.mount("/static", StaticFiles(directory=os.path.join(os.path.dirname(__file__), "static")), name="static")
@@ -37,7 +29,7 @@ def gui(request: Request):
 # Serve config as JSON for frontend
 @app.get("/configs/config.json")
 def get_config():
-    return JSONResponse(CONFIG)
+    return JSONResponse(dict(CONFIG.snapshot()))
 
 # Add root redirect to /search
 @app.get("/")
@@ -4,11 +4,8 @@ from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 import httpx
 import os
-import json
 
-CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../configs/config.json'))
-with open(CONFIG_PATH, 'r') as f:
-    CONFIG = json.load(f)
+from backend.config import config as CONFIG
 
 router = APIRouter()
 templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), 'templates'))
@@ -41,6 +41,90 @@ def test_admin_pause_resume_stop():
     assert resp.status_code == 200
     assert resp.json()["status"] == "stopped"
 
+def test_admin_resize_workers():
+    resp = client.post("/api/workers", json={"workers": 3})
+    assert resp.status_code == 200
+    assert resp.json()["workers"] == 3
+    assert client.get("/api/workers").json()["workers"] == 3
+    resp = client.post("/api/workers", json={"workers": 0})
+    assert resp.status_code == 422
+
+def test_admin_set_throttle():
+    resp = client.post("/api/throttle", json={"throttle": 20, "schedule": [{"start": "01:00", "end": "07:00", "limit": 0}]})
+    assert resp.status_code == 200
+    assert resp.json()["throttle"] == 20
+    assert client.get("/api/throttle").json()["schedule"][0]["start"] == "01:00"
+    resp = client.post("/api/throttle", json={"throttle": -1})
+    assert resp.status_code == 422
+    client.post("/api/throttle", json={"throttle": 0, "schedule": []})
+
+def test_host_limits():
+    slot = main.daemon_instance.hosts.acquire("https://cdn.example.com/file")
+    with slot:
+        slot.status = 200
+        hosts = client.get("/api/hosts").json()["hosts"]
+        assert hosts["cdn.example.com"]["in_flight"] == 1
+    assert client.get("/api/hosts").json()["hosts"]["cdn.example.com"]["in_flight"] == 0
+
+def test_scheduling_policy():
+    assert client.post("/api/scheduling", json={"policy": "lottery"}).status_code == 422
+    resp = client.post("/api/scheduling", json={"policy": "sjf"})
+    assert resp.status_code == 200
+    data = client.get("/api/scheduling").json()
+    assert data["policy"] == "sjf"
+    assert "fair" in data["policies"]
+    assert isinstance(data["waits"], dict)
+    assert client.post("/api/scheduling", json={"policy": "fifo"}).status_code == 200
+
+def test_storage_endpoints():
+    data = client.get("/api/storage").json()
+    assert "types" in data and isinstance(data["recent_evictions"], list)
+    assert client.post("/api/storage/pin", json={"model_id": "nope"}).status_code == 422
+    assert client.post("/api/storage/pin", json={"model_id": "nope", "model_version_id": "0"}).status_code == 404
+    assert client.post("/api/storage/touch", json={"model_id": "nope", "model_version_id": "0"}).status_code == 404
+    assert client.post("/api/storage/refetch", json={"model_id": "nope", "model_version_id": "0"}).status_code == 404
+
+def test_admin_queue_operations():
+    from backend.daemon import make_queue_item
+    client.post("/api/pause")
+    queue = main.daemon_instance.queue
+    items = [make_queue_item(f'qa{n}', f'http://example.com/{n}', f'qa{n}.safetensors', priority=5,
+                             model_type='lora', model_version_id=f'v{n}') for n in range(3)]
+    queue.put_many(items)
+    resp = client.get("/api/queue", params={"offset": 0, "limit": 2})
+    assert resp.status_code == 200
+    assert len(resp.json()["queue"]) == 2
+    assert resp.json()["total"] >= 3
+    etag = resp.headers["ETag"]
+    assert client.get("/api/queue", headers={"If-None-Match": etag}).status_code == 304
+    job_id = items[2]['job_id']
+    resp = client.post(f"/api/queue/{job_id}/move", json={"position": "top"})
+    assert resp.status_code == 200
+    assert client.get("/api/queue", headers={"If-None-Match": etag}).status_code == 200
+    ours = [e["job_id"] for e in client.get("/api/queue").json()["queue"] if e.get("model_id", "").startswith("qa")]
+    assert ours[0] == job_id
+    assert client.patch(f"/api/queue/{job_id}", json={"priority": "high"}).status_code == 422
+    assert client.patch(f"/api/queue/{job_id}", json={"priority": 9}).status_code == 200
+    ours = [e["job_id"] for e in client.get("/api/queue").json()["queue"] if e.get("model_id", "").startswith("qa")]
+    assert ours[-1] == job_id
+    for item in items:
+        assert client.delete(f"/api/queue/{item['job_id']}").status_code == 200
+    assert client.delete(f"/api/queue/{job_id}").status_code == 404
+    client.post("/api/resume")
+
+def test_admin_job_control():
+    from backend.daemon import make_queue_item
+    client.post("/api/pause")
+    item = make_queue_item('jc1', 'http://example.com/jc1', 'jc1.safetensors', model_type='lora', model_version_id='jcv1')
+    main.daemon_instance.add_job(item)
+    # Not downloading yet: per-job pause is refused, cancel removes it from the queue
+    assert client.post(f"/api/jobs/{item['job_id']}/pause").status_code == 404
+    resp = client.post(f"/api/jobs/{item['job_id']}/cancel")
+    assert resp.status_code == 200
+    assert client.post(f"/api/jobs/{item['job_id']}/cancel").status_code == 404
+    assert client.post(f"/api/jobs/{item['job_id']}/explode").status_code == 404
+    client.post("/api/resume")
+
 def test_admin_only_endpoint():
     resp = client.get("/api/admin-only")
     assert resp.status_code == 200
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+from loguru import logger
+
+from backend.database import init_db, clear_test_db
+from backend.blobstore import BlobStore
+from backend.daemon import DownloadDaemon, make_queue_item
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+def _inode(path):
+    return os.stat(path).st_ino
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        clear_test_db()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        self.store = BlobStore(os.path.join(self.root, '.blobs'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_duplicate_content_is_linked(self):
+        first = os.path.join(self.root, 'lora', 'a.safetensors')
+        second = os.path.join(self.root, 'checkpoint', 'b.safetensors')
+        sha = _write(first, b'weights')
+        _write(second, b'weights')
+        blob = self.store.adopt(first, sha)
+        self.store.adopt(second, sha)
+        self.assertEqual(_inode(first), _inode(blob))
+        self.assertEqual(_inode(second), _inode(blob))
+        self.assertEqual(len(self.store.refs(sha)), 2)
+
+    def test_link_materializes_stored_blob(self):
+        sha = _write(os.path.join(self.root, 'lora', 'a.bin'), b'x')
+        target = os.path.join(self.root, 'other', 'copy.bin')
+        self.assertFalse(self.store.link(sha, target))
+        self.store.adopt(os.path.join(self.root, 'lora', 'a.bin'), sha)
+        self.assertTrue(self.store.link(sha, target))
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b'x')
+
+    def test_blob_is_deleted_with_last_reference(self):
+        first = os.path.join(self.root, 'lora', 'a.bin')
+        sha = _write(first, b'x')
+        self.store.adopt(first, sha)
+        second = os.path.join(self.root, 'lora', 'b.bin')
+        self.store.link(sha, second)
+        self.assertFalse(self.store.release(first))
+        self.assertTrue(self.store.has(sha))
+        self.assertTrue(self.store.release(second))
+        self.assertFalse(self.store.has(sha))
+        self.assertFalse(os.path.exists(second))
+
+    def test_copy_when_link_fails(self):
+        first = os.path.join(self.root, 'lora', 'a.bin')
+        sha = _write(first, b'x')
+        with mock.patch('backend.blobstore.os.link', side_effect=OSError(18, 'Invalid cross-device link')):
+            blob = self.store.adopt(first, sha)
+        self.assertTrue(os.path.exists(blob))
+        self.assertNotEqual(_inode(first), _inode(blob))
+
+
+@mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+class TestContentStoreDaemon(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        clear_test_db()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.daemon = DownloadDaemon(max_retries=1, throttle=0, download_dir=self.tmpdir.name)
+        self.daemon.store = BlobStore(os.path.join(self.tmpdir.name, '.blobs'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_known_content_is_linked_instead_of_downloaded(self):
+        sha = _write(os.path.join(self.tmpdir.name, 'lora', 'a.safetensors'), b'model')
+        self.daemon.scan_library()
+        item = make_queue_item('1', 'http://example.com/1', 'b.safetensors', sha256=sha, model_type='checkpoint')
+        self.assertEqual(self.daemon.add_job(item), 'queued')
+        item = self.daemon.queue.get_nowait()[2]
+        with mock.patch.object(self.daemon, '_download_file', side_effect=AssertionError('downloaded')):
+            self.assertTrue(self.daemon.process_item(item))
+        target = os.path.join(self.tmpdir.name, 'checkpoint', 'b.safetensors')
+        self.assertEqual(_inode(target), _inode(os.path.join(self.tmpdir.name, 'lora', 'a.safetensors')))
+        self.assertEqual(len(self.daemon.store.refs(sha)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+from loguru import logger
+
+from backend.config import Config
+from backend.daemon import DownloadDaemon
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+
+class TestConfig(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'config.json')
+        self._write({'throttle': '1.5', 'workers': 2, 'webhook_url': 'http://hook'})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, data, bump=0):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        if bump:
+            st = os.stat(self.path)
+            os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + bump))
+
+    def test_values_are_typed(self):
+        config = Config(self.path)
+        self.assertEqual(config.get('throttle'), 1.5)
+        self.assertEqual(config.get('missing', 'x'), 'x')
+
+    def test_get_does_no_file_io_between_checks(self):
+        config = Config(self.path, check_interval=3600)
+        with mock.patch('backend.config.os.stat', side_effect=AssertionError('stat')), \
+                mock.patch('builtins.open', side_effect=AssertionError('open')):
+            for _ in range(1000):
+                self.assertEqual(config.get('webhook_url'), 'http://hook')
+
+    def test_reload_on_change_notifies_subscribers(self):
+        config = Config(self.path, check_interval=3600)
+        calls = []
+        config.subscribe(lambda values, changed: calls.append((dict(values), changed)), keys=('throttle', 'workers'))
+        self.assertEqual(config.reload(), set())
+        self._write({'throttle': 3, 'workers': 2, 'webhook_url': 'http://other'}, bump=10 ** 9)
+        self.assertEqual(config.reload(), {'throttle', 'webhook_url'})
+        self.assertEqual(config.get('throttle'), 3.0)
+        # Only the subscribed key that changed is reported
+        self.assertEqual(calls, [({'throttle': 3.0, 'workers': 2, 'webhook_url': 'http://other'}, {'throttle'})])
+
+    def test_broken_file_keeps_previous_values(self):
+        config = Config(self.path, check_interval=3600)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{"throttle": ')
+        self.assertEqual(config.reload(force=True), set())
+        self.assertEqual(config.get('throttle'), 1.5)
+
+    def test_invalid_value_is_dropped(self):
+        self._write({'workers': 'many', 'retries': '3'}, bump=10 ** 9)
+        config = Config(self.path)
+        self.assertIsNone(config.get('workers'))
+        self.assertEqual(config.get('retries'), 3)
+
+
+@mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+class TestDaemonLiveConfig(unittest.TestCase):
+    def test_apply_config(self):
+        daemon = DownloadDaemon(max_retries=1, timeout=5)
+        daemon.apply_config({'throttle': 4.0, 'workers': 3, 'retries': 9, 'timeout': 1.0},
+                            {'throttle', 'workers', 'retries', 'timeout'})
+        self.assertEqual(daemon.limiter.limit, 4.0)
+        self.assertEqual(daemon.workers, 3)
+        # Explicit constructor arguments are not overridden by the file
+        self.assertEqual(daemon.max_retries, 1)
+        self.assertEqual(daemon.timeout, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
 import unittest
 from loguru import logger
 import os
+import sqlite3
+import threading
+import time
 
 from backend.daemon import make_queue_item, DownloadDaemon
 import unittest.mock as mock
@@ -56,6 +59,41 @@ class TestDownloadDaemon(unittest.TestCase):
         self.assertEqual(item['model_version_id'], 'ver666')
         self.assertEqual(item['base_model'], 'SDXL')
 
+    @mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+    def test_failure_schedules_retry_without_blocking(self):
+        daemon = DownloadDaemon(max_retries=3, download_dir='test_downloads', throttle=0)
+        item = make_queue_item('id', 'url', 'file', model_type='vae', model_version_id='ver555')
+        def fail(x):
+            x['last_status'] = 503
+            x['retry_after'] = 30
+            return (False, 'dummy')
+        daemon._download_file = fail
+        t0 = time.time()
+        self.assertFalse(daemon.process_item(item))
+        self.assertLess(time.time() - t0, 1)
+        self.assertEqual(len(daemon.delayed), 1)
+        self.assertGreaterEqual(item['not_before'], t0 + 30)
+        self.assertTrue(daemon.queue.empty())
+        # Not due yet: stays in the delayed heap
+        daemon._promote_due_retries()
+        self.assertTrue(daemon.queue.empty())
+        item['not_before'] = 0
+        daemon.delayed[0] = (0, 0, item)
+        daemon._promote_due_retries()
+        self.assertEqual(daemon.queue.get_nowait()[2], item)
+
+    @mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+    def test_permanent_failure_skips_retries(self):
+        daemon = DownloadDaemon(max_retries=5, download_dir='test_downloads', throttle=0)
+        item = make_queue_item('id', 'url', 'file', model_type='vae', model_version_id='ver444')
+        def not_found(x):
+            x['last_status'] = 404
+            return (False, 'dummy')
+        daemon._download_file = not_found
+        self.assertFalse(daemon.process_item(item))
+        self.assertEqual(daemon.delayed, [])
+        self.assertEqual(item['retries'], 1)
+
     def test_pause_resume(self):
         self.daemon.pause()
         self.assertTrue(self.daemon.paused)
@@ -66,11 +104,170 @@ class TestDownloadDaemon(unittest.TestCase):
         # Add a job and then cancel it
         item = make_queue_item('id', 'url', 'file', model_type='other')
         self.daemon.add_job(item)
-        # Cancel does not require job_id, just cancels current
-        self.daemon.cancel()
-        # The queue should still have the job, but cancel_current is True
-        self.assertTrue(self.daemon.cancel_current)
+        # A queued job is taken out of the queue
+        self.assertTrue(self.daemon.cancel(item['job_id']))
+        self.assertIsNone(self.daemon.queue.get_job(item['job_id']))
+        self.assertFalse(self.daemon.cancel(item['job_id']))
         self.assertEqual(item['model_type'], 'other')
 
+    @mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+    def test_cancel_and_pause_single_job(self):
+        daemon = DownloadDaemon(max_retries=3, download_dir='test_downloads', throttle=0, workers=2)
+        gates = {'k1': threading.Event(), 'k2': threading.Event()}
+        def fake_download(item):
+            control = daemon._control(item)
+            gates[item['model_id']].set()
+            # Transfer loop stand-in: honours the job's pause and cancel state
+            while not control.cancelled and not item.get('finish'):
+                daemon._wait_while_paused(control)
+                time.sleep(0.01)
+            return (not control.cancelled, 'dummy')
+        daemon._download_file = fake_download
+        one = make_queue_item('k1', 'url', 'file1', model_type='lora', model_version_id='kv1')
+        two = make_queue_item('k2', 'url', 'file2', model_type='lora', model_version_id='kv2')
+        daemon.add_job(one)
+        daemon.add_job(two)
+        daemon.start()
+        try:
+            self.assertTrue(gates['k1'].wait(2) and gates['k2'].wait(2))
+            self.assertTrue(daemon.pause_job(one['job_id']))
+            self.assertTrue(daemon.controls[one['job_id']].paused)
+            self.assertTrue(daemon.cancel(one['job_id']))
+            two['finish'] = True
+            deadline = time.time() + 2
+            while daemon.active_downloads and time.time() < deadline:
+                time.sleep(0.02)
+            self.assertEqual(daemon.active_downloads, [])
+            # Cancelled job is final: no retry scheduled, the other job completed
+            self.assertEqual(len(daemon.delayed), 0)
+            self.assertEqual(daemon.controls, {})
+        finally:
+            daemon.stop()
+
+    @mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+    def test_cancel_while_job_is_admitted(self):
+        daemon = DownloadDaemon(max_retries=3, download_dir='test_downloads', throttle=0)
+        admitting = threading.Event()
+        release = threading.Event()
+        downloaded = []
+        def slow_admit(item):
+            # Eviction or a disk check that takes a while
+            admitting.set()
+            release.wait(5)
+            return True
+        daemon._admit = slow_admit
+        daemon._download_file = lambda item: downloaded.append(item['model_id']) or (True, 'dummy')
+        item = make_queue_item('a1', 'url', 'file1', model_type='lora', model_version_id='av1')
+        daemon.add_job(item)
+        daemon.start()
+        try:
+            self.assertTrue(admitting.wait(2))
+            # Neither queued nor downloading yet, but the cancel is not lost
+            self.assertTrue(daemon.cancel(item['job_id']))
+            release.set()
+            deadline = time.time() + 2
+            while item['job_id'] in daemon.controls and time.time() < deadline:
+                time.sleep(0.02)
+            self.assertNotIn(item['job_id'], daemon.controls)
+            self.assertEqual(downloaded, [])
+        finally:
+            daemon.stop()
+
+    @mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+    def test_cancel_before_verification(self):
+        daemon = DownloadDaemon(max_retries=3, download_dir='test_downloads', throttle=0)
+        item = make_queue_item('a2', 'url', 'file2', sha256='ab' * 32, model_type='lora', model_version_id='av2')
+        def download_then_cancel(item):
+            # The cancel arrives just after the last byte
+            daemon.cancel(item['job_id'])
+            return (True, 'dummy')
+        daemon._download_file = download_then_cancel
+        daemon.hash_file = mock.Mock(return_value='ab' * 32)
+        logged = []
+        with mock.patch('backend.daemon.log_download', lambda *a, **kw: logged.append(a[3])):
+            self.assertFalse(daemon.process_item(item))
+        daemon.hash_file.assert_not_called()
+        self.assertIn('cancelled', logged)
+        self.assertNotIn('success', logged)
+        self.assertEqual(daemon.delayed, [])
+
+    @mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+    def test_admission_error_is_retried(self):
+        daemon = DownloadDaemon(max_retries=3, download_dir='test_downloads', throttle=0)
+        daemon.retry_backoff = 0.01
+        real_admit = daemon._admit
+        attempts = []
+        def flaky_admit(item):
+            attempts.append(item['job_id'])
+            if len(attempts) == 1:
+                raise sqlite3.OperationalError('database is locked')
+            return real_admit(item)
+        daemon._admit = flaky_admit
+        downloaded = threading.Event()
+        daemon._download_file = lambda item: downloaded.set() or (True, 'dummy')
+        item = make_queue_item('a3', 'url', 'file3', model_type='lora', model_version_id='av3')
+        daemon.add_job(item)
+        daemon.start()
+        try:
+            # The worker survives the error and the job comes back as a retry
+            self.assertTrue(downloaded.wait(5))
+            self.assertEqual(len(attempts), 2)
+            self.assertEqual(item['retries'], 1)
+        finally:
+            daemon.stop()
+
+    @mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+    def test_workers_download_concurrently(self):
+        daemon = DownloadDaemon(max_retries=1, download_dir='test_downloads', throttle=0, workers=2)
+        barrier = threading.Barrier(2, timeout=5)
+        finished = []
+        def fake_download(item):
+            # Both jobs must be active at the same time to pass the barrier
+            barrier.wait()
+            finished.append(item['model_id'])
+            return (True, 'dummy')
+        daemon._download_file = fake_download
+        daemon.add_job(make_queue_item('c1', 'url', 'file1', model_type='lora', model_version_id='cv1'))
+        daemon.add_job(make_queue_item('c2', 'url', 'file2', model_type='lora', model_version_id='cv2'))
+        daemon.start()
+        try:
+            deadline = time.time() + 5
+            while len(finished) < 2 and time.time() < deadline:
+                time.sleep(0.05)
+            self.assertFalse(barrier.broken)
+            self.assertEqual(sorted(finished), ['c1', 'c2'])
+            self.assertTrue(daemon.queue.empty())
+        finally:
+            daemon.stop()
+
+    @mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+    def test_resume_and_new_jobs_wake_workers(self):
+        daemon = DownloadDaemon(max_retries=1, download_dir='test_downloads', throttle=0)
+        started = threading.Event()
+        daemon._download_file = lambda item: (started.set(), (True, 'dummy'))[1]
+        events = []
+        with mock.patch('backend.daemon.ws_manager.broadcast', lambda event, data: events.append(event)):
+            daemon.start()
+            try:
+                time.sleep(0.3)
+                daemon.paused = True
+                daemon.add_job(make_queue_item('w1', 'url', 'file1', model_type='lora', model_version_id='wv1'))
+                self.assertFalse(started.wait(0.3))
+                t0 = time.monotonic()
+                daemon.paused = False
+                self.assertTrue(started.wait(2))
+                # Event driven: no 0.5-1s polling interval between resume and start
+                self.assertLess(time.monotonic() - t0, 0.2)
+                time.sleep(0.2)
+                self.assertEqual(events.count('queue_empty'), 2)  # at startup and after the job
+            finally:
+                daemon.stop()
+
+    def test_set_workers(self):
+        self.assertEqual(self.daemon.set_workers(3), 3)
+        self.assertEqual(self.daemon.workers, 3)
+        with self.assertRaises(ValueError):
+            self.daemon.set_workers(0)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock as mock
+from collections import namedtuple
+from loguru import logger
+
+from backend.daemon import DownloadDaemon, make_queue_item
+from backend.diskspace import DiskReserver
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+MB = 1024 * 1024
+_usage = namedtuple('usage', 'total used free')
+
+
+def _free(nbytes):
+    return mock.patch('backend.diskspace.shutil.disk_usage', lambda path: _usage(10 * nbytes, 9 * nbytes, nbytes))
+
+
+class TestDiskReserver(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.dir, 'lora', name)
+
+    def test_reservations_add_up_to_the_floor(self):
+        disk = DiskReserver(floor=10 * MB)
+        with _free(100 * MB):
+            self.assertEqual(disk.reserve('a', [(self._path('a'), 50 * MB)]), 0)
+            # 100 free - 50 reserved - 10 floor leaves 40
+            self.assertEqual(disk.reserve('b', [(self._path('b'), 60 * MB)]), 20 * MB)
+            self.assertEqual(disk.reserve('c', [(self._path('c'), 40 * MB)]), 0)
+            disk.release('a')
+            self.assertEqual(disk.reserve('b', [(self._path('b'), 60 * MB)]), 10 * MB)
+            status = disk.status({'download_dir': self.dir})['download_dir']
+            self.assertEqual(status['reserved'], 40 * MB)
+            self.assertEqual(status['available'], 50 * MB)
+
+    def test_allocated_bytes_are_not_counted_twice(self):
+        disk = DiskReserver(floor=0)
+        part = os.path.join(self.dir, 'a.part')
+        with open(part, 'wb') as f:
+            f.write(os.urandom(MB))
+        with _free(100 * MB):
+            disk.reserve('a', [(part, 4 * MB)])
+            self.assertLessEqual(disk.status({'d': self.dir})['d']['reserved'], 3 * MB)
+
+    def test_update_to_real_size(self):
+        disk = DiskReserver(floor=0, unknown=50 * MB)
+        with _free(100 * MB):
+            disk.reserve('a', [(self._path('a'), disk.unknown)])
+            disk.update('a', 5 * MB)
+            self.assertEqual(disk.status({'d': self.dir})['d']['reserved'], 5 * MB)
+
+
+@mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+class TestDiskAdmission(unittest.TestCase):
+    def setUp(self):
+        from backend.database import init_db
+        init_db()
+        self.download_dir = tempfile.mkdtemp()
+        self.daemon = DownloadDaemon(max_retries=2, download_dir=self.download_dir, throttle=0)
+        self.daemon.queue.persist = False
+        self.daemon.disk.floor = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.download_dir, ignore_errors=True)
+
+    def _item(self, n, size):
+        item = make_queue_item(f'd{n}', f'http://example.com/{n}', f'd{n}.bin', model_type='lora', model_version_id=f'v{n}')
+        item['preflight'] = {'status': 206, 'size': size, 'checked_at': 0}
+        return item
+
+    def test_job_is_held_until_space_frees(self):
+        big, huge = self._item(1, 60 * MB), self._item(2, 60 * MB)
+        self.daemon.queue.put_many([big, huge])
+        with _free(100 * MB):
+            self.assertTrue(self.daemon._admit(self.daemon.queue.get_nowait()[2]))
+            self.assertFalse(self.daemon._admit(self.daemon.queue.get_nowait()[2]))
+            self.assertEqual(self.daemon.held, [huge])
+            self.assertTrue(huge['held'].startswith('waiting for'))
+            # The first job finishes: the held job goes back into the queue right away
+            self.daemon._finish(big, 'done')
+            self.assertEqual(self.daemon.held, [])
+            self.assertIs(self.daemon.queue.get_nowait()[2], huge)
+            self.assertTrue(self.daemon._admit(huge))
+            self.assertNotIn('held', huge)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock as mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+from backend.daemon import DownloadDaemon, make_queue_item, PART_SUFFIX, _read_part_meta
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+
+class _FileHandler(BaseHTTPRequestHandler):
+    """Serves self.server.payload with optional Range support and a dropped first response."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        data = server.payload
+        server.requests.append(dict(self.headers))
+        start, end = 0, len(data) - 1
+        status = 200
+        rng = self.headers.get('Range')
+        if rng and server.ranges:
+            first, _, last = rng.split('=')[1].partition('-')
+            start = int(first)
+            end = int(last) if last else len(data) - 1
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(data)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+        body = data[start:end + 1]
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', server.etag)
+        if server.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        self.end_headers()
+        if server.drop_after is not None:
+            # Simulate a connection that dies halfway through the body
+            self.wfile.write(body[:server.drop_after])
+            self.wfile.flush()
+            server.drop_after = None
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+def start_file_server(payload, ranges=True, drop_after=None, etag='"v1"'):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FileHandler)
+    server.payload = payload
+    server.ranges = ranges
+    server.drop_after = drop_after
+    server.etag = etag
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+class TestDownloadFile(unittest.TestCase):
+    def setUp(self):
+        from backend.database import init_db
+        init_db()
+        self.download_dir = tempfile.mkdtemp()
+        self.daemon = DownloadDaemon(max_retries=2, download_dir=self.download_dir, throttle=0)
+        self.payload = os.urandom(256 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.download_dir, ignore_errors=True)
+
+    def _item(self, server, filename='model.bin'):
+        url = f'http://127.0.0.1:{server.server_address[1]}/file'
+        return make_queue_item('m1', url, filename, model_type='lora', model_version_id='v1')
+
+    def test_resume_after_dropped_connection(self):
+        server = start_file_server(self.payload, drop_after=100 * 1024)
+        try:
+            item = self._item(server)
+            ok, filepath = self.daemon._download_file(item)
+            self.assertFalse(ok)
+            part = filepath + PART_SUFFIX
+            self.assertTrue(os.path.exists(part))
+            self.assertEqual(_read_part_meta(part)['bytes'], os.path.getsize(part))
+            ok, path = self.daemon._download_file(item)
+            self.assertTrue(ok)
+            self.assertEqual(server.requests[-1].get('Range'), f'bytes={100 * 1024}-')
+            # The finished file keeps its temporary name until it is verified
+            self.assertEqual(path, part)
+            self.assertFalse(os.path.exists(filepath))
+            self.assertEqual(self.daemon._commit_download(item, path), filepath)
+            with open(filepath, 'rb') as f:
+                self.assertEqual(f.read(), self.payload)
+            self.assertFalse(os.path.exists(part))
+            self.assertEqual(item['computed_sha256'], hashlib.sha256(self.payload).hexdigest())
+        finally:
+            server.shutdown()
+
+    def test_restart_when_server_ignores_range(self):
+        server = start_file_server(self.payload, ranges=False, drop_after=100 * 1024)
+        try:
+            item = self._item(server)
+            self.assertFalse(self.daemon._download_file(item)[0])
+            ok, filepath = self.daemon._download_file(item)
+            self.assertTrue(ok)
+            with open(filepath, 'rb') as f:
+                self.assertEqual(f.read(), self.payload)
+        finally:
+            server.shutdown()
+
+    def test_segmented_download(self):
+        server = start_file_server(self.payload)
+        try:
+            self.daemon.segment_config = {'lora': {'segments': 4, 'min_segment_size': 16 * 1024}}
+            item = self._item(server)
+            ok, filepath = self.daemon._download_file(item)
+            self.assertTrue(ok)
+            self.assertEqual(item['computed_sha256'], hashlib.sha256(self.payload).hexdigest())
+            with open(filepath, 'rb') as f:
+                self.assertEqual(f.read(), self.payload)
+            ranges = sorted(r['Range'] for r in server.requests[1:])
+            self.assertEqual(len(ranges), 4)
+            self.assertEqual(server.requests[0]['Range'], 'bytes=0-0')
+        finally:
+            server.shutdown()
+
+    def test_small_file_uses_single_stream(self):
+        server = start_file_server(self.payload)
+        try:
+            self.daemon.segment_config = {'lora': {'segments': 4, 'min_segment_size': 1024 * 1024}}
+            ok, _ = self.daemon._download_file(self._item(server))
+            self.assertTrue(ok)
+            self.assertEqual(len(server.requests), 2)
+            self.assertNotIn('Range', server.requests[1])
+        finally:
+            server.shutdown()
+
+    def test_process_item_uses_inline_hash(self):
+        server = start_file_server(self.payload)
+        try:
+            item = self._item(server)
+            item['sha256'] = hashlib.sha256(self.payload).hexdigest().upper()
+            with mock.patch.object(self.daemon, 'hash_file', side_effect=AssertionError('file re-read')):
+                self.assertTrue(self.daemon.process_item(item))
+            self.daemon.paranoid_verify = True
+            with mock.patch.object(self.daemon, 'hash_file', return_value='0' * 64) as hash_file:
+                self.assertFalse(self.daemon.process_item(self._item(server) | {'sha256': item['sha256']}))
+                hash_file.assert_called()
+        finally:
+            server.shutdown()
+
+    def test_file_appears_only_after_verification(self):
+        server = start_file_server(self.payload)
+        try:
+            item = self._item(server, filename='other.bin')
+            item['sha256'] = '0' * 64
+            filepath = self.daemon._target_path(item)
+            self.assertFalse(self.daemon.process_item(item))
+            # A corrupt download never shows up under its final name and is not resumed
+            self.assertFalse(os.path.exists(filepath))
+            self.assertFalse(os.path.exists(filepath + PART_SUFFIX))
+        finally:
+            server.shutdown()
+
+
+    def _pause_on_first_chunk(self, item):
+        # Pause item on the first chunk written, as pause_job() would mid-transfer
+        control = self.daemon._control(item)
+        paused = threading.Event()
+        def throttle(nbytes, bucket=None):
+            if not paused.is_set():
+                paused.set()
+                control.set_paused(True)
+        self.daemon.limiter.throttle = throttle
+        return control, paused
+
+    def _in_flight(self, server):
+        return self.daemon.hosts.status()[f'127.0.0.1:{server.server_address[1]}']['in_flight']
+
+    def _assert_paused_job_frees_host(self, server, item, payload):
+        control, paused = self._pause_on_first_chunk(item)
+        result = {}
+        first = threading.Thread(target=lambda: result.update(first=self.daemon._download_file(item)))
+        first.start()
+        try:
+            self.assertTrue(paused.wait(5))
+            deadline = time.time() + 5
+            while self._in_flight(server) and time.time() < deadline:
+                time.sleep(0.01)
+            # The paused job holds no host slot: another job to the same host finishes meanwhile
+            self.assertEqual(self._in_flight(server), 0)
+            other = self._item(server, filename='other.bin')
+            other['model_version_id'] = 'v2'
+            ok, path = self.daemon._download_file(other)
+            self.assertTrue(ok)
+            self.assertTrue(first.is_alive())
+        finally:
+            control.set_paused(False)
+            first.join(10)
+        ok, path = result['first']
+        self.assertTrue(ok)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), payload)
+        self.assertEqual(item['computed_sha256'], hashlib.sha256(payload).hexdigest())
+
+    def test_paused_segmented_job_releases_its_host_slots(self):
+        payload = os.urandom(8 * 1024 * 1024)
+        server = start_file_server(payload)
+        try:
+            self.daemon.hosts.configure(initial=4, maximum=4)
+            self.daemon.segment_config = {'lora': {'segments': 4, 'min_segment_size': 1024 * 1024}}
+            self._assert_paused_job_frees_host(server, self._item(server), payload)
+        finally:
+            server.shutdown()
+
+    def test_paused_single_stream_resumes_with_range(self):
+        payload = os.urandom(8 * 1024 * 1024)
+        server = start_file_server(payload)
+        try:
+            self.daemon.hosts.configure(initial=1, maximum=1)
+            self._assert_paused_job_frees_host(server, self._item(server), payload)
+            self.assertTrue(any(r.get('Range', '').startswith('bytes=') and r['Range'] != 'bytes=0-'
+                                and r['Range'] != 'bytes=0-0' for r in server.requests))
+        finally:
+            server.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
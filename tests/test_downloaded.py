@@ -0,0 +1,97 @@
+import os
+import time
+import unittest
+import unittest.mock as mock
+from array import array
+from loguru import logger
+
+from backend.database import init_db, clear_test_db, log_download
+from backend.downloaded import DownloadedIndex, _pack
+from backend.daemon import DownloadDaemon, make_queue_item
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+
+class TestDownloadedIndex(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        clear_test_db()
+
+    def test_loads_history_lazily(self):
+        log_download('101', '201', 'a.safetensors', 'success')
+        log_download('102', '202', 'b.safetensors', 'failed')
+        log_download('abc', 'v1', 'c.safetensors', 'success')
+        index = DownloadedIndex()
+        self.assertFalse(index.loaded)
+        self.assertTrue(index.contains(101, '201'))
+        self.assertFalse(index.contains('102', '202'))
+        self.assertTrue(index.contains('abc', 'v1'))
+        self.assertEqual(len(index), 2)
+
+    def test_missing_version_never_matches(self):
+        log_download('abc', None, 'd.safetensors', 'success')
+        index = DownloadedIndex()
+        # Like is_already_downloaded: a NULL version is not a download of any version
+        self.assertFalse(index.contains('abc', None))
+        index.add('abc', None)
+        self.assertFalse(index.contains('abc', None))
+        self.assertNotIn(('abc', 'None'), index.pairs())
+
+    def test_add_merge_and_discard(self):
+        index = DownloadedIndex()
+        for n in range(5000):
+            index.add(n, n + 1)
+        self.assertTrue(index.contains('4999', '5000'))
+        self.assertFalse(index.contains(4999, 4999))
+        index.discard(4999, 5000)
+        self.assertFalse(index.contains(4999, 5000))
+        self.assertIn(('1', '2'), index.pairs())
+
+    def test_merge_sorts_once_and_skips_known_pairs(self):
+        index = DownloadedIndex()
+        index.loaded = True
+        index.packed = array('Q', [_pack(1, 1), _pack(9, 9)])
+        for n in range(4096, 0, -1):
+            index.add(n, n)
+        self.assertEqual(len(index.recent), 0)
+        self.assertEqual(list(index.packed), sorted(_pack(n, n) for n in range(1, 4097)))
+
+    def test_large_history_is_compact(self):
+        index = DownloadedIndex()
+        index.loaded = True
+        for n in range(200000):
+            index.add(n, n)
+        index._merge()
+        # 8 bytes per pair instead of a dict per history row
+        self.assertLess(index.packed.buffer_info()[1] * index.packed.itemsize, 4 * 1024 * 1024)
+        start = time.perf_counter()
+        for n in range(0, 200000, 20):
+            self.assertTrue(index.contains(n, n))
+        self.assertLess(time.perf_counter() - start, 2)
+
+
+@mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+class TestDaemonSkipsDownloaded(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        clear_test_db()
+
+    def test_add_job_uses_index(self):
+        log_download('301', '401', 'x.safetensors', 'success')
+        daemon = DownloadDaemon(max_retries=1, throttle=0)
+        daemon.downloaded.contains('0', '0')  # first use loads the index
+        with mock.patch('backend.database.sqlite3.connect', side_effect=AssertionError('db hit')):
+            self.assertTrue(daemon.downloaded.contains('301', '401'))
+        self.assertEqual(daemon.add_job(make_queue_item('301', 'url', 'x.safetensors', model_version_id='401')), 'skipped')
+        self.assertEqual([d['model_id'] for d in daemon.last_downloaded], ['301'])
+        with daemon.lock:
+            daemon._record_downloaded(make_queue_item('302', 'url', 'y', model_version_id='402'), 1, 0.1)
+        self.assertTrue(daemon.downloaded.contains('302', '402'))
+        self.assertEqual([d['model_id'] for d in daemon.last_downloaded], ['302', '301'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+import unittest.mock as mock
+from loguru import logger
+
+from backend import database
+from backend.database import init_db, clear_test_db, log_download, is_already_downloaded
+from backend.daemon import DownloadDaemon, make_queue_item
+from backend.downloaded import DownloadedIndex
+from backend.eviction import Evictor
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+
+class TestEvictor(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        clear_test_db()
+        self.dir = tempfile.mkdtemp()
+        self.downloaded = DownloadedIndex()
+        self.evictor = Evictor(budgets={'lora': 100}, downloaded=self.downloaded)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _download(self, n, size=40, accessed=0, model_type='lora'):
+        path = os.path.join(self.dir, f'e{n}.safetensors')
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        item = make_queue_item(str(900 + n), f'http://example.com/{n}', f'e{n}.safetensors',
+                               model_type=model_type, model_version_id=str(n))
+        log_download(item['model_id'], item['model_version_id'], item['filename'], 'success', model_type=model_type, file_size=size)
+        self.downloaded.add(item['model_id'], item['model_version_id'])
+        self.evictor.record(item, path, size)
+        # Old access time, both recorded and on the file itself
+        when = time.time() - 3600 + accessed
+        database.touch_model_files(path=path, when=when)
+        os.utime(path, (when, when))
+        return item, path
+
+    def test_least_recently_used_is_evicted(self):
+        (a, path_a), (b, path_b) = self._download(1, accessed=0), self._download(2, accessed=10)
+        self.evictor.touch(a['model_id'], a['model_version_id'])
+        self.assertEqual(self.evictor.make_room('job', 'lora', 40), 0)
+        # b was used least recently
+        self.assertFalse(os.path.exists(path_b))
+        self.assertTrue(os.path.exists(path_a))
+        self.assertFalse(is_already_downloaded(b['model_id'], b['model_version_id']))
+        self.assertTrue(is_already_downloaded(a['model_id'], a['model_version_id']))
+        self.assertFalse(self.downloaded.contains(b['model_id'], b['model_version_id']))
+        eviction = database.load_evictions(1)[0]
+        self.assertEqual((eviction['filename'], eviction['reason']), ('e2.safetensors', 'lora budget'))
+        self.assertEqual(self.evictor.status()['pending_bytes'], 40)
+
+    def test_pinned_models_are_kept(self):
+        a, path_a = self._download(1)
+        b, path_b = self._download(2, accessed=10)
+        self.evictor.pin(a['model_id'], a['model_version_id'])
+        self.evictor.pin(b['model_id'], b['model_version_id'])
+        self.assertEqual(self.evictor.make_room('job', 'lora', 40), 20)
+        self.assertTrue(os.path.exists(path_a) and os.path.exists(path_b))
+
+    def test_model_without_version(self):
+        _, path = self._download(1)
+        unversioned = make_queue_item('990', 'http://example.com/990', 'nov.safetensors', model_type='lora')
+        self.evictor.record(unversioned, os.path.join(self.dir, 'nov.safetensors'), 10)
+        # None matches only the file without a version, not the string 'None'
+        self.assertEqual(self.evictor.pin('990', None), 1)
+        self.assertEqual(self.evictor.touch('990', None), 1)
+        self.assertEqual(self.evictor.pin('990', 'None'), 0)
+        self.assertEqual(self.evictor.pin('901', None), 0)
+
+    def test_bookkeeping_error_does_not_escape(self):
+        (a, path_a), (_, path_b) = self._download(1), self._download(2)
+        with mock.patch('backend.database.record_eviction', side_effect=sqlite3.OperationalError('database is locked')):
+            self.assertEqual(self.evictor.make_room('job', 'lora', 40), 0)
+        self.assertFalse(os.path.exists(path_a))
+        # The row of the deleted file is still there; the next eviction records it after all
+        self.assertEqual(len(database.load_model_files('lora')), 2)
+        self.assertEqual(self.evictor.free_space(1), 40)
+        self.assertEqual([row['path'] for row in database.load_model_files('lora')], [path_b])
+        self.assertFalse(is_already_downloaded(a['model_id'], a['model_version_id']))
+
+    def test_other_types_and_oversized_files(self):
+        _, path = self._download(1, model_type='checkpoint')
+        self._download(2)
+        self.assertEqual(self.evictor.make_room('job', 'lora', 60), 0)
+        self.assertTrue(os.path.exists(path))
+        with self.assertRaises(ValueError):
+            self.evictor.make_room('big', 'lora', 101)
+
+    def test_total_budget(self):
+        self.evictor.configure(total=100)
+        _, path = self._download(1, model_type='checkpoint')
+        self._download(2, accessed=10)
+        self.assertEqual(self.evictor.make_room('job', 'vae', 30), 0)
+        self.assertFalse(os.path.exists(path))
+
+
+@mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+class TestRefetch(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        clear_test_db()
+        self.download_dir = tempfile.mkdtemp()
+        self.daemon = DownloadDaemon(max_retries=1, download_dir=self.download_dir, throttle=0)
+        self.daemon.queue.persist = False
+
+    def tearDown(self):
+        shutil.rmtree(self.download_dir, ignore_errors=True)
+
+    def test_evicted_model_can_be_fetched_again(self):
+        item = make_queue_item('950', 'http://example.com/950', 'r.safetensors', model_type='lora', model_version_id='51')
+        path = self.daemon._target_path(item)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(b'x' * 10)
+        log_download('950', '51', 'r.safetensors', 'success', model_type='lora', file_size=10)
+        self.daemon.downloaded.add('950', '51')
+        self.daemon.evictor.record(item, path, 10)
+        self.assertEqual(self.daemon.add_job(dict(item)), 'skipped')
+        self.assertIsNone(self.daemon.refetch('950', '51'))
+        self.daemon.evictor.evict(database.load_model_files('lora')[0], 'test')
+        self.assertEqual(self.daemon.refetch('950', '51'), 'queued')
+        queued = self.daemon.queue.get_nowait()[2]
+        self.assertEqual((queued['url'], queued['filename']), ('http://example.com/950', 'r.safetensors'))
+
+
+if __name__ == '__main__':
+    unittest.main()
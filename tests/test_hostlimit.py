@@ -0,0 +1,106 @@
+import os
+import threading
+import unittest
+import unittest.mock as mock
+
+import httpx
+from loguru import logger
+
+from backend.hostlimit import HostGovernor, host_of
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+URL = 'https://cdn.example.com/model.safetensors'
+
+
+def _request(governor, status, nbytes=1024):
+    with governor.acquire(URL) as slot:
+        slot.status = status
+        slot.bytes = nbytes
+
+
+class TestHostGovernor(unittest.TestCase):
+    def test_host_of(self):
+        self.assertEqual(host_of('https://civitai.com/api/download/1'), 'civitai.com')
+        self.assertEqual(host_of('http://127.0.0.1:8080/file'), '127.0.0.1:8080')
+
+    def test_waits_at_limit(self):
+        governor = HostGovernor(initial=1)
+        first = governor.acquire(URL)
+        acquired = threading.Event()
+        def second():
+            with governor.acquire(URL) as slot:
+                slot.status = 200
+                acquired.set()
+        t = threading.Thread(target=second)
+        t.start()
+        self.assertFalse(acquired.wait(0.1))
+        with first:
+            first.status = 200
+        self.assertTrue(acquired.wait(2))
+        t.join()
+        # Other hosts are independent
+        self.assertIsNotNone(governor.acquire('https://civitai.com/x'))
+
+    def test_abort_while_waiting(self):
+        governor = HostGovernor(initial=1)
+        governor.acquire(URL)
+        self.assertIsNone(governor.acquire(URL, abort=lambda: True))
+
+    def test_backoff_on_429_once_per_burst(self):
+        governor = HostGovernor(initial=8)
+        slots = [governor.acquire(URL) for _ in range(4)]
+        for slot in slots:
+            slot.status = 429
+            slot.__exit__(None, None, None)
+        status = governor.status()[host_of(URL)]
+        self.assertEqual(status['limit'], 4)
+        self.assertEqual(status['errors'], 4)
+
+    def test_timeout_counts_as_congestion(self):
+        governor = HostGovernor(initial=4)
+        with self.assertRaises(httpx.ReadTimeout):
+            with governor.acquire(URL):
+                raise httpx.ReadTimeout('slow')
+        self.assertEqual(governor.status()[host_of(URL)]['limit'], 2)
+
+    def test_increases_when_saturated(self):
+        governor = HostGovernor(initial=2, maximum=3)
+        slots = [governor.acquire(URL), governor.acquire(URL)]
+        for slot in slots:
+            slot.status = 200
+            slot.bytes = 1024
+            slot.__exit__(None, None, None)
+        self.assertEqual(governor.status()[host_of(URL)]['limit'], 3)
+
+    def test_no_increase_when_not_saturated(self):
+        governor = HostGovernor(initial=4)
+        for _ in range(20):
+            _request(governor, 200)
+        self.assertEqual(governor.status()[host_of(URL)]['limit'], 4)
+
+    def test_steps_back_when_more_streams_are_slower(self):
+        governor = HostGovernor(initial=2, maximum=8)
+        clock = [0.0]
+        with mock.patch('backend.hostlimit.time.monotonic', lambda: clock[0]):
+            # Window at limit 2: 2 MB in 1 s while saturated -> limit 3
+            slots = [governor.acquire(URL) for _ in range(2)]
+            clock[0] = 1.0
+            for slot in slots:
+                slot.status, slot.bytes = 200, 1024 * 1024
+                governor.release(slot)
+            self.assertEqual(governor.status()[host_of(URL)]['limit'], 3)
+            # Window at limit 3: only 1 MB in 1 s -> the extra stream did not help
+            slots = [governor.acquire(URL) for _ in range(3)]
+            clock[0] = 2.0
+            for slot in slots:
+                slot.status, slot.bytes = 200, 1024 * 1024 // 3
+                governor.release(slot)
+            self.assertEqual(governor.status()[host_of(URL)]['limit'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import threading
+import unittest
+from loguru import logger
+
+from backend import http_client
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+class TestHttpClient(unittest.TestCase):
+    def tearDown(self):
+        http_client.close_clients()
+
+    def test_client_is_shared_across_threads(self):
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(http_client.get_client())) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len({id(c) for c in clients}), 1)
+        self.assertIs(clients[0], http_client.get_client())
+
+    def test_configure_replaces_client(self):
+        client = http_client.get_client()
+        http_client.configure(max_connections=http_client._settings['max_connections'])
+        self.assertIs(client, http_client.get_client())
+        http_client.configure(max_connections=http_client._settings['max_connections'] + 1)
+        self.assertIsNot(client, http_client.get_client())
+        # The old pool stays usable for in-flight downloads until shutdown
+        self.assertFalse(client.is_closed)
+        http_client.close_clients()
+        self.assertTrue(client.is_closed)
+
+    def test_close_clients(self):
+        client = http_client.get_client()
+        http_client.close_clients()
+        self.assertTrue(client.is_closed)
+
+if __name__ == '__main__':
+    unittest.main()
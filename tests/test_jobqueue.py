@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import time
+import unittest
+import unittest.mock as mock
+from loguru import logger
+
+from backend import database
+from backend.database import init_db, clear_test_db
+from backend.jobqueue import JobQueue
+from backend.daemon import DownloadDaemon, make_queue_item
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+
+def _item(n, priority=0):
+    return make_queue_item(f'q{n}', f'http://example.com/{n}', f'file{n}.safetensors',
+                           priority=priority, model_type='lora', model_version_id=f'v{n}')
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        clear_test_db()
+
+    def test_priority_order(self):
+        q = JobQueue()
+        q.put_many([_item(1, priority=5), _item(2, priority=1), _item(3, priority=5)])
+        self.assertEqual([q.get_nowait()[2]['model_id'] for _ in range(3)], ['q2', 'q1', 'q3'])
+
+    def test_replay_after_restart(self):
+        q = JobQueue()
+        q.put_many([_item(1), _item(2)])
+        running = q.get_nowait()[2]  # interrupted while downloading
+        q.put_delayed(_item(3), time.time() + 60)
+        # New process: running jobs go back to queued, retry_wait keeps its not-before time
+        restored = JobQueue()
+        self.assertEqual(restored.restore(), 3)
+        self.assertEqual(restored.qsize(), 2)
+        self.assertEqual(len(restored.delayed), 1)
+        self.assertIn(running['job_id'], restored.entries)
+
+    def test_completed_jobs_are_not_replayed(self):
+        q = JobQueue()
+        q.put_many([_item(1)])
+        item = q.get_nowait()[2]
+        q.complete(item, 'done')
+        self.assertEqual(JobQueue().restore(), 0)
+
+    def test_claim_is_exclusive(self):
+        q = JobQueue()
+        q.put_many([_item(1)])
+        other = JobQueue()
+        other.restore()
+        q.get_nowait()
+        # The second copy can no longer claim the job
+        with self.assertRaises(Exception):
+            other.get_nowait()
+
+    def test_lost_claim_frees_the_duplicate_index(self):
+        q = JobQueue()
+        item = _item(1)
+        q.put_many([item])
+        other = JobQueue()
+        other.restore()
+        q.get_nowait()
+        with self.assertRaises(Exception):
+            other.get_nowait()
+        # The job can be added to the second queue again
+        self.assertIsNone(other.find(item))
+
+    def test_finished_jobs_are_pruned(self):
+        q = JobQueue()
+        q.put_many([_item(1), _item(2), _item(3)])
+        q.complete(q.get_nowait()[2], 'done')
+        q.complete(q.get_nowait()[2], 'cancelled')
+        self.assertEqual(database.prune_jobs(7), 0)
+        conn = sqlite3.connect(database.DB_PATH)
+        with conn:
+            conn.execute("UPDATE jobs SET updated_at='2000-01-01T00:00:00+00:00'")
+        conn.close()
+        # Only the finished and cancelled jobs go; the queued one is still restored
+        self.assertEqual(database.prune_jobs(7), 2)
+        self.assertEqual(JobQueue().restore(), 1)
+
+    def test_old_queue_waits_are_pruned(self):
+        database.record_queue_wait('fifo', 'lora', 'lora', 100, 0, 1.5)
+        database.record_queue_wait('fifo', 'lora', 'lora', 200, 0, 2.5)
+        conn = sqlite3.connect(database.DB_PATH)
+        with conn:
+            conn.execute("UPDATE queue_waits SET dispatched_at='2000-01-01T00:00:00+00:00' WHERE size=100")
+        conn.close()
+        database.prune_jobs(7)
+        self.assertEqual([row[3] for row in database.queue_waits()], [200])
+
+    @mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+    def test_bulk_enqueue(self):
+        daemon = DownloadDaemon(max_retries=1, throttle=0)
+        items = [_item(n) for n in range(10000)]
+        start = time.perf_counter()
+        queued, skipped, duplicates = daemon.add_jobs(items)
+        elapsed = time.perf_counter() - start
+        self.assertEqual((queued, skipped, duplicates), (10000, 0, 0))
+        self.assertEqual(daemon.queue.qsize(), 10000)
+        # One transaction for the batch; per-job commits took tens of seconds here
+        self.assertLess(elapsed, 10)
+        self.assertEqual(JobQueue().restore(), 10000)
+
+    def test_duplicates_are_detected_while_queued_and_running(self):
+        q = JobQueue()
+        self.assertEqual(q.put_many([_item(1)]), [])
+        self.assertEqual(len(q.put_many([_item(1)])), 1)
+        item = q.get_nowait()[2]
+        # Still running: a new copy is a duplicate
+        self.assertIs(q.put_many([_item(1)])[0][1], item)
+        q.complete(item, 'done')
+        self.assertEqual(q.put_many([_item(1)]), [])
+
+    def test_reprioritize_moves_queued_job(self):
+        q = JobQueue()
+        q.put_many([_item(1, priority=5), _item(2, priority=3)])
+        q.reprioritize(q.find(_item(1)), 1)
+        self.assertEqual(q.get_nowait()[2]['model_id'], 'q1')
+        self.assertEqual(q.qsize(), 1)
+
+    def test_remove_and_move(self):
+        q = JobQueue()
+        items = [_item(n) for n in range(4)]
+        q.put_many(items)
+        self.assertIs(q.remove(items[1]['job_id']), items[1])
+        self.assertIsNone(q.remove(items[1]['job_id']))
+        self.assertIsNone(q.find(items[1]))
+        q.move(items[3]['job_id'], 'top')
+        q.move(items[0]['job_id'], 'bottom')
+        self.assertEqual([i['model_id'] for i in q.listing()[1]], ['q3', 'q2', 'q0'])
+        self.assertEqual(q.qsize(), 3)
+
+    def test_listing_is_cached_per_version(self):
+        q = JobQueue(persist=False)
+        q.put_many([_item(1), _item(2)])
+        version, first = q.listing()
+        self.assertIs(q.listing()[1], first)
+        q.get_nowait()
+        self.assertGreater(q.listing()[0], version)
+        self.assertEqual(len(q.listing()[1]), 1)
+
+
+@mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+class TestDuplicatePolicy(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        clear_test_db()
+        self.daemon = DownloadDaemon(max_retries=1, throttle=0)
+
+    def test_ignore(self):
+        self.assertEqual(self.daemon.add_job(_item(1)), 'queued')
+        self.assertEqual(self.daemon.add_job(_item(1)), 'duplicate')
+        self.assertEqual(self.daemon.add_jobs([_item(1), _item(2), _item(2)]), (1, 0, 2))
+        self.assertEqual(self.daemon.queue.qsize(), 2)
+
+    def test_raise_priority(self):
+        self.daemon.duplicate_policy = 'raise_priority'
+        self.daemon.add_jobs([_item(1, priority=5), _item(2, priority=3)])
+        self.daemon.add_job(_item(1, priority=1))
+        self.assertEqual(self.daemon.queue.get_nowait()[2]['model_id'], 'q1')
+
+    def test_replace_url(self):
+        self.daemon.duplicate_policy = 'replace_url'
+        self.daemon.add_job(_item(1))
+        new = _item(1)
+        new['url'] = 'http://mirror.example.com/1'
+        self.daemon.add_job(new)
+        restored = JobQueue()
+        restored.restore()
+        self.assertEqual(restored.find(new)['url'], 'http://mirror.example.com/1')
+
+
+if __name__ == '__main__':
+    unittest.main()
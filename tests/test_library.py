@@ -0,0 +1,104 @@
+import hashlib
+import os
+import tempfile
+import unittest
+import unittest.mock as mock
+from loguru import logger
+
+from backend.database import init_db, clear_test_db, load_library_files
+from backend import library as library_module
+from backend.library import Library
+from backend.daemon import DownloadDaemon, make_queue_item
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+class TestLibrary(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        clear_test_db()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_scan_hashes_and_skips_partials(self):
+        sha_a = _write(os.path.join(self.root, 'lora', 'a.safetensors'), b'a' * 1000)
+        _write(os.path.join(self.root, 'lora', 'b.safetensors.part'), b'partial')
+        stats = Library(self.root).scan()
+        self.assertEqual((stats['files'], stats['hashed']), (1, 1))
+        library = Library(self.root)
+        self.assertTrue(library.contains(sha_a.upper()))
+        self.assertTrue(library.path_for(sha_a).endswith(os.path.join('lora', 'a.safetensors')))
+
+    def test_rescan_only_hashes_changed_files(self):
+        _write(os.path.join(self.root, 'lora', 'a.bin'), b'a')
+        path_b = os.path.join(self.root, 'checkpoint', 'b.bin')
+        _write(path_b, b'b')
+        Library(self.root).scan()
+        sha_b = _write(path_b, b'changed')
+        st = os.stat(path_b)
+        os.utime(path_b, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        library = Library(self.root)
+        with mock.patch('backend.library.sha256_file', wraps=library_module.sha256_file) as hasher:
+            stats = library.scan()
+        self.assertEqual(hasher.call_count, 1)
+        self.assertEqual((stats['cached'], stats['hashed']), (1, 1))
+        self.assertTrue(library.contains(sha_b))
+
+    def test_vanished_files_are_removed(self):
+        path = os.path.join(self.root, 'lora', 'a.bin')
+        sha = _write(path, b'a')
+        library = Library(self.root)
+        library.scan()
+        os.remove(path)
+        self.assertEqual(library.scan()['removed'], 1)
+        self.assertFalse(library.contains(sha))
+
+
+@mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+class TestLibrarySkip(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        clear_test_db()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.daemon = DownloadDaemon(max_retries=1, throttle=0, download_dir=self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_job_with_known_hash_is_skipped(self):
+        sha = _write(os.path.join(self.tmpdir.name, 'lora', 'copied.safetensors'), b'model')
+        self.daemon.scan_library()
+        known = make_queue_item('1', 'http://example.com/1', 'other_name.safetensors', sha256=sha.upper())
+        unknown = make_queue_item('2', 'http://example.com/2', 'new.safetensors', sha256='00' * 32)
+        self.assertEqual(self.daemon.add_job(known), 'skipped')
+        self.assertEqual(self.daemon.add_job(unknown), 'queued')
+        known2 = make_queue_item('3', 'http://example.com/3', 'x.safetensors', sha256=sha)
+        self.assertEqual(self.daemon.add_jobs([known2]), (0, 1, 0))
+
+    def test_deleted_library_file_is_downloaded_again(self):
+        path = os.path.join(self.tmpdir.name, 'lora', 'deleted.safetensors')
+        sha = _write(path, b'gone soon')
+        self.daemon.scan_library()
+        os.remove(path)
+        item = make_queue_item('4', 'http://example.com/4', 'deleted.safetensors', sha256=sha)
+        self.assertEqual(self.daemon.add_job(item), 'queued')
+        self.assertNotIn(path, load_library_files())
+        again = make_queue_item('5', 'http://example.com/5', 'again.safetensors', sha256=sha)
+        self.assertEqual(self.daemon.add_jobs([again]), (1, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
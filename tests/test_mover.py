@@ -0,0 +1,97 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import unittest.mock as mock
+from loguru import logger
+
+from backend.database import init_db, clear_test_db
+from backend.mover import FileMover
+from backend.daemon import DownloadDaemon, make_queue_item
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+
+class TestFileMover(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _src(self, data):
+        path = os.path.join(self.tmp, 'scratch', 'a.bin')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_rename_on_same_filesystem(self):
+        src = self._src(b'x' * 100)
+        inode = os.stat(src).st_ino
+        dst = FileMover().move(src, os.path.join(self.tmp, 'models', 'lora', 'a.bin'))
+        self.assertEqual(os.stat(dst).st_ino, inode)
+        self.assertFalse(os.path.exists(src))
+
+    @mock.patch('backend.mover._same_device', lambda src, dst_dir: False)
+    def test_copy_across_filesystems_is_paced(self):
+        data = os.urandom(3 * 1024 * 1024)
+        src = self._src(data)
+        dst = os.path.join(self.tmp, 'models', 'lora', 'a.bin')
+        mover = FileMover(limit=10)  # MB/s
+        start = time.monotonic()
+        mover.move(src, dst)
+        # 3 MB at 10 MB/s, minus the initial burst
+        self.assertGreater(time.monotonic() - start, 0.2)
+        with open(dst, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertFalse(os.path.exists(src))
+        self.assertFalse(os.path.exists(dst + '.moving'))
+
+
+@mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+class TestScratchTiering(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        clear_test_db()
+        self.tmp = tempfile.mkdtemp()
+        self.daemon = DownloadDaemon(max_retries=1, throttle=0, download_dir=os.path.join(self.tmp, 'models'))
+        self.daemon.scratch_dir = os.path.join(self.tmp, 'scratch')
+        self.daemon.mover = FileMover()
+
+    def tearDown(self):
+        self.daemon.mover.shutdown()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_verified_file_is_moved_from_scratch(self):
+        data = b'weights' * 1000
+        item = make_queue_item('s1', 'url', 'model.bin', sha256=hashlib.sha256(data).hexdigest(),
+                               model_type='lora', model_version_id='sv1')
+        part = self.daemon._part_path(item)
+        self.assertTrue(part.startswith(self.daemon.scratch_dir))
+
+        def fake_download(item):
+            os.makedirs(os.path.dirname(part), exist_ok=True)
+            with open(part, 'wb') as f:
+                f.write(data)
+            item['computed_sha256'] = hashlib.sha256(data).hexdigest()
+            return True, part
+        self.daemon._download_file = fake_download
+        self.assertTrue(self.daemon.process_item(item))
+        deadline = time.time() + 5
+        while self.daemon.moving and time.time() < deadline:
+            time.sleep(0.02)
+        target = self.daemon._target_path(item)
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertFalse(os.path.exists(part))
+        self.assertTrue(self.daemon.downloaded.contains('s1', 'sv1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock as mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+from backend import http_client
+from backend.daemon import DownloadDaemon, make_queue_item
+from backend.preflight import probe, is_fresh, signed_url_expiry
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+PAYLOAD = b'x' * 5000
+
+
+class _RedirectHandler(BaseHTTPRequestHandler):
+    """/api/download/<id> redirects to a signed /cdn url; /gone is a dead link."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path.startswith('/api/download/'):
+            self.send_response(307)
+            self.send_header('Location', f'/cdn/model.bin?Expires={int(time.time()) + 3600}&Signature=abc')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.startswith('/cdn/'):
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes 0-0/{len(PAYLOAD)}')
+            self.send_header('Content-Length', '1')
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', '"v1"')
+            self.end_headers()
+            self.wfile.write(PAYLOAD[:1])
+            return
+        self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def start_redirect_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _RedirectHandler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+class TestPreflight(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.base = start_redirect_server()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def test_signed_url_expiry(self):
+        self.assertEqual(signed_url_expiry('https://cdn.example.com/f?Expires=1700000000&Signature=x'), 1700000000)
+        amz = 'https://r2.example.com/f?X-Amz-Date=20240101T000000Z&X-Amz-Expires=3600&X-Amz-Signature=x'
+        self.assertEqual(signed_url_expiry(amz), 1704067200 + 3600)
+        self.assertIsNone(signed_url_expiry('https://civitai.com/api/download/models/1'))
+
+    def test_probe_follows_redirect(self):
+        result = probe(http_client.get_client(), f'{self.base}/api/download/1')
+        self.assertEqual(result['status'], 206)
+        self.assertEqual(result['size'], len(PAYLOAD))
+        self.assertTrue(result['ranges'])
+        self.assertEqual(result['etag'], '"v1"')
+        self.assertEqual(result['redirects'], 1)
+        self.assertIn('/cdn/model.bin', result['final_url'])
+        self.assertGreater(result['expires'], time.time())
+        self.assertTrue(is_fresh(result))
+
+    def test_freshness(self):
+        now = time.time()
+        self.assertFalse(is_fresh(None))
+        self.assertFalse(is_fresh({'error': 'timeout', 'checked_at': now}))
+        self.assertFalse(is_fresh({'status': 206, 'expires': now + 30, 'checked_at': now}))
+        self.assertTrue(is_fresh({'status': 206, 'expires': None, 'checked_at': now}))
+        self.assertFalse(is_fresh({'status': 206, 'expires': None, 'checked_at': now - 3600}))
+
+
+@mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+class TestDaemonPreflight(unittest.TestCase):
+    def setUp(self):
+        from backend.database import init_db
+        init_db()
+        self.download_dir = tempfile.mkdtemp()
+        self.daemon = DownloadDaemon(max_retries=2, download_dir=self.download_dir, throttle=0)
+        self.daemon.queue.persist = False
+        self.server, self.base = start_redirect_server()
+
+    def tearDown(self):
+        self.server.shutdown()
+        shutil.rmtree(self.download_dir, ignore_errors=True)
+
+    def test_probe_results_are_cached_on_the_job(self):
+        item = make_queue_item('m1', f'{self.base}/api/download/1', 'a.bin', model_type='lora', model_version_id='v1')
+        self.assertEqual(self.daemon.add_job(item), 'queued')
+        self.assertEqual(self.daemon.prober.run_once(), 1)
+        self.assertEqual(item['preflight']['size'], len(PAYLOAD))
+        self.assertEqual(self.daemon.queued_bytes(), (len(PAYLOAD), 0))
+        # Still fresh: the next pass does not probe it again
+        self.assertEqual(self.daemon.prober.run_once(), 0)
+
+    def test_dead_link_fails_without_a_worker(self):
+        dead = make_queue_item('m2', f'{self.base}/gone', 'b.bin', model_type='lora', model_version_id='v2')
+        alive = make_queue_item('m3', f'{self.base}/api/download/3', 'c.bin', model_type='lora', model_version_id='v3')
+        self.daemon.add_jobs([dead, alive])
+        self.daemon.prober.run_once()
+        self.assertEqual(dead['last_status'], 404)
+        self.assertIsNone(self.daemon.queue.get_job(dead['job_id']))
+        self.assertIs(self.daemon.queue.get_job(alive['job_id']), alive)
+        self.assertEqual(self.daemon.prober.dead, 1)
+
+    def test_segmented_download_reuses_fresh_result(self):
+        item = make_queue_item('m4', f'{self.base}/api/download/4', 'd.bin', model_type='lora', model_version_id='v4')
+        item['preflight'] = {'status': 206, 'size': 100, 'ranges': True, 'final_url': f'{self.base}/cdn/model.bin',
+                             'expires': None, 'checked_at': time.time()}
+        self.server.requests.clear()
+        # Too small to split: falls back to a single stream, but without a probe request
+        part = self.daemon._part_path(item)
+        os.makedirs(os.path.dirname(part), exist_ok=True)
+        self.daemon.segment_config = {'default': {'segments': 4, 'min_segment_size': 1024}}
+        self.assertIsNone(self.daemon._download_segmented(item, self.daemon._target_path(item), part, None, {}))
+        self.assertEqual(self.server.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
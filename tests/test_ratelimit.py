@@ -0,0 +1,49 @@
+import os
+import threading
+import time
+import unittest
+from datetime import datetime
+from loguru import logger
+
+from backend.ratelimit import TokenBucket, BandwidthLimiter, MB
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+class TestRateLimit(unittest.TestCase):
+    def test_bucket_paces_concurrent_consumers(self):
+        bucket = TokenBucket(4 * MB)
+        def consume():
+            for _ in range(16):
+                bucket.consume(64 * 1024)
+        threads = [threading.Thread(target=consume) for _ in range(2)]
+        t0 = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - t0
+        # 2 MB at 4 MB/s
+        self.assertGreater(elapsed, 0.4)
+        self.assertLess(elapsed, 0.8)
+
+    def test_unlimited_does_not_sleep(self):
+        limiter = BandwidthLimiter(limit=0)
+        t0 = time.monotonic()
+        for _ in range(1000):
+            limiter.throttle(1024 * 1024)
+        self.assertLess(time.monotonic() - t0, 0.1)
+
+    def test_schedule(self):
+        limiter = BandwidthLimiter(limit=20, schedule=[{'start': '01:00', 'end': '07:00', 'limit': 0},
+                                                       {'start': '23:00', 'end': '00:30', 'limit': 50}])
+        self.assertEqual(limiter.current_limit(datetime(2025, 1, 1, 3, 0)), 0)
+        self.assertEqual(limiter.current_limit(datetime(2025, 1, 1, 12, 0)), 20)
+        self.assertEqual(limiter.current_limit(datetime(2025, 1, 1, 0, 15)), 50)
+        with self.assertRaises(ValueError):
+            limiter.configure(schedule=[{'start': '25:00', 'end': '07:00', 'limit': 1}])
+
+if __name__ == '__main__':
+    unittest.main()
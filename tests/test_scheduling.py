@@ -0,0 +1,111 @@
+import os
+import time
+import unittest
+from loguru import logger
+
+from backend.jobqueue import JobQueue
+from backend.daemon import make_queue_item
+from backend.scheduling import make_policy, wait_summary, GB
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+
+def _item(n, priority=0, size=None, submitter=None, batch=None):
+    item = make_queue_item(f's{n}', f'http://example.com/{n}', f'file{n}.safetensors',
+                           priority=priority, model_type='lora', model_version_id=f'v{n}')
+    if size is not None:
+        item['preflight'] = {'status': 206, 'size': size, 'checked_at': time.time()}
+    if submitter:
+        item['submitter'] = submitter
+    if batch:
+        item['batch'] = batch
+    return item
+
+
+def _order(q):
+    return [q.get_nowait()[2]['model_id'] for _ in range(q.qsize())]
+
+
+class TestSchedulingPolicies(unittest.TestCase):
+    def test_sjf_orders_by_size_within_priority(self):
+        q = JobQueue(persist=False, policy=make_policy('sjf'))
+        q.put_many([_item(1, size=20 * GB), _item(2, size=100 * 1024 * 1024), _item(3), _item(4, priority=-1, size=30 * GB)])
+        # Priority still comes first; unknown size counts as 2 GB
+        self.assertEqual(_order(q), ['s4', 's2', 's3', 's1'])
+
+    def test_sjf_resorts_when_size_becomes_known(self):
+        q = JobQueue(persist=False, policy=make_policy('sjf'))
+        big, unknown = _item(1, size=20 * GB), _item(2)
+        q.put_many([big, unknown])
+        unknown['preflight'] = {'status': 206, 'size': 40 * GB, 'checked_at': time.time()}
+        q.resort(unknown)
+        self.assertEqual(_order(q), ['s1', 's2'])
+
+    def test_fair_share_interleaves_flows(self):
+        q = JobQueue(persist=False, policy=make_policy('fair'))
+        q.put_many([_item(n, size=GB, batch='big') for n in range(10)])
+        q.put_many([_item(100, size=GB, submitter='gui')])
+        order = _order(q)
+        # The GUI job does not wait for the whole batch
+        self.assertLess(order.index('s100'), 2)
+
+    def test_fair_share_weights(self):
+        q = JobQueue(persist=False, policy=make_policy('fair', weights={'a': 2}))
+        q.put_many([_item(n, size=GB, submitter='a') for n in range(6)] + [_item(n, size=GB, submitter='b') for n in range(10, 16)])
+        first = _order(q)[:6]
+        self.assertEqual(sum(1 for model_id in first if model_id in {f's{n}' for n in range(6)}), 4)
+
+    def test_fair_share_splits_bytes_once_sizes_are_known(self):
+        q = JobQueue(persist=False, policy=make_policy('fair', weights={'a': 2}))
+        # Mixed sizes, averaging 1 GB for flow a and 0.5 GB for flow b
+        sizes = {}
+        for n in range(20):
+            sizes[f's{n}'] = (0.5 if n % 2 else 1.5) * GB
+            sizes[f's{100 + n}'] = (0.25 if n % 2 else 0.75) * GB
+        items = [_item(n, submitter='a') for n in range(20)] + [_item(100 + n, submitter='b') for n in range(20)]
+        # Queued before pre-flight: every job is costed at the unknown size first
+        q.put_many(items)
+        for item in reversed(items):
+            item['preflight'] = {'status': 206, 'size': int(sizes[item['model_id']]), 'checked_at': time.time()}
+            q.resort(item)
+        served = {'a': 0, 'b': 0}
+        for model_id in _order(q)[:20]:
+            served['a' if int(model_id[1:]) < 100 else 'b'] += sizes[model_id]
+        # Weight 2 gets twice the bytes, not twice the jobs
+        self.assertAlmostEqual(served['a'] / served['b'], 2.0, delta=0.35)
+
+    def test_aging_lets_old_low_priority_jobs_through(self):
+        q = JobQueue(persist=False, policy=make_policy('aging', aging=60))
+        old, new = _item(1, priority=5), _item(2, priority=1)
+        q.put_many([old], ts=time.time() - 600)  # waited 10 minutes = 10 priority levels
+        q.put_many([new])
+        self.assertEqual(_order(q), ['s1', 's2'])
+
+    def test_switch_policy_at_runtime(self):
+        q = JobQueue(persist=False)
+        q.put_many([_item(1, size=20 * GB), _item(2, size=GB)])
+        q.move(q.find(_item(1))['job_id'], 'bottom')
+        q.set_policy(make_policy('sjf'))
+        q.put_many([_item(3, size=5 * GB)])
+        # The moved job stays at the bottom under the new policy
+        self.assertEqual(_order(q), ['s2', 's3', 's1'])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            make_policy('lottery')
+
+    def test_wait_summary(self):
+        rows = [('fifo', 'gui', 'lora', 100, 0, 1.0), ('fifo', 'batch', 'checkpoint', 5 * GB, 0, 9.0),
+                ('sjf', 'gui', 'lora', None, 0, 2.0)]
+        summary = wait_summary(rows)
+        self.assertEqual(summary['fifo']['count'], 2)
+        self.assertEqual(summary['fifo']['max'], 9.0)
+        self.assertEqual(summary['fifo']['by_size']['large']['count'], 1)
+        self.assertEqual(summary['sjf']['by_flow']['gui']['p50'], 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
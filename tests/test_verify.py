@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import zlib
+import time
+import unittest
+import unittest.mock as mock
+from loguru import logger
+
+from backend.verify import (VerifyPool, IntegrityError, normalize_hashes, choose_algorithm, hash_matches,
+                            check_safetensors_header)
+from backend.daemon import DownloadDaemon, make_queue_item
+
+# Loguru test log setup
+_test_log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
+os.makedirs(_test_log_dir, exist_ok=True)
+logger.add(os.path.join(_test_log_dir, "test.log"), rotation="1 MB", retention=3, encoding="utf-8")
+
+
+class TestVerifyPool(unittest.TestCase):
+    def test_backpressure(self):
+        pool = VerifyPool(workers=1, backlog=2)
+        release = threading.Event()
+        pool.submit(release.wait)
+        pool.submit(release.wait)
+        self.assertEqual(pool.pending(), 2)
+        submitted = threading.Event()
+        threading.Thread(target=lambda: (pool.submit(lambda: None), submitted.set()), daemon=True).start()
+        # Third submit blocks until a slot frees up
+        self.assertFalse(submitted.wait(0.2))
+        release.set()
+        self.assertTrue(submitted.wait(2))
+        pool.shutdown()
+        self.assertEqual(pool.pending(), 0)
+
+
+def _safetensors(data_len=1024):
+    header = json.dumps({'w': {'dtype': 'F32', 'shape': [data_len // 4], 'data_offsets': [0, data_len]}}).encode()
+    return struct.pack('<Q', len(header)) + header + os.urandom(data_len)
+
+
+class TestIntegrityChecks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_safetensors_header(self):
+        data = _safetensors()
+        check_safetensors_header(self._write('ok.safetensors', data))
+        with self.assertRaises(IntegrityError):
+            check_safetensors_header(self._write('short.safetensors', data[:-100]))
+        with self.assertRaises(IntegrityError):
+            check_safetensors_header(self._write('junk.safetensors', os.urandom(4096)))
+
+    def test_choose_algorithm(self):
+        hashes = normalize_hashes({'SHA256': 'AA', 'CRC32': 'BB', 'AutoV2': 'CC'})
+        self.assertEqual(hashes, {'sha256': 'aa', 'crc32': 'bb', 'autov2': 'cc'})
+        self.assertEqual(choose_algorithm(hashes, 'sha256'), 'sha256')
+        self.assertEqual(choose_algorithm(hashes, 'crc32'), 'crc32')
+        self.assertEqual(choose_algorithm({'crc32': 'bb'}, 'sha256'), 'crc32')
+        self.assertIsNone(choose_algorithm({}, 'fast'))
+
+    def test_hash_matches_autov2_prefix(self):
+        digest = hashlib.sha256(b'x').hexdigest()
+        self.assertTrue(hash_matches({'autov2': digest[:10]}, 'sha256', digest))
+        self.assertFalse(hash_matches({'autov2': '0' * 10}, 'sha256', digest))
+
+    @mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+    def test_truncated_safetensors_rejected_before_hashing(self):
+        from backend.database import init_db
+        init_db()
+        daemon = DownloadDaemon(max_retries=1, download_dir=self.tmp, throttle=0)
+        data = _safetensors()
+        item = make_queue_item('t1', 'url', 'model.safetensors', model_type='lora', model_version_id='tv1',
+                               hashes={'SHA256': hashlib.sha256(data).hexdigest()})
+        path = daemon._target_path(item)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        daemon._download_file = lambda item: (open(path, 'wb').write(data[:-10]), (True, path))[1]
+        with mock.patch.object(daemon, 'hash_file', side_effect=AssertionError('full hash')):
+            self.assertFalse(daemon.process_item(item))
+        self.assertEqual(item['hash_failures'], 1)
+        self.assertFalse(os.path.exists(path))
+
+    @mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+    def test_crc32_policy(self):
+        from backend.database import init_db
+        init_db()
+        daemon = DownloadDaemon(max_retries=1, download_dir=self.tmp, throttle=0)
+        daemon.verify_policy = 'crc32'
+        data = os.urandom(4096)
+        path = self._write('model.bin', data)
+        item = make_queue_item('c1', 'url', 'model.bin', model_type='lora', model_version_id='cv1',
+                               hashes={'SHA256': hashlib.sha256(data).hexdigest(), 'CRC32': format(zlib.crc32(data), '08X')})
+        daemon._download_file = lambda item: (True, path)
+        with mock.patch.object(daemon, 'hash_file', wraps=daemon.hash_file) as hash_file:
+            self.assertTrue(daemon.process_item(item))
+        self.assertEqual(hash_file.call_args.kwargs['algo'], 'crc32')
+
+
+@mock.patch('backend.daemon.send_webhook', lambda *a, **kw: None)
+class TestVerifyStage(unittest.TestCase):
+    def setUp(self):
+        from backend.database import init_db
+        init_db()
+
+    def test_worker_continues_while_file_is_hashed(self):
+        daemon = DownloadDaemon(max_retries=1, download_dir='test_downloads', throttle=0)
+        daemon.paranoid_verify = True
+        hashing = threading.Event()
+        release = threading.Event()
+        downloaded = []
+        def fake_hash(filepath, model_id=None, model_version_id=None, algo='sha256'):
+            hashing.set()
+            release.wait(5)
+            return 'ab' * 32
+        def fake_download(item):
+            downloaded.append(item['model_id'])
+            return (True, 'dummy')
+        daemon.hash_file = fake_hash
+        daemon._download_file = fake_download
+        logged = []
+        with mock.patch('backend.daemon.log_download', lambda *a, **kw: logged.append((a[0], a[3]))):
+            daemon.add_job(make_queue_item('h1', 'url', 'file1', sha256='ab' * 32, model_type='lora', model_version_id='hv1'))
+            daemon.add_job(make_queue_item('h2', 'url', 'file2', model_type='lora', model_version_id='hv2'))
+            daemon.start()
+            try:
+                self.assertTrue(hashing.wait(2))
+                deadline = time.time() + 2
+                while 'h2' not in downloaded and time.time() < deadline:
+                    time.sleep(0.02)
+                # The single worker already downloaded the next job; h1 is not yet a success
+                self.assertIn('h2', downloaded)
+                self.assertNotIn(('h1', 'success'), logged)
+                release.set()
+                deadline = time.time() + 2
+                # The verify stage logs the success before it leaves daemon.verifying
+                while (('h1', 'success') not in logged or daemon.verifying) and time.time() < deadline:
+                    time.sleep(0.02)
+                self.assertIn(('h1', 'success'), logged)
+                self.assertEqual(daemon.verifying, {})
+            finally:
+                daemon.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()